@@ -0,0 +1,104 @@
+"""
+Magic-link email throughput: one SMTP connection per email vs the pooled EmailQueue.
+
+Runs against a local aiosmtpd server (pip install aiosmtpd). --handshake-ms delays
+the EHLO reply to stand in for the TCP + STARTTLS + AUTH round trips that a real
+provider costs on every new connection.
+
+    python -m benchmarks.email_queue_bench [--emails 200] [--handshake-ms 30]
+"""
+import argparse
+import asyncio
+import smtplib
+import time
+from email.mime.text import MIMEText
+
+try:
+    # Benchmark-only dependency; not in requirements.txt
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+from services.email_queue import EmailQueue, SMTPConfig
+
+HOST = "127.0.0.1"
+PORT = 8025
+
+
+class _CountingHandler:
+    def __init__(self, handshake_seconds: float) -> None:
+        self.handshake_seconds = handshake_seconds
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_seconds)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def _message(index: int) -> str:
+    msg = MIMEText(f"Click to log in: http://localhost:5173/auth/verify?token={index}\n")
+    msg["Subject"] = "Your login link for Elderly Care AI"
+    msg["From"] = "no-reply@example.com"
+    msg["To"] = f"user{index}@example.com"
+    return msg.as_string()
+
+
+def _send_one(index: int) -> None:
+    """What request_login used to do per email: connect, send, quit."""
+    with smtplib.SMTP(HOST, PORT, timeout=20) as server:
+        server.sendmail("no-reply@example.com", [f"user{index}@example.com"], _message(index))
+
+
+async def run_inline(emails: int) -> float:
+    started = time.perf_counter()
+    for index in range(emails):
+        await asyncio.to_thread(_send_one, index)
+    return time.perf_counter() - started
+
+
+async def run_queue(emails: int, workers: int, batch_size: int) -> float:
+    config = SMTPConfig(HOST, PORT, None, None, "no-reply@example.com", use_tls=False)
+    queue = EmailQueue(config, max_size=emails, workers=workers, batch_size=batch_size)
+    messages = [(f"user{index}@example.com", _message(index)) for index in range(emails)]
+    started = time.perf_counter()
+    for to_email, message in messages:
+        queue.enqueue(to_email, message)
+    enqueued = time.perf_counter() - started
+    await queue.drain(timeout=600)
+    elapsed = time.perf_counter() - started
+    print(f"    enqueue: {enqueued / emails * 1e6:.1f} µs/email, {queue.stats()['smtp_connects']} SMTP connections")
+    await queue.close()
+    return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+    if Controller is None:
+        raise SystemExit("⚠️ This benchmark needs a local SMTP server: pip install aiosmtpd")
+
+    handler = _CountingHandler(args.handshake_ms / 1000)
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        print(f"{args.emails} emails, {args.handshake_ms:.0f} ms connection handshake")
+        inline = await run_inline(args.emails)
+        print(f"  connection per email   {args.emails / inline:8.1f} emails/s")
+        queued = await run_queue(args.emails, args.workers, args.batch_size)
+        print(f"  EmailQueue ({args.workers} workers) {args.emails / queued:8.1f} emails/s")
+        print(f"  server received {handler.received} emails")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the Google Cloud APIs the backend calls: Vertex AI
+generateContent / streamGenerateContent, Text-to-Speech text:synthesize and
+Cloud Translation v2.
+
+Lets the backend (including /api/chat/stream and /api/tts/speak) run without a GCP project:
+
+    python -m benchmarks.fake_google --port 9100 [--latency-distribution lognormal --error-rate 0.01]
+
+and start the backend with
+
+    VERTEX_AI_API_BASE_URL=http://127.0.0.1:9100
+    TTS_API_BASE_URL=http://127.0.0.1:9100
+    TRANSLATE_API_BASE_URL=http://127.0.0.1:9100
+    GOOGLE_STATIC_ACCESS_TOKEN=fake-token
+
+Latency is drawn per request around a median per API ("fixed", "uniform" between 0 and
+twice the median, "exponential" or "lognormal" with FAKE_LATENCY_SIGMA). A fraction of
+requests (FAKE_ERROR_RATE) fail with FAKE_ERROR_STATUS, after the latency.
+GET /_fake/stats returns request and error counts per API.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake Google Cloud APIs")
+
+# Median delay before the first byte per API, and between streamed chunks (seconds)
+FIRST_BYTE_DELAY = float(os.getenv("FAKE_FIRST_BYTE_DELAY", "0.05"))
+TTS_DELAY = float(os.getenv("FAKE_TTS_DELAY", "0.15"))
+TRANSLATE_DELAY = float(os.getenv("FAKE_TRANSLATE_DELAY", "0.03"))
+CHUNK_DELAY = float(os.getenv("FAKE_CHUNK_DELAY", "0.02"))
+LATENCY_DISTRIBUTION = os.getenv("FAKE_LATENCY_DISTRIBUTION", "fixed")
+LATENCY_SIGMA = float(os.getenv("FAKE_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_ERROR_STATUS", "503"))
+
+# About 4 KB of 32 kbps MP3 per second of speech, ~15 characters per second
+AUDIO_BYTES_PER_CHAR = 270
+
+stats: Dict[str, Dict[str, int]] = {
+    api: {"requests": 0, "errors": 0} for api in ("generate", "stream", "tts", "translate")
+}
+
+
+def _latency(median: float) -> float:
+    if median <= 0:
+        return 0.0
+    if LATENCY_DISTRIBUTION == "uniform":
+        return random.uniform(0, 2 * median)
+    if LATENCY_DISTRIBUTION == "exponential":
+        return random.expovariate(math.log(2) / median)
+    if LATENCY_DISTRIBUTION == "lognormal":
+        return random.lognormvariate(math.log(median), LATENCY_SIGMA)
+    return median
+
+
+async def _respond_after_latency(api: str, median: float):
+    """Sleep for one latency sample; returns an error response for the failing fraction."""
+    stats[api]["requests"] += 1
+    await asyncio.sleep(_latency(median))
+    if ERROR_RATE > 0 and random.random() < ERROR_RATE:
+        stats[api]["errors"] += 1
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"code": ERROR_STATUS, "message": "Injected failure", "status": "UNAVAILABLE"}},
+        )
+    return None
+
+
+def _reply_for(payload: Dict[str, Any]) -> str:
+    contents = payload.get("contents") or [{}]
+    parts = contents[-1].get("parts") or [{}]
+    question = parts[0].get("text", "")
+    return (
+        f"You asked: {question}. "
+        "Please take your time and rest when you need to. "
+        "Remember to ask your doctor if anything worries you."
+    )
+
+
+def _response_chunk(text: str) -> Dict[str, Any]:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+@app.get("/_fake/stats")
+async def fake_stats():
+    return stats
+
+
+@app.post("/v1/text:synthesize")
+async def synthesize(request: Request):
+    payload = await request.json()
+    error = await _respond_after_latency("tts", TTS_DELAY)
+    if error:
+        return error
+    text = (payload.get("input") or {}).get("text", "")
+    # Not playable audio, but MP3-sized so the backend's caching and transfer work is realistic
+    audio = bytes(len(text) * AUDIO_BYTES_PER_CHAR)
+    return {"audioContent": base64.b64encode(audio).decode("ascii")}
+
+
+@app.post("/language/translate/v2")
+async def translate(request: Request):
+    payload = await request.json()
+    error = await _respond_after_latency("translate", TRANSLATE_DELAY)
+    if error:
+        return error
+    target = payload.get("target", "")
+    return {"data": {"translations": [{"translatedText": f"[{target}] {payload.get('q', '')}"}]}}
+
+
+@app.post("/v1/{resource:path}")
+async def vertex_model(resource: str, request: Request):
+    payload = await request.json()
+    reply = _reply_for(payload)
+    stream = resource.endswith(":streamGenerateContent")
+    if not stream and not resource.endswith(":generateContent"):
+        return JSONResponse(status_code=404, content={"error": {"message": f"Unknown method: {resource}"}})
+
+    error = await _respond_after_latency("stream" if stream else "generate", FIRST_BYTE_DELAY)
+    if error:
+        return error
+
+    if stream:
+        async def events():
+            words = reply.split(" ")
+            for index, word in enumerate(words):
+                text = word if index == 0 else f" {word}"
+                yield f"data: {json.dumps(_response_chunk(text))}\r\n\r\n"
+                await asyncio.sleep(CHUNK_DELAY)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return _response_chunk(reply)
+
+
+def main() -> None:
+    global FIRST_BYTE_DELAY, TTS_DELAY, TRANSLATE_DELAY, LATENCY_DISTRIBUTION, LATENCY_SIGMA, ERROR_RATE, ERROR_STATUS
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--vertex-latency", type=float, default=FIRST_BYTE_DELAY)
+    parser.add_argument("--tts-latency", type=float, default=TTS_DELAY)
+    parser.add_argument("--translate-latency", type=float, default=TRANSLATE_DELAY)
+    parser.add_argument("--latency-distribution", default=LATENCY_DISTRIBUTION,
+                        choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-sigma", type=float, default=LATENCY_SIGMA)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--error-status", type=int, default=ERROR_STATUS)
+    args = parser.parse_args()
+
+    FIRST_BYTE_DELAY = args.vertex_latency
+    TTS_DELAY = args.tts_latency
+    TRANSLATE_DELAY = args.translate_latency
+    LATENCY_DISTRIBUTION = args.latency_distribution
+    LATENCY_SIGMA = args.latency_sigma
+    ERROR_RATE = args.error_rate
+    ERROR_STATUS = args.error_status
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+End-to-end load test: the backend under uvicorn, talking to benchmarks/fake_google.py.
+
+Starts the fake Google server and the backend as subprocesses (unless --backend-url
+points at a backend that is already running), signs in one user per worker through
+/api/auth/*, then drives the chosen scenarios at fixed concurrency for --duration
+seconds:
+
+    chat  POST /api/chat/message, a few turns per conversation
+    tts   POST /api/tts/speak (binary)
+    auth  POST /api/auth/request-login -> GET /api/auth/verify -> GET /api/auth/me
+
+Reports throughput, p50/p95/p99/max latency and errors per scenario, the backend's
+event-loop lag over the run (from app_event_loop_lag_seconds on /metrics) and upstream
+calls per API (from the fake server). Results are saved as JSON (under
+benchmarks/results/ unless --output is given; that directory is not committed);
+--compare prints the change against an earlier run.
+
+    python -m benchmarks.load_test [--mix chat:3,tts:1,auth:1] [--concurrency 32] [--duration 30]
+        [--fake-args "--latency-distribution lognormal --error-rate 0.01"] [--compare old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_ROOT, "benchmarks", "results")
+
+QUESTIONS = [
+    "How many times a day should I take my blood pressure pills?",
+    "What can I do about trouble sleeping at night?",
+    "Is it safe to go for a walk when it is icy outside?",
+    "I keep forgetting to drink water. Any tips?",
+    "What should I eat to keep my bones strong?",
+    "My knees hurt when I climb stairs. What helps?",
+    "How do I know if I have a cold or the flu?",
+    "Can I take paracetamol with my heart medication?",
+]
+SPOKEN_REPLIES = [
+    "Please take your medicine with a glass of water after breakfast.",
+    "Remember to stand up slowly so you do not feel dizzy.",
+    "A short walk after lunch is good for your heart and your mood. Take your stick with you.",
+    "If the pain gets worse or you feel short of breath, call your doctor or the emergency number.",
+]
+TURNS_PER_CONVERSATION = 5
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(fraction * len(sorted_values) + 0.999999))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _summary(latencies: List[float], statuses: Counter, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 400)
+    return {
+        "requests": len(ordered),
+        "ok": ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+    }
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+
+    def record(self, name: str, started: float, status: Any) -> None:
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        self.statuses.setdefault(name, Counter())[status] += 1
+
+    async def call(self, name: str, request) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as error:
+            self.record(name, started, type(error).__name__)
+            return None
+        self.record(name, started, response.status_code)
+        return response
+
+
+class Worker:
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, unique_ratio: float) -> None:
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.unique_ratio = unique_ratio
+        self.headers: Dict[str, str] = {}
+        self.iteration = 0
+
+    def _text(self, choices: List[str]) -> str:
+        text = random.choice(choices)
+        if random.random() < self.unique_ratio:
+            # Defeats the answer/audio caches for this request
+            text = f"{text} ({self.index}-{self.iteration})"
+        return text
+
+    async def sign_in(self) -> None:
+        # Phone login issues a session directly; one identity per worker.
+        response = await self.client.post(
+            "/api/auth/request-login", json={"phone_number": f"+1555{self.index:07d}"}
+        )
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+    async def chat(self) -> None:
+        conversation = self.iteration // TURNS_PER_CONVERSATION
+        await self.recorder.call("chat", self.client.post(
+            "/api/chat/message",
+            json={"message": self._text(QUESTIONS), "session_id": f"load-{self.index}-{conversation}"},
+            headers=self.headers,
+        ))
+
+    async def tts(self) -> None:
+        await self.recorder.call("tts", self.client.post(
+            "/api/tts/speak",
+            json={"text": self._text(SPOKEN_REPLIES), "language_code": "en-US", "response_format": "binary"},
+            headers=self.headers,
+        ))
+
+    async def auth(self) -> None:
+        email = f"load{self.index}-{self.iteration}@example.com"
+        response = await self.recorder.call(
+            "auth.request_login", self.client.post("/api/auth/request-login", json={"email": email})
+        )
+        link = response.json().get("dev_magic_link") if response is not None and response.status_code == 200 else None
+        if not link:
+            return  # SMTP is configured on the backend: the link went out by email
+        token = parse_qs(urlparse(link).query)["token"][0]
+        response = await self.recorder.call(
+            "auth.verify", self.client.get("/api/auth/verify", params={"token": token})
+        )
+        if response is None or response.status_code != 200:
+            return
+        session = {"Authorization": f"Bearer {response.json()['session_token']}"}
+        await self.recorder.call("auth.me", self.client.get("/api/auth/me", headers=session))
+
+    async def run(self, scenarios: List[str], weights: List[float], deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            self.iteration += 1
+
+
+async def _client_loop_lag(samples: List[float], interval: float = 0.05) -> None:
+    """Lag of the load generator's own loop; if this is high the numbers are suspect."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+def _parse_histogram(text: str, name: str) -> Tuple[Dict[float, float], float, float]:
+    """(cumulative count per bucket bound, sum, count) of an unlabelled histogram."""
+    buckets: Dict[float, float] = {}
+    total = count = 0.0
+    for line in text.splitlines():
+        if line.startswith(f"{name}_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[float("inf") if bound == "+Inf" else float(bound)] = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_count"):
+            count = float(line.rsplit(" ", 1)[1])
+    return buckets, total, count
+
+
+def _loop_lag_summary(before: str, after: str) -> Dict[str, Any]:
+    """Event-loop lag over the run, from the difference of two /metrics scrapes."""
+    name = "app_event_loop_lag_seconds"
+    buckets_before, sum_before, count_before = _parse_histogram(before, name)
+    buckets_after, sum_after, count_after = _parse_histogram(after, name)
+    count = count_after - count_before
+    if count <= 0:
+        return {"samples": 0}
+
+    def upper_bound(fraction: float) -> Optional[float]:
+        for bound in sorted(buckets_after):
+            if buckets_after[bound] - buckets_before.get(bound, 0.0) >= fraction * count:
+                return None if bound == float("inf") else bound * 1000
+        return None
+
+    return {
+        "samples": int(count),
+        "mean_ms": round((sum_after - sum_before) / count * 1000, 3),
+        # Histogram buckets: "p99 <= this many ms" (None = above the largest bucket)
+        "p50_le_ms": upper_bound(0.50),
+        "p99_le_ms": upper_bound(0.99),
+    }
+
+
+def _start_servers(args) -> List[subprocess.Popen]:
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    env = dict(os.environ)
+    env.pop("SMTP_HOST", None)  # Login links are returned as dev links instead of emailed
+    env.update({
+        "GOOGLE_CLOUD_PROJECT": env.get("GOOGLE_CLOUD_PROJECT", "load-test"),
+        "VERTEX_AI_TUNED_ENDPOINT_ID": "load-test",
+        "VERTEX_AI_API_BASE_URL": fake_url,
+        "TTS_API_BASE_URL": fake_url,
+        "TRANSLATE_API_BASE_URL": fake_url,
+        "GOOGLE_STATIC_ACCESS_TOKEN": "fake-token",
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limits else "false",
+    })
+    for assignment in args.backend_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    output = open(args.backend_log, "ab") if args.backend_log else subprocess.DEVNULL
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_google", "--port", str(args.fake_port), *shlex.split(args.fake_args)],
+        cwd=BACKEND_ROOT, env=env, stdout=output, stderr=output,
+    )
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.backend_port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_ROOT, env=env, stdout=output, stderr=output,
+    )
+    return [fake, backend]
+
+
+async def _wait_until_up(client: httpx.AsyncClient, url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # Any answer below 500 means up (404: a backend without /api/ready)
+            if (await client.get(url)).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+
+async def _fake_stats(client: httpx.AsyncClient, fake_url: Optional[str]) -> Dict[str, Any]:
+    if not fake_url:
+        return {}
+    try:
+        return (await client.get(f"{fake_url}/_fake/stats")).json()
+    except httpx.HTTPError:
+        return {}
+
+
+async def run(args) -> Dict[str, Any]:
+    mix = [part.split(":") for part in args.mix.split(",") if part]
+    scenarios = [name for name, *_ in mix]
+    weights = [float(rest[0]) if rest else 1.0 for _, *rest in mix]
+    for scenario in scenarios:
+        if scenario not in ("chat", "tts", "auth"):
+            raise SystemExit(f"Unknown scenario: {scenario}")
+
+    fake_url = args.fake_url or (None if args.backend_url else f"http://127.0.0.1:{args.fake_port}")
+    backend_url = args.backend_url or f"http://127.0.0.1:{args.backend_port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=backend_url, limits=limits, timeout=args.timeout) as client:
+        if fake_url:
+            await _wait_until_up(client, f"{fake_url}/_fake/stats")
+        # 503 until the backend's warm-up is done, so measurement starts warm
+        await _wait_until_up(client, "/api/ready")
+
+        recorder = Recorder()
+        workers = [Worker(index, client, recorder, args.unique_ratio) for index in range(args.concurrency)]
+        await asyncio.gather(*(worker.sign_in() for worker in workers))
+
+        if args.warmup > 0:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker.run(scenarios, weights, deadline) for worker in workers))
+            recorder = Recorder()
+            for worker in workers:
+                worker.recorder = recorder
+
+        metrics_before = (await client.get("/metrics")).text
+        upstream_before = await _fake_stats(client, fake_url)
+        client_lag: List[float] = []
+        lag_task = asyncio.create_task(_client_loop_lag(client_lag))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker.run(scenarios, weights, started + args.duration) for worker in workers))
+        elapsed = time.perf_counter() - started
+        lag_task.cancel()
+        metrics_after = (await client.get("/metrics")).text
+        upstream_after = await _fake_stats(client, fake_url)
+
+    upstream = {
+        api: {key: value - upstream_before.get(api, {}).get(key, 0) for key, value in counts.items()}
+        for api, counts in upstream_after.items()
+    }
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "elapsed_seconds": round(elapsed, 3),
+        "scenarios": {
+            name: _summary(latencies, recorder.statuses[name], elapsed)
+            for name, latencies in sorted(recorder.latencies.items())
+        },
+        "event_loop_lag": _loop_lag_summary(metrics_before, metrics_after),
+        "client_loop_lag_max_ms": round(max(client_lag, default=0.0) * 1000, 2),
+        "upstream_calls": upstream,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{result['elapsed_seconds']:.1f}s at concurrency {result['config']['concurrency']}")
+    print(f"  {'scenario':<20}{'req':>7}{'ok':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, summary in result["scenarios"].items():
+        print(
+            f"  {name:<20}{summary['requests']:>7}{summary['ok']:>7}{summary['throughput_rps']:>9.1f}"
+            f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}{summary['max_ms']:>10.1f}"
+        )
+        errors = {status: count for status, count in summary["statuses"].items() if not status.startswith(("1", "2", "3"))}
+        if errors:
+            print(f"  {'':<20}errors: {errors}")
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old:
+            changes = []
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if old[key]:
+                    changes.append(f"{key} {(summary[key] - old[key]) / old[key] * 100:+.1f}%")
+            print(f"  {'':<20}vs baseline: {', '.join(changes)}")
+    print(f"  backend event-loop lag: {result['event_loop_lag']}")
+    print(f"  load generator loop lag max: {result['client_loop_lag_max_ms']} ms")
+    if result["upstream_calls"]:
+        print(f"  upstream calls: {result['upstream_calls']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default="chat:3,tts:1,auth:1", help="scenario:weight,...")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--unique-ratio", type=float, default=0.5, help="Fraction of cache-defeating texts")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--backend-url", help="Use a running backend instead of starting one")
+    parser.add_argument("--fake-url", help="Fake Google server of a --backend-url backend, for upstream stats")
+    parser.add_argument("--backend-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--fake-args", default="", help="Extra arguments for benchmarks.fake_google")
+    parser.add_argument("--backend-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--backend-log", help="Append backend and fake server output to this file")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep per-identity rate limits on")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/load_test_<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    processes = [] if args.backend_url else _start_servers(args)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    _print_report(result, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2)
+    print(f"  saved {output}")
+
+
+if __name__ == "__main__":
+    main()
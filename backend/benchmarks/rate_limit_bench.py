@@ -0,0 +1,72 @@
+"""
+Cost of one rate-limit check (InMemoryRateLimiter and SQLiteRateLimiter).
+
+    python -m benchmarks.rate_limit_bench [--checks 1000000] [--identities 10000] [--threads 4]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from services.rate_limit import InMemoryRateLimiter, SQLiteRateLimiter
+
+# Generous policy so the benchmark measures the check, not rejections
+RATE = 1e9
+BURST = 1e9
+
+
+def run(limiter, checks: int, identities: int) -> float:
+    """Return mean nanoseconds per check, cycling over `identities` keys."""
+    keys = [f"user{index}@example.com" for index in range(identities)]
+    try_acquire = limiter.try_acquire
+    started = time.perf_counter()
+    for index in range(checks):
+        try_acquire("chat", keys[index % identities], RATE, BURST)
+    return (time.perf_counter() - started) / checks * 1e9
+
+
+class _NoopLimiter:
+    def try_acquire(self, bucket: str, identity: str, rate: float, burst: float) -> float:
+        return 0.0
+
+
+def run_threads(limiter, checks: int, identities: int, threads: int) -> float:
+    """Aggregate nanoseconds per check with `threads` threads checking concurrently."""
+    per_thread = checks // threads
+    workers = [
+        threading.Thread(target=run, args=(limiter, per_thread, identities))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--identities", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.checks} checks over {args.identities} identities")
+    # Loop + call overhead of the harness itself; subtract it from the rows below.
+    print(f"  harness (no-op check)   {run(_NoopLimiter(), args.checks, args.identities):9.0f} ns/check")
+    print(f"  memory, 1 identity      {run(InMemoryRateLimiter(), args.checks, 1):9.0f} ns/check")
+    print(f"  memory                  {run(InMemoryRateLimiter(), args.checks, args.identities):9.0f} ns/check")
+    threaded = run_threads(InMemoryRateLimiter(), args.checks, args.identities, args.threads)
+    print(f"  memory, {args.threads} threads       {threaded:9.0f} ns/check")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Each SQLite check is a write transaction; a smaller sample is enough.
+        sqlite_checks = max(1, args.checks // 100)
+        per_check = run(SQLiteRateLimiter(os.path.join(tmp, "limits.db")), sqlite_checks, args.identities)
+        print(f"  sqlite                  {per_check:9.0f} ns/check ({sqlite_checks} checks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-turn overhead of the conversation session stores.
+
+Each simulated turn is what VertexAIChatbot does per chat request: read the session
+history, then append the user/model pair.
+
+    python -m benchmarks.session_store_bench [--sessions 200] [--turns 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from services.session_store import InMemorySessionStore, SQLiteSessionStore, Turn
+
+USER_TEXT = "How many times a day should I take my blood pressure pills?"
+MODEL_TEXT = (
+    "Please take them exactly as your doctor prescribed, usually once in the morning. "
+    "If you are unsure, ask your pharmacist or doctor."
+)
+
+
+def _turn_pair():
+    return [Turn("user", USER_TEXT), Turn("model", MODEL_TEXT)]
+
+
+def run(store, sessions: int, turns: int) -> float:
+    """Return mean microseconds per turn (get + append)."""
+    started = time.perf_counter()
+    for _ in range(turns):
+        for index in range(sessions):
+            session_id = f"session_{index}"
+            store.get(session_id)
+            store.append(session_id, _turn_pair())
+    elapsed = time.perf_counter() - started
+    return elapsed / (sessions * turns) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "memory": InMemorySessionStore(),
+            "sqlite (cache)": SQLiteSessionStore(os.path.join(tmp, "cached.db")),
+            # Cache of one session: every read falls through to SQLite.
+            "sqlite (no cache)": SQLiteSessionStore(os.path.join(tmp, "uncached.db"), cache_size=1),
+        }
+        print(f"{args.sessions} sessions x {args.turns} turns")
+        for name, store in stores.items():
+            per_turn = run(store, args.sessions, args.turns)
+            print(f"  {name:<18} {per_turn:9.1f} µs/turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cold-start cost of the backend: `import main`, then the first requests that build
+the lazily constructed Vertex AI and TTS services.
+
+Each run is a fresh interpreter. The services are pointed at an unused local port
+with a static token, so construction runs without a GCP project and nothing is
+sent upstream (health endpoints build the service but make no API calls).
+
+    python -m benchmarks.startup_bench [--runs 5] [--importtime 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RUN = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import httpx
+
+async def first_requests():
+    timings = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path in (("chat_health", "/api/chat/health"), ("tts_health", "/api/tts/health"),
+                           ("chat_health_again", "/api/chat/health")):
+            t = time.perf_counter()
+            (await client.get(path)).raise_for_status()
+            timings[name + "_ms"] = (time.perf_counter() - t) * 1000
+    return timings
+
+timings = asyncio.run(first_requests())
+timings["import_ms"] = (imported - started) * 1000
+timings["chat_loaded"] = main.chatbot_provider.instance is not None
+timings["tts_loaded"] = main.tts_provider.instance is not None
+print("RESULT " + json.dumps(timings))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_CLOUD_PROJECT", "startup-bench")
+    env.setdefault("VERTEX_AI_TUNED_ENDPOINT_ID", "startup-bench")
+    env.setdefault("VERTEX_AI_API_BASE_URL", "http://127.0.0.1:9")
+    env.setdefault("TTS_API_BASE_URL", "http://127.0.0.1:9")
+    env.setdefault("TRANSLATE_API_BASE_URL", "http://127.0.0.1:9")
+    env.setdefault("GOOGLE_STATIC_ACCESS_TOKEN", "startup-bench")
+    return env
+
+
+def run_once(env: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", _RUN], cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"No result from benchmark run:\n{completed.stdout}\n{completed.stderr}")
+
+
+def top_imports(env: dict, count: int) -> list:
+    """Slowest modules (cumulative microseconds) under python -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package" (first line is the header)
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, help="Also list the N slowest imports")
+    args = parser.parse_args()
+
+    env = _env()
+    results = [run_once(env) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts (median, min-max)")
+    for key in ("import_ms", "chat_health_ms", "tts_health_ms", "chat_health_again_ms"):
+        values = [result[key] for result in results]
+        print(f"  {key:<22}{statistics.median(values):9.1f}   ({min(values):.1f}-{max(values):.1f})")
+    print(f"  services loaded: chat={results[-1]['chat_loaded']} tts={results[-1]['tts_loaded']}")
+
+    if args.importtime:
+        print("slowest imports (cumulative ms)")
+        for cumulative, name in top_imports(env, args.importtime):
+            print(f"  {cumulative / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
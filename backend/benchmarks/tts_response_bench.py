@@ -0,0 +1,72 @@
+"""
+Compare /api/tts/speak response modes (json vs binary vs stream) for long replies.
+
+The TTS upstream is replaced by an in-process service returning fixed MP3-sized
+payloads, so only the backend's own encoding and transfer work is measured.
+
+    RATE_LIMIT_ENABLED=false python -m benchmarks.tts_response_bench [--requests 50]
+"""
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+import login
+import main
+
+# Roughly 1, 4 and 10 minutes of 32 kbps MP3 speech
+AUDIO_SIZES = [256 * 1024, 1024 * 1024, 2400 * 1024]
+
+
+class _FixedAudioService:
+    audio_cache = None
+
+    def __init__(self) -> None:
+        self.audio = b""
+
+    async def synthesize_speech(self, text, language_code="en-US", voice_name=None) -> bytes:
+        return self.audio
+
+    async def synthesize_speech_stream(self, text, language_code="en-US", voice_name=None):
+        # Same bytes, delivered as ~1000-character sentence chunks would be (~64 KiB each)
+        for offset in range(0, len(self.audio), 64 * 1024):
+            yield self.audio[offset:offset + 64 * 1024]
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    service = _FixedAudioService()
+    main.tts_provider.set(service)
+    token = login._create_token({"typ": "session", "email": "bench@example.com", "exp": int(time.time()) + 3600})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with TestClient(main.app) as client:
+        for size in AUDIO_SIZES:
+            service.audio = bytes(size)
+            print(f"audio {size // 1024} KiB")
+            for mode in ("json", "binary", "stream"):
+                timings = []
+                body_bytes = 0
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    response = client.post(
+                        "/api/tts/speak",
+                        json={"text": "long reply", "response_format": mode},
+                        headers=headers,
+                    )
+                    timings.append((time.perf_counter() - started) * 1000)
+                    body_bytes = len(response.content)
+                    response.raise_for_status()
+                print(
+                    f"  {mode:<7} body {body_bytes / 1024:8.0f} KiB   "
+                    f"p50 {statistics.median(timings):6.2f} ms   "
+                    f"max {max(timings):6.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main_bench()
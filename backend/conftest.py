@@ -0,0 +1,8 @@
+"""
+pytest setup: run from backend/ (`python -m pytest -q`) so `core`, `services` and
+`benchmarks` import the same way they do under uvicorn.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
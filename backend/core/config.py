@@ -1,9 +1,12 @@
 """
 Configuration settings - For Custom Tuned Vertex AI Model
 """
+import os
 from pydantic_settings import BaseSettings
 from typing import List, Optional
 
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -14,7 +17,7 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     
     # Google Cloud / Vertex AI - Tuned Model
-    GOOGLE_CLOUD_PROJECT: str  # Your project ID
+    GOOGLE_CLOUD_PROJECT: Optional[str] = None  # Your project ID (required for Vertex AI chat)
     # Service account JSON key path (optional). Set this to use a key file instead of gcloud login.
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None  # e.g. /path/to/service-account-key.json
     GOOGLE_API_KEY: Optional[str] = None  # Not used for Vertex AI; kept for optional use
@@ -27,6 +30,13 @@ class Settings(BaseSettings):
     # From: projects/82533503826/locations/europe-west4/models/6026891623793688576@1
     VERTEX_AI_TUNED_ENDPOINT_ID: Optional[str] = None  # Deployed endpoint ID (if model is deployed)
     VERTEX_AI_TUNED_MODEL_ID: Optional[str] = None  # Tuned model ID (e.g. 6026891623793688576@1)
+    # Override the Vertex AI API host, e.g. http://127.0.0.1:9100 for benchmarks/fake_google.py
+    VERTEX_AI_API_BASE_URL: Optional[str] = None
+    # Same for Text-to-Speech and Cloud Translation (the fake server serves all three)
+    TTS_API_BASE_URL: Optional[str] = None
+    TRANSLATE_API_BASE_URL: Optional[str] = None
+    # Fixed bearer token instead of ADC. Only for local fake servers, never in production.
+    GOOGLE_STATIC_ACCESS_TOKEN: Optional[str] = None
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -35,10 +45,114 @@ class Settings(BaseSettings):
     DEFAULT_LANGUAGE: str = "en"
     MAX_TOKENS: int = 1024
     TEMPERATURE: float = 0.7
+
+    # Conversation session store (bounded; least recently used sessions are evicted first)
+    SESSION_MAX_COUNT: int = 10000
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_IDLE_TTL_SECONDS: int = 72 * 60 * 60  # Sessions idle longer than this are dropped
+    # "memory" (per process) or "sqlite" (shared by all workers on one host)
+    SESSION_STORE_BACKEND: str = "memory"
+    SESSION_SQLITE_PATH: str = "data/sessions.db"  # Relative paths are resolved from backend/
+    SESSION_CACHE_SIZE: int = 1000  # Sessions kept in each worker's read-through cache
+
+    # History windowing: estimated tokens of history sent per request (0 = send everything)
+    HISTORY_TOKEN_BUDGET: int = 4000
+    HISTORY_MIN_RECENT_TURNS: int = 4  # Always sent verbatim, even over budget
+    HISTORY_SUMMARY_ENABLED: bool = True  # Fold older turns into a background rolling summary
+
+    # Answer cache for first-turn questions (exact, then n-gram cosine similarity via numpy)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 2000
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    ANSWER_CACHE_SIMILARITY: float = 0.92  # Cosine similarity needed for a near-duplicate hit
+    # e.g. "data/answer_cache.json": saved at shutdown, loaded during warm-up
+    ANSWER_CACHE_SNAPSHOT_PATH: Optional[str] = None
+
+    # Text-to-speech audio cache (content-addressed; 0 bytes disables the memory tier)
+    TTS_CACHE_MEMORY_BYTES: int = 32 * 1024 * 1024
+    TTS_CACHE_DIR: Optional[str] = None  # e.g. "data/tts_cache" to enable the disk tier
+    TTS_CACHE_DISK_BYTES: int = 512 * 1024 * 1024
+    # Long replies are synthesized as sentence-aligned chunks, several at a time
+    TTS_CHUNK_MAX_CHARS: int = 1000  # API input limit is 5000 bytes
+    TTS_MAX_PARALLEL_CHUNKS: int = 4
+    # Translation results for TTS (Cloud Translation or Vertex fallback)
+    TRANSLATION_CACHE_MAX_ENTRIES: int = 5000
+    TRANSLATION_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Admission control: concurrent upstream calls per API, each with a bounded wait
+    # queue. Requests past a full queue or the queue deadline get 429 + Retry-After.
+    CHAT_MAX_CONCURRENCY: int = 16
+    CHAT_MAX_QUEUE: int = 64
+    TRANSLATE_MAX_CONCURRENCY: int = 16
+    TRANSLATE_MAX_QUEUE: int = 64
+    TTS_MAX_CONCURRENCY: int = 16  # Counts sentence chunks, not requests
+    TTS_MAX_QUEUE: int = 64
+    UPSTREAM_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    # Circuit breakers per upstream, over a sliding window of recent calls
+    BREAKER_WINDOW_SECONDS: int = 30
+    BREAKER_MIN_CALLS: int = 10  # Calls in the window before the breaker may open
+    BREAKER_ERROR_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    BREAKER_SLOW_CALL_RATE: float = 0.8
+    BREAKER_OPEN_SECONDS: float = 30.0  # Then one probe call decides whether to close
+
+    # Per-identity token buckets (requests per minute, burst) on authenticated endpoints
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "sqlite" shares limits across workers on one host
+    RATE_LIMIT_SQLITE_PATH: str = "data/rate_limits.db"
+    CHAT_RATE_PER_MINUTE: float = 20.0
+    CHAT_RATE_BURST: int = 10
+    TTS_RATE_PER_MINUTE: float = 30.0
+    TTS_RATE_BURST: int = 15
+    LOGIN_RATE_PER_MINUTE: float = 3.0  # Keyed by the email/phone a login is requested for
+    LOGIN_RATE_BURST: int = 5
+
+    # Single-use magic-link nonces (kept until the link expires)
+    NONCE_STORE_BACKEND: str = "memory"  # "sqlite" lets any worker verify a link
+    NONCE_SQLITE_PATH: str = "data/nonces.db"
+    NONCE_MAX_ENTRIES: int = 100000  # Outstanding links kept in memory
+
+    # Background magic-link email delivery (SMTP_* env vars configure the server)
+    EMAIL_QUEUE_MAX_SIZE: int = 1000
+    EMAIL_WORKERS: int = 2  # Each keeps one authenticated SMTP connection open
+    EMAIL_BATCH_SIZE: int = 20  # Emails sent per connection round before yielding
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 2.0  # Doubled per attempt, with jitter
+
+    # Request tracing: per-stage timings in a Server-Timing response header, and the
+    # full trace logged as one JSON line for sampled or slow requests
+    SERVER_TIMING_ENABLED: bool = True
+    TRACE_LOG_SAMPLE_RATE: float = 0.0  # Fraction of requests logged, e.g. 0.01
+    TRACE_LOG_SLOW_SECONDS: float = 0.0  # Always log requests slower than this (0 = off)
+    # Event loop lag sampling for /metrics (blocking work shows up as lag; 0 = off)
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.25
+
+    # Vertex AI and TTS services are built on first use; a failed build is retried after this
+    SERVICE_RETRY_SECONDS: float = 30.0
+    # Warm-up after startup (services, access token, pooled connections, caches).
+    # /api/ready answers 503 until it has succeeded or the deadline has passed.
+    WARMUP_ENABLED: bool = True
+    WARMUP_DEADLINE_SECONDS: float = 20.0
+    WARMUP_CONNECTIONS_PER_HOST: int = 2
+    WARMUP_TTS_CACHE_BYTES: int = 8 * 1024 * 1024  # Recent disk-tier audio loaded into memory
+
+    # Shared HTTP transport for Google Cloud APIs (connection pool)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle pooled connection is kept open
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP2_ENABLED: bool = True  # Requires the 'h2' package (httpx[http2])
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 
+def resolve_backend_path(path: str) -> str:
+    """Resolve a relative data path (SQLite files, cache dirs) from the backend root."""
+    if os.path.isabs(path):
+        return path
+    return os.path.abspath(os.path.join(BACKEND_ROOT, path))
+
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+In-process metrics in Prometheus text format (no client library needed).
+
+Stage latencies are recorded through core.tracing.span(), which also adds them to
+the current request's trace. Counters and histograms are updated on the hot path with a dict lookup and an
+increment (histograms add a bisect over a dozen bucket bounds). Values that already
+live elsewhere (cache hit ratios, session-store size, queue depths) are not mirrored
+on every request: collector callbacks read them only when /metrics is scraped.
+
+Updates are not locked; they happen on the event loop, so nothing is lost.
+"""
+import asyncio
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds: from in-process stages (history build, JSON encode) to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+# ({label: value}, value) samples produced by a collector callback
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labelvalues, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [count per bucket (+Inf last)..., sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+        # Non-cumulative counts; cumulated at exposition time
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labelvalues, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {_format_value(cumulative)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List = []
+        # (name, help, type, callback returning samples)
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]],
+                           metric_type: str = "gauge") -> None:
+        """collect() is called on every scrape and returns ({label: value}, value) samples."""
+        self._collectors = [c for c in self._collectors if c[0] != name]
+        self._collectors.append((name, documentation, metric_type, collect))
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for name, documentation, metric_type, collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as error:
+                print(f"⚠️ Metrics collector {name} failed: {error}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_LATENCY = registry.histogram(
+    "app_stage_duration_seconds",
+    "Time spent in one stage of request handling (auth, history, token fetch, upstream calls).",
+    ["stage"],
+)
+REQUEST_LATENCY = registry.histogram(
+    "app_request_duration_seconds",
+    "HTTP request duration until the response body is complete, by endpoint.",
+    ["endpoint", "method"],
+)
+EVENT_LOOP_LAG = registry.histogram(
+    "app_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer (time other callbacks held the loop).",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+UPSTREAM_RESPONSES = registry.counter(
+    "app_upstream_responses_total",
+    "Upstream Google API responses by upstream and HTTP status ('error' = no response).",
+    ["upstream", "status"],
+)
+UPSTREAM_SENT_BYTES = registry.counter(
+    "app_upstream_request_bytes_total",
+    "Request payload bytes sent to upstream APIs.",
+    ["upstream"],
+)
+UPSTREAM_RECEIVED_BYTES = registry.counter(
+    "app_upstream_response_bytes_total",
+    "Response payload bytes received from upstream APIs.",
+    ["upstream"],
+)
+
+
+def record_upstream(upstream: str, status_code: Optional[int], sent_bytes: int = 0, received_bytes: int = 0) -> None:
+    UPSTREAM_RESPONSES.inc(upstream, str(status_code) if status_code is not None else "error")
+    if sent_bytes:
+        UPSTREAM_SENT_BYTES.inc(upstream, amount=sent_bytes)
+    if received_bytes:
+        UPSTREAM_RECEIVED_BYTES.inc(upstream, amount=received_bytes)
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """Run forever: sleep `interval` and record how much later than that we woke up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: times each HTTP request through the end of its body."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router adds the matched endpoint to the scope; label by its name.
+            endpoint = scope.get("endpoint")
+            name = getattr(endpoint, "__name__", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - started, name, scope["method"])
@@ -0,0 +1,136 @@
+"""
+Per-request tracing: timed spans collected in a contextvar for the current request.
+
+`with span("vertex.generate"):` records the block into the stage latency histogram
+(see core.metrics) and, while a request is being handled, into that request's trace.
+Tasks and worker threads started from the request inherit the trace (asyncio copies
+the context), so spans from the services end up on the right request.
+
+TracingMiddleware sends the spans finished so far as a Server-Timing header (shown in
+the browser's network panel) and an X-Request-ID, and logs the whole trace as one JSON
+line for a sampled fraction of requests and for every slow one. For streaming
+responses the header can only carry what finished before the first byte; the log
+line has everything.
+"""
+import json
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import STAGE_LATENCY
+
+# Bounds memory and header size for requests that fan out (TTS chunks)
+MAX_SPANS_PER_TRACE = 64
+MAX_SERVER_TIMING_ENTRIES = 24
+
+
+class Trace:
+    __slots__ = ("trace_id", "started", "spans", "dropped")
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.started = time.perf_counter()
+        # (name, start offset, duration) in seconds, in order of completion
+        self.spans: List[Tuple[str, float, float]] = []
+        self.dropped = 0
+
+    def add(self, name: str, started: float, duration: float) -> None:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return
+        self.spans.append((name, started - self.started, duration))
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, _, duration in self.spans[:MAX_SERVER_TIMING_ENTRIES]]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": [
+                {"name": name, "start_ms": round(offset * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for name, offset, duration in self.spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_span(name: str, duration: float, started: Optional[float] = None) -> None:
+    """Record an already measured stage (for code that can't use a with-block)."""
+    STAGE_LATENCY.observe(duration, name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, started if started is not None else time.perf_counter() - duration, duration)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started, started)
+
+
+def _should_log(duration: float) -> bool:
+    slow = settings.TRACE_LOG_SLOW_SECONDS
+    if slow > 0 and duration >= slow:
+        return True
+    rate = settings.TRACE_LOG_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one Trace per HTTP request (see module docstring)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                # Keep a caller-supplied ID (proxy, frontend) if it is sane.
+                trace_id = value.decode("latin-1")[:64] or None
+                break
+        trace = Trace(trace_id or uuid.uuid4().hex[:16])
+        token = _current_trace.set(trace)
+        status = None
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", trace.trace_id.encode("latin-1")))
+                if settings.SERVER_TIMING_ENABLED:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            duration = time.perf_counter() - trace.started
+            if _should_log(duration):
+                record = {"event": "request_trace", "method": scope["method"], "path": scope["path"], "status": status}
+                record.update(trace.to_dict())
+                print(json.dumps(record, separators=(",", ":")))
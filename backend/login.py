@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from pydantic import BaseModel
 from typing import Dict, Optional
 import base64
@@ -8,19 +8,28 @@ import json
 import os
 import re
 import secrets
-import smtplib
 import time
 from email.mime.text import MIMEText
 
+from core.tracing import span
+from services.cache import TTLCache
+from services.email_queue import email_queue
+from services.nonce_store import NONCE_EXPIRED, NONCE_UNKNOWN, NONCE_USED, create_nonce_store
+from services.rate_limit import enforce_rate_limit
+from services.sqlite_db import run_store
+
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 AUTH_SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "dev-secret-change-this")
 MAGIC_LINK_TTL_SECONDS = 15 * 60
 SESSION_TTL_SECONDS = 30 * 24 * 60 * 60
+# Verified session payloads, keyed by SHA-256 of the token; each entry expires at the token's exp
+AUTH_SESSION_CACHE_SIZE = int(os.getenv("AUTH_SESSION_CACHE_SIZE", "10000"))
+
+# Single-use magic link nonces; expired and used ones are purged as links expire
+magic_nonces = create_nonce_store()
 
-# In-memory nonce tracking (single-use magic links)
-issued_magic_nonces: Dict[str, int] = {}
-used_magic_nonces = set()
+verified_sessions = TTLCache(max_entries=AUTH_SESSION_CACHE_SIZE)
 
 
 class RequestLoginRequest(BaseModel):
@@ -92,14 +101,8 @@ def _is_valid_e164(phone: str) -> bool:
 
 
 def _send_magic_link_email(to_email: str, magic_link: str) -> bool:
-    smtp_host = os.getenv("SMTP_HOST")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_pass = os.getenv("SMTP_PASS")
-    from_email = os.getenv("SMTP_FROM", smtp_user or "no-reply@example.com")
-    use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
-
-    if not smtp_host:
+    """Queue the login email for background delivery; False if SMTP is not configured."""
+    if not email_queue.configured:
         return False
 
     subject = "Your login link for Elderly Care AI"
@@ -112,27 +115,42 @@ def _send_magic_link_email(to_email: str, magic_link: str) -> bool:
 
     msg = MIMEText(body)
     msg["Subject"] = subject
-    msg["From"] = from_email
+    msg["From"] = email_queue.config.from_email
     msg["To"] = to_email
 
-    with smtplib.SMTP(smtp_host, smtp_port, timeout=20) as server:
-        if use_tls:
-            server.starttls()
-        if smtp_user and smtp_pass:
-            server.login(smtp_user, smtp_pass)
-        server.sendmail(from_email, [to_email], msg.as_string())
-
+    if not email_queue.enqueue(to_email, msg.as_string()):
+        raise HTTPException(
+            status_code=503,
+            detail="We could not send your login link right now. Please try again in a minute.",
+        )
     return True
 
 
-def get_current_user_identity(authorization: Optional[str] = Header(default=None)) -> str:
+def _verify_session(token: str) -> Dict[str, str]:
+    """Verified session payload, from the cache when this token was seen before."""
+    with span("auth.verify_session"):
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        payload = verified_sessions.get(key)
+        if payload is None:
+            payload = _verify_token(token, "session")
+            if not (payload.get("email") or payload.get("phone_number")):
+                raise HTTPException(status_code=401, detail="Invalid session payload")
+            verified_sessions.set(key, payload, expires_at=int(payload["exp"]))
+        return payload
+
+
+async def get_current_user_identity(
+    request: Request,
+    authorization: Optional[str] = Header(default=None),
+) -> str:
+    # async: runs on the event loop instead of a threadpool hop per request.
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing authorization token")
     token = authorization.split(" ", 1)[1].strip()
-    payload = _verify_token(token, "session")
+    payload = _verify_session(token)
     identity = payload.get("email") or payload.get("phone_number")
-    if not identity:
-        raise HTTPException(status_code=401, detail="Invalid session payload")
+    request.state.session = payload
+    request.state.identity = identity
     return identity
 
 
@@ -146,6 +164,7 @@ async def request_login(request: RequestLoginRequest):
                 status_code=400,
                 detail="Enter a valid international phone number (e.g. +14155552671)",
             )
+        await enforce_rate_limit("login", phone)
         exp = int(time.time()) + SESSION_TTL_SECONDS
         session_payload = {
             "typ": "session",
@@ -164,10 +183,11 @@ async def request_login(request: RequestLoginRequest):
     email = (request.email or "").strip().lower()
     if not _is_valid_email(email):
         raise HTTPException(status_code=400, detail="Provide a valid email or phone number")
+    await enforce_rate_limit("login", email)
 
     nonce = secrets.token_urlsafe(16)
     nonce_exp = int(time.time()) + MAGIC_LINK_TTL_SECONDS
-    issued_magic_nonces[nonce] = nonce_exp
+    await run_store(magic_nonces.issue, nonce, nonce_exp)
 
     magic_payload = {
         "typ": "magic",
@@ -180,13 +200,8 @@ async def request_login(request: RequestLoginRequest):
     frontend_base = (request.frontend_base_url or os.getenv("FRONTEND_BASE_URL") or "http://localhost:5173").rstrip("/")
     magic_link = f"{frontend_base}/auth/verify?token={token}"
 
-    sent = False
-    try:
-        sent = _send_magic_link_email(email, magic_link)
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-
-    if not sent:
+    # Returns once the email is queued; SMTP delivery (with retries) happens in the background.
+    if not _send_magic_link_email(email, magic_link):
         print(f"[DEV MAGIC LINK] {email}: {magic_link}")
         return RequestLoginResponse(
             message="Login link generated. SMTP not configured, using dev link.",
@@ -202,16 +217,14 @@ async def verify_login_token(token: str):
     email = payload["email"]
     nonce = payload.get("nonce")
 
-    if not nonce or nonce not in issued_magic_nonces:
+    status = await run_store(magic_nonces.consume, nonce) if nonce else NONCE_UNKNOWN
+    if status == NONCE_UNKNOWN:
         raise HTTPException(status_code=401, detail="Invalid or unknown magic link")
-    if nonce in used_magic_nonces:
+    if status == NONCE_USED:
         raise HTTPException(status_code=401, detail="Magic link already used")
-    if time.time() > issued_magic_nonces[nonce]:
+    if status == NONCE_EXPIRED:
         raise HTTPException(status_code=401, detail="Magic link expired")
 
-    used_magic_nonces.add(nonce)
-    del issued_magic_nonces[nonce]
-
     exp = int(time.time()) + SESSION_TTL_SECONDS
     session_payload = {
         "typ": "session",
@@ -229,8 +242,7 @@ async def verify_login_token(token: str):
 
 
 @router.get("/me")
-async def auth_me(authorization: Optional[str] = Header(default=None)):
-    identity = get_current_user_identity(authorization)
+async def auth_me(identity: str = Depends(get_current_user_identity)):
     if identity.startswith("+"):
         return {"phone_number": identity}
     return {"email": identity}
@@ -1,31 +1,118 @@
+import asyncio
 import base64
-from fastapi import Depends, FastAPI, HTTPException
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional
-
-from login import get_current_user_identity, router as login_router
-
-# Use Vertex AI chatbot when configured (via .env); otherwise fall back to echo
-try:
-    from services.vertex_ai import chatbot
-    USE_VERTEX_AI = True
-except Exception as e:
-    chatbot = None
-    USE_VERTEX_AI = False
-    print(f"Vertex AI not loaded (missing .env?): {e}. Using echo for chat.")
-
-try:
-    from services.text_to_speech import tts_service
-    USE_TTS = True
-    TTS_LOAD_ERROR = None
-except Exception as e:
-    tts_service = None
-    USE_TTS = False
-    TTS_LOAD_ERROR = str(e)
-    print(f"TTS service not loaded: {e}")
-
-app = FastAPI(title="Elderly Healthcare Assistant")
+from typing import AsyncIterator, Dict, Literal, Optional
+
+from core.config import resolve_backend_path, settings
+from core.metrics import MetricsMiddleware, monitor_event_loop_lag, registry as metrics_registry
+from core.tracing import TracingMiddleware, record_span, span
+from login import get_current_user_identity, router as login_router, verified_sessions
+from services.admission import UpstreamBusy, admission_stats
+from services.auth_tokens import token_provider
+from services.circuit_breaker import OPEN, CircuitOpen, breaker_stats
+from services.email_queue import email_queue
+from services.rate_limit import RateLimited, enforce_rate_limit, rate_limits
+from services.http_client import close_http_client
+from services.lazy import LazyService
+from services.voice_pipeline import chat_and_speak
+from services.warmup import WarmUp, open_connections
+
+
+def _create_chatbot():
+    from services.vertex_ai import VertexAIChatbot
+    return VertexAIChatbot()
+
+
+def _create_tts_service():
+    from services.text_to_speech import GoogleTextToSpeechService
+    return GoogleTextToSpeechService()
+
+
+# Built on first use and retried after failures. Chat falls back to echo while
+# Vertex AI is unavailable (e.g. not configured in .env); TTS answers 503.
+chatbot_provider = LazyService("Vertex AI chat", _create_chatbot, settings.SERVICE_RETRY_SECONDS)
+tts_provider = LazyService("Text-to-speech", _create_tts_service, settings.SERVICE_RETRY_SECONDS)
+
+warm_up = WarmUp(settings.WARMUP_DEADLINE_SECONDS)
+
+
+async def _warm_chat() -> Dict:
+    chatbot = await chatbot_provider.get(force=True)
+    if not chatbot:
+        raise RuntimeError(chatbot_provider.error or "Vertex AI chat unavailable")
+    result = {"hosts": await open_connections([chatbot.generate_content_url], settings.WARMUP_CONNECTIONS_PER_HOST)}
+    if chatbot.answer_cache and settings.ANSWER_CACHE_SNAPSHOT_PATH:
+        path = resolve_backend_path(settings.ANSWER_CACHE_SNAPSHOT_PATH)
+        result["answers_loaded"] = await asyncio.to_thread(
+            chatbot.answer_cache.load_snapshot, path, chatbot.answer_fingerprint
+        )
+    return result
+
+
+async def _warm_tts() -> Dict:
+    service = await tts_provider.get(force=True)
+    if not service:
+        raise RuntimeError(tts_provider.error or "Text-to-speech unavailable")
+    result = {
+        "hosts": await open_connections([service.tts_url, service.translate_url], settings.WARMUP_CONNECTIONS_PER_HOST)
+    }
+    if service.audio_cache:
+        result["audio_preloaded"] = await service.audio_cache.preload(settings.WARMUP_TTS_CACHE_BYTES)
+    return result
+
+
+async def _warm_token() -> bool:
+    await token_provider.get_token()
+    return True
+
+
+def _save_answer_snapshot() -> None:
+    chatbot = chatbot_provider.instance
+    if not (chatbot and chatbot.answer_cache and settings.ANSWER_CACHE_SNAPSHOT_PATH):
+        return
+    try:
+        saved = chatbot.answer_cache.save_snapshot(resolve_backend_path(settings.ANSWER_CACHE_SNAPSHOT_PATH))
+        print(f"✅ Saved {saved} cached answers")
+    except OSError as error:
+        print(f"⚠️ Could not save the answer cache: {error}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    background = []
+    if settings.EVENT_LOOP_LAG_INTERVAL_SECONDS > 0:
+        background.append(loop.create_task(monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)))
+    if settings.WARMUP_ENABLED:
+        # Runs while the server already accepts connections; /api/ready tells the
+        # load balancer when to send traffic.
+        background.append(loop.create_task(warm_up.run({
+            "access_token": _warm_token,
+            "chat": _warm_chat,
+            "tts": _warm_tts,
+        })))
+    else:
+        warm_up.skip()
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await asyncio.to_thread(_save_answer_snapshot)
+        await close_http_client()
+        # Give queued login emails a few seconds to go out before the workers stop.
+        await email_queue.close()
+
+
+app = FastAPI(title="Elderly Healthcare Assistant", lifespan=lifespan)
 
 # Allow frontend (Vite dev server) to call the API
 app.add_middleware(
@@ -34,11 +121,142 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.include_router(login_router)
 
 
+@app.exception_handler(UpstreamBusy)
+async def upstream_busy_handler(request: Request, error: UpstreamBusy):
+    """Shed load fast when an upstream's wait queue is full (or too slow)."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "The assistant is busy right now. Please try again in a moment."},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, error: CircuitOpen):
+    """Fail fast while an upstream is known to be down."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "This service is temporarily unavailable. Please try again shortly."},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, error: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests. Please wait a moment and try again."},
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+def _rate_limited(*buckets: str):
+    """get_current_user_identity that also takes a token from each named bucket."""
+    async def dependency(current_user: str = Depends(get_current_user_identity)) -> str:
+        for bucket in buckets:
+            await enforce_rate_limit(bucket, current_user)
+        return current_user
+    return dependency
+
+
+chat_user = _rate_limited("chat")
+tts_user = _rate_limited("tts")
+chat_speak_user = _rate_limited("chat", "tts")
+
+
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _cache_stats():
+    """(cache name, stats dict) for every cache that is currently loaded."""
+    yield "auth_session", verified_sessions.stats()
+    chatbot = chatbot_provider.instance
+    if chatbot and chatbot.answer_cache:
+        yield "answer", chatbot.answer_cache.stats()
+    tts_service = tts_provider.instance
+    if tts_service:
+        if tts_service.audio_cache:
+            yield "tts_audio", tts_service.audio_cache.stats()
+        yield "translation", tts_service.translation_cache.stats()
+
+
+def _session_store_stats():
+    chatbot = chatbot_provider.instance
+    return [chatbot.sessions.stats()] if chatbot else []
+
+
+def _register_metric_collectors() -> None:
+    # Read at scrape time only; nothing here runs per request.
+    metrics_registry.register_collector(
+        "app_cache_hit_ratio",
+        "Hit ratio of each in-process cache since startup.",
+        lambda: [({"cache": name}, stats["hit_ratio"]) for name, stats in _cache_stats()],
+    )
+    metrics_registry.register_collector(
+        "app_session_store_sessions",
+        "Conversation sessions currently stored.",
+        lambda: [({"backend": stats["backend"]}, stats["sessions"]) for stats in _session_store_stats()],
+    )
+    metrics_registry.register_collector(
+        "app_session_store_bytes",
+        "Estimated bytes of conversation history currently stored.",
+        lambda: [({"backend": stats["backend"]}, stats["bytes"]) for stats in _session_store_stats()],
+    )
+    metrics_registry.register_collector(
+        "app_admission_queue_depth",
+        "Requests waiting for an upstream concurrency slot.",
+        lambda: [({"upstream": name}, stats["queue_depth"]) for name, stats in admission_stats().items()],
+    )
+    metrics_registry.register_collector(
+        "app_admission_active",
+        "Upstream calls currently holding a concurrency slot.",
+        lambda: [({"upstream": name}, stats["active"]) for name, stats in admission_stats().items()],
+    )
+    metrics_registry.register_collector(
+        "app_admission_rejected_total",
+        "Requests rejected with 429 by admission control.",
+        lambda: [
+            ({"upstream": name}, stats["rejected_queue_full"] + stats["rejected_timeout"])
+            for name, stats in admission_stats().items()
+        ],
+        metric_type="counter",
+    )
+    metrics_registry.register_collector(
+        "app_circuit_state",
+        "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).",
+        lambda: [({"upstream": name}, _CIRCUIT_STATE_VALUES[stats["state"]]) for name, stats in breaker_stats().items()],
+    )
+    metrics_registry.register_collector(
+        "app_rate_limited_total",
+        "Requests rejected by the per-identity rate limiter.",
+        lambda: [({"bucket": name}, count) for name, count in (rate_limits.limited.items() if rate_limits else [])],
+        metric_type="counter",
+    )
+    metrics_registry.register_collector(
+        "app_access_token_refreshes_total",
+        "OAuth access token refreshes (inline and background).",
+        lambda: [({}, token_provider.refreshes)],
+        metric_type="counter",
+    )
+    metrics_registry.register_collector(
+        "app_email_queue_depth",
+        "Login emails waiting for delivery.",
+        lambda: [({}, email_queue.stats()["queued"])],
+    )
+
+
+_register_metric_collectors()
+
+
 class ChatRequest(BaseModel):
     prompt: str
 
@@ -49,30 +267,34 @@ class ChatMessageRequest(BaseModel):
     language: Optional[str] = "en"
 
 
+class ChatSpeakRequest(ChatMessageRequest):
+    language_code: Optional[str] = "en-US"
+    voice_name: Optional[str] = None
+
+
 class TextToSpeechRequest(BaseModel):
     text: str
     language_code: Optional[str] = "en-US"
     voice_name: Optional[str] = None
+    # "json": {"audio_base64", "mime_type"} (default, backward compatible)
+    # "binary": raw audio/mpeg body with Content-Length
+    # "stream": raw audio/mpeg body, chunked; sentence chunk 1 is sent while later
+    #           chunks are still being synthesized
+    response_format: Literal["json", "binary", "stream"] = "json"
 
 
-def _get_tts_service():
-    """
-    Lazy-load TTS service so backend can recover after dependency/env fixes.
-    """
-    global tts_service, USE_TTS, TTS_LOAD_ERROR
-    if USE_TTS and tts_service:
-        return tts_service
-
-    try:
-        from services.text_to_speech import tts_service as loaded_tts_service
-        tts_service = loaded_tts_service
-        USE_TTS = True
-        TTS_LOAD_ERROR = None
-        return tts_service
-    except Exception as error:
-        USE_TTS = False
-        TTS_LOAD_ERROR = str(error)
-        return None
+async def _require_tts_service():
+    """The TTS service, or 503 while it is unavailable (retried after SERVICE_RETRY_SECONDS)."""
+    service = await tts_provider.get()
+    if not service:
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                "Text-to-speech service is not configured on the backend. "
+                f"Reason: {tts_provider.error or 'Unknown error'}"
+            ),
+        )
+    return service
 
 
 @app.get("/")
@@ -80,19 +302,50 @@ async def root():
     return {"message": "Elderly Healthcare Assistant Backend - Ready for chat!"}
 
 
+@app.get("/api/ready")
+async def ready():
+    """Readiness probe: 503 until warm-up has succeeded or its deadline has passed."""
+    status = warm_up.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of latency histograms, upstream counters and gauges."""
+    return PlainTextResponse(metrics_registry.expose(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/chat/health")
 async def chat_health():
-    return {"status": "ok"}
+    chatbot = await chatbot_provider.get()
+    if chatbot:
+        answer_cache = chatbot.answer_cache.stats() if chatbot.answer_cache else None
+        return {
+            "status": "ok",
+            "service": chatbot_provider.stats(),
+            "sessions": chatbot.sessions.stats(),
+            "answer_cache": answer_cache,
+            "coalescing": chatbot.first_turn_flight.stats(),
+            "admission": admission_stats()["chat"],
+            "circuit": breaker_stats()["chat"],
+            "rate_limits": rate_limits.stats() if rate_limits else None,
+        }
+    return {
+        "status": "ok",
+        "service": chatbot_provider.stats(),
+        "rate_limits": rate_limits.stats() if rate_limits else None,
+    }
 
 
 @app.post("/api/chat/message")
 async def chat_message(
     request: ChatMessageRequest,
-    current_user: str = Depends(get_current_user_identity),
+    current_user: str = Depends(chat_user),
 ) -> Dict[str, str]:
     _ = current_user
-    if USE_VERTEX_AI and chatbot:
-        result = chatbot.chat(
+    chatbot = await chatbot_provider.get()
+    if chatbot:
+        result = await chatbot.chat(
             message=request.message,
             session_id=request.session_id or "default",
         )
@@ -107,44 +360,165 @@ async def chat_message(
     }
 
 
+async def _chat_events(request: ChatMessageRequest):
+    """chat_stream() events, or a single echo reply when Vertex AI is not configured."""
+    chatbot = await chatbot_provider.get()
+    if chatbot:
+        async for event in chatbot.chat_stream(
+            message=request.message,
+            session_id=request.session_id or "default",
+        ):
+            yield event
+        return
+    # Fallback when Vertex AI is not configured
+    reply = f"Echo: {request.message} (AI integration coming soon)"
+    yield {"type": "delta", "text": reply}
+    yield {"type": "done", "response": reply, "model": "backend"}
+
+
+async def _started(events: AsyncIterator):
+    """
+    Run an event stream up to its first item before the response starts, so an
+    UpstreamBusy rejection still becomes a 429 rather than a broken stream.
+    """
+    first = await events.__anext__()
+
+    async def replay():
+        yield first
+        async for event in events:
+            yield event
+
+    return replay()
+
+
+async def _ndjson(events: AsyncIterator[Dict]):
+    """One JSON line per event; the encoding time is recorded as a single span."""
+    encoding = 0.0
+    try:
+        async for event in events:
+            started = time.perf_counter()
+            line = json.dumps(event) + "\n"
+            encoding += time.perf_counter() - started
+            yield line
+    finally:
+        record_span("response.encode", encoding)
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatMessageRequest,
+    current_user: str = Depends(chat_user),
+):
+    """
+    Streaming variant of /api/chat/message as NDJSON: one {"type": "delta", "text"} line
+    per text chunk, then a final "done" (or "error") line with the full response.
+    """
+    _ = current_user
+
+    chat_events = await _started(_chat_events(request))
+    return StreamingResponse(_ndjson(chat_events), media_type="application/x-ndjson")
+
+
+@app.post("/api/chat/speak")
+async def chat_speak(
+    request: ChatSpeakRequest,
+    current_user: str = Depends(chat_speak_user),
+):
+    """
+    Chat and text-to-speech in one NDJSON stream. Text deltas are forwarded as they
+    arrive; each completed sentence group is synthesized right away and sent as an
+    {"type": "audio", "index", "text", "audio_base64", "mime_type"} line, in order.
+    """
+    _ = current_user
+    service = await _require_tts_service()
+
+    chat_events = await _started(_chat_events(request))
+    events = chat_and_speak(
+        chat_events,
+        service,
+        language_code=request.language_code or "en-US",
+        voice_name=request.voice_name,
+    )
+    return StreamingResponse(_ndjson(events), media_type="application/x-ndjson")
+
+
 @app.delete("/api/chat/session/{session_id}")
 async def clear_session(
     session_id: str,
     current_user: str = Depends(get_current_user_identity),
 ):
     _ = current_user
-    if USE_VERTEX_AI and chatbot:
-        chatbot.clear_session(session_id)
+    chatbot = await chatbot_provider.get()
+    if chatbot:
+        await chatbot.clear_session(session_id)
     return {"status": "cleared"}
 
 
+@app.get("/api/tts/health")
+async def tts_health():
+    service = await tts_provider.get()
+    if not service:
+        return {"status": "unavailable", "reason": tts_provider.error or "Unknown error", "service": tts_provider.stats()}
+    cache = service.audio_cache.stats() if service.audio_cache else None
+    circuits = breaker_stats()
+    return {
+        "status": "degraded" if circuits["tts"]["state"] == OPEN else "ok",
+        "cache": cache,
+        "translation_cache": service.translation_cache.stats(),
+        "coalescing": {
+            "synthesize": service.synthesize_flight.stats(),
+            "translate": service.translate_flight.stats(),
+        },
+        "admission": {
+            "tts": admission_stats()["tts"],
+            "translate": admission_stats()["translate"],
+        },
+        "circuits": {"tts": circuits["tts"], "translate": circuits["translate"]},
+    }
+
+
 @app.post("/api/tts/speak")
 async def text_to_speech(
     request: TextToSpeechRequest,
-    current_user: str = Depends(get_current_user_identity),
-) -> Dict[str, str]:
+    current_user: str = Depends(tts_user),
+):
     _ = current_user
-    service = _get_tts_service()
-    if not service:
-        raise HTTPException(
-            status_code=503,
-            detail=(
-                "Text-to-speech service is not configured on the backend. "
-                f"Reason: {TTS_LOAD_ERROR or 'Unknown error'}"
-            ),
-        )
+    service = await _require_tts_service()
 
     try:
-        audio_content = service.synthesize_speech(
+        if request.response_format == "stream":
+            audio_chunks = service.synthesize_speech_stream(
+                text=request.text,
+                language_code=request.language_code or "en-US",
+                voice_name=request.voice_name,
+            )
+            # Wait for the first chunk so errors still map to HTTP status codes.
+            first_chunk = await audio_chunks.__anext__()
+
+            async def audio_body():
+                yield first_chunk
+                async for chunk in audio_chunks:
+                    yield chunk
+
+            return StreamingResponse(audio_body(), media_type="audio/mpeg")
+
+        audio_content = await service.synthesize_speech(
             text=request.text,
             language_code=request.language_code or "en-US",
             voice_name=request.voice_name,
         )
-        audio_base64 = base64.b64encode(audio_content).decode("utf-8")
-        return {
-            "audio_base64": audio_base64,
-            "mime_type": "audio/mpeg",
-        }
+        # Binary mode hands the decoded bytes straight to the client (no base64 round trip).
+        if request.response_format == "binary":
+            return Response(content=audio_content, media_type="audio/mpeg")
+        with span("response.encode"):
+            audio_base64 = base64.b64encode(audio_content).decode("utf-8")
+            # JSONResponse encodes here, inside the span, rather than after the handler returns.
+            return JSONResponse({
+                "audio_base64": audio_base64,
+                "mime_type": "audio/mpeg",
+            })
+    except (UpstreamBusy, CircuitOpen):
+        raise
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error)) from error
     except Exception as error:
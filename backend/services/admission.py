@@ -0,0 +1,154 @@
+"""
+Admission control for upstream Google APIs.
+
+Each upstream (chat, translate, TTS) gets a concurrency limit with a bounded FIFO wait
+queue. A request that finds the queue full, or waits longer than the queue deadline,
+is rejected right away with UpstreamBusy (HTTP 429 + Retry-After) instead of piling up
+behind a burst and burning the API quota.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from core.config import settings
+
+# Smoothing for the average slot hold time used to estimate Retry-After
+_HOLD_EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class UpstreamBusy(Exception):
+    """An upstream is at its concurrency limit and its wait queue is full or too slow."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{upstream} upstream is busy ({reason}); retry after {retry_after}s")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded wait queue and a queue-time deadline."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_hold = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queued request would be admitted."""
+        backlog = (len(self._waiters) + 1) / self.max_concurrent
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(backlog * self._avg_hold)))
+
+    def _reject(self, reason: str) -> UpstreamBusy:
+        if reason == "queue_full":
+            self.rejected_queue_full += 1
+        else:
+            self.rejected_timeout += 1
+        error = UpstreamBusy(self.name, reason, self.retry_after())
+        print(f"⚠️ {error}")
+        return error
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def acquire(self) -> None:
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            granted = waiter.done() and not waiter.cancelled()
+            if isinstance(error, asyncio.CancelledError):
+                if granted:
+                    self.release()
+                raise
+            if not granted:
+                raise self._reject("queue_timeout") from None
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # release() handed its slot over to us (_active was not decremented).
+        self._admit(time.monotonic() - started)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            self._avg_hold += _HOLD_EWMA_ALPHA * (held - self._avg_hold)
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.max_concurrent,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_hold_ms": round(self._avg_hold * 1000, 2),
+        }
+
+
+chat_gate = AdmissionGate(
+    "chat",
+    settings.CHAT_MAX_CONCURRENCY,
+    settings.CHAT_MAX_QUEUE,
+    settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+)
+translate_gate = AdmissionGate(
+    "translate",
+    settings.TRANSLATE_MAX_CONCURRENCY,
+    settings.TRANSLATE_MAX_QUEUE,
+    settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+)
+tts_gate = AdmissionGate(
+    "tts",
+    settings.TTS_MAX_CONCURRENCY,
+    settings.TTS_MAX_QUEUE,
+    settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {gate.name: gate.stats() for gate in (chat_gate, translate_gate, tts_gate)}
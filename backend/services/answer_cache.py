@@ -0,0 +1,255 @@
+"""
+Answer cache for context-free (first-turn) questions.
+
+Lookups try an exact match on normalized text first, then a cosine-similarity search
+over hashed character/word n-gram vectors held in one NumPy matrix. A similar entry
+is only reused if it has the same content words and numbers, so similarity absorbs
+rewording (filler words, word order, punctuation) but never a different drug, symptom
+or dose. Entries expire
+after a TTL and the whole cache is dropped when the model or system instruction
+changes. Without NumPy only exact matching is used.
+"""
+import json
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from core.config import settings
+
+VECTOR_DIM = 1024
+# Nearest entries checked per similarity lookup
+_CANDIDATES = 5
+
+# Words that flip or scale the meaning of a health question. They are never ignored
+# below, so "take" vs "stop taking" or "before" vs "after" always count as different.
+_GUARD_WORDS = {
+    "not", "no", "never", "dont", "don't", "cant", "can't", "shouldnt", "shouldn't",
+    "stop", "without", "before", "after", "more", "less", "too", "much", "many",
+    "double", "missed", "miss", "overdose", "child", "children", "pregnant",
+}
+# Function words that don't change what is being asked. Every other word (drug,
+# condition, body part, time of day...) must match exactly for a similar-question hit:
+# trigram similarity alone scores "ibuprofen"/"naproxen" or "morning"/"evening" as
+# near-duplicates.
+_IGNORED_WORDS = frozenset({
+    "a", "an", "the", "i", "i'm", "im", "me", "my", "myself", "you", "your", "we", "it", "its",
+    "it's", "is", "are", "am", "was", "be", "been", "do", "does", "did", "can", "could",
+    "should", "would", "will", "may", "might", "must", "to", "of", "for", "in", "on", "at",
+    "by", "from", "with", "and", "or", "if", "so", "this", "that", "there", "what", "what's",
+    "how", "when", "why", "which", "who", "any", "some", "ok", "okay", "safe", "please",
+    "tell", "know", "about", "take", "taking", "use", "using", "hi", "hello",
+}) - _GUARD_WORDS
+_NON_WORD = re.compile(r"[^\w\s']+")
+# Doses, counts and ages. Each number is kept with its unit ("500mg", "500 mg" ->
+# "500mg") and must match exactly: "8 tablets" is not "2 tablets".
+_NUMBER = re.compile(
+    r"\d+(?:\s?(?:mg|mcg|µg|ug|g|kg|ml|l|iu|units?|tablets?|pills?|capsules?|doses?"
+    r"|drops?|puffs?|times|hours?|hrs?|days?|weeks?|months?|years?|lbs?|percent)\b)?"
+)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _features(normalized: str) -> List[str]:
+    padded = f" {normalized} "
+    grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return grams + normalized.split()
+
+
+def _key_words(normalized: str) -> frozenset:
+    """
+    What a similar question must share exactly: its numbers (with units) and every
+    word that is not an ignored function word.
+    """
+    numbers = [match.group().replace(" ", "") for match in _NUMBER.finditer(normalized)]
+    words = _NUMBER.sub(" ", normalized).split()
+    return frozenset(word for word in words if word not in _IGNORED_WORDS).union(numbers)
+
+
+class _Entry:
+    __slots__ = ("normalized", "answer", "expires_at", "key_words")
+
+    def __init__(self, normalized: str, answer: str, expires_at: float) -> None:
+        self.normalized = normalized
+        self.answer = answer
+        self.expires_at = expires_at
+        self.key_words = _key_words(normalized)
+
+
+class AnswerCache:
+    """Fixed-capacity ring of cached answers; the oldest entry is replaced when full."""
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 24 * 60 * 60,
+                 similarity_threshold: float = 0.92) -> None:
+        self.max_entries = max(max_entries, _CANDIDATES)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint: Optional[str] = None
+        self._slots: List[Optional[_Entry]] = [None] * self.max_entries
+        self._exact: Dict[str, int] = {}
+        self._next_slot = 0
+        self._vectors = np.zeros((self.max_entries, VECTOR_DIM), dtype=np.float32) if NUMPY_AVAILABLE else None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _vector(self, normalized: str):
+        vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+        for feature in _features(normalized):
+            vector[zlib.crc32(feature.encode("utf-8")) % VECTOR_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def ensure_fingerprint(self, fingerprint: str) -> None:
+        """Drop every entry if the model/system instruction fingerprint changed."""
+        if self.fingerprint != fingerprint:
+            if self.fingerprint is not None:
+                self.invalidations += 1
+            self.clear()
+            self.fingerprint = fingerprint
+
+    def clear(self) -> None:
+        self._slots = [None] * self.max_entries
+        self._exact.clear()
+        self._next_slot = 0
+        if self._vectors is not None:
+            self._vectors[:] = 0.0
+
+    def _drop(self, slot: int) -> None:
+        entry = self._slots[slot]
+        if entry is None:
+            return
+        if self._exact.get(entry.normalized) == slot:
+            del self._exact[entry.normalized]
+        self._slots[slot] = None
+        if self._vectors is not None:
+            self._vectors[slot] = 0.0
+
+    def get(self, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.time()
+
+        slot = self._exact.get(normalized)
+        if slot is not None:
+            entry = self._slots[slot]
+            if entry.expires_at > now:
+                self.exact_hits += 1
+                return entry.answer
+            self._drop(slot)
+
+        if self._vectors is not None and self._exact:
+            scores = self._vectors @ self._vector(normalized)
+            key_words = _key_words(normalized)
+            top = np.argpartition(scores, -_CANDIDATES)[-_CANDIDATES:]
+            # Best candidates first; skip expired entries and any that differ in a key word.
+            for slot in top[np.argsort(scores[top])[::-1]]:
+                if scores[slot] < self.similarity_threshold:
+                    break
+                entry = self._slots[slot]
+                if entry is None:
+                    continue
+                if entry.expires_at <= now:
+                    self._drop(slot)
+                    continue
+                if entry.key_words == key_words:
+                    self.similar_hits += 1
+                    return entry.answer
+
+        self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str) -> None:
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        existing = self._exact.get(normalized)
+        slot = existing if existing is not None else self._next_slot
+        if existing is None:
+            self._drop(slot)
+            self._next_slot = (self._next_slot + 1) % self.max_entries
+        self._store(slot, normalized, answer, time.time() + self.ttl_seconds)
+
+    def _store(self, slot: int, normalized: str, answer: str, expires_at: float) -> None:
+        self._slots[slot] = _Entry(normalized, answer, expires_at)
+        self._exact[normalized] = slot
+        if self._vectors is not None:
+            self._vectors[slot] = self._vector(normalized)
+
+    def save_snapshot(self, path: str) -> int:
+        """Write unexpired entries (oldest first) to a JSON file; returns the count."""
+        now = time.time()
+        order = [(self._next_slot + offset) % self.max_entries for offset in range(self.max_entries)]
+        entries = [
+            [entry.normalized, entry.answer, entry.expires_at]
+            for entry in (self._slots[slot] for slot in order)
+            if entry is not None and entry.expires_at > now
+        ]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, handle)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def load_snapshot(self, path: str, fingerprint: str) -> int:
+        """Load a snapshot saved under the same model fingerprint; returns the count loaded."""
+        try:
+            with open(path, encoding="utf-8") as handle:
+                snapshot = json.load(handle)
+        except FileNotFoundError:
+            return 0
+        self.ensure_fingerprint(fingerprint)
+        if snapshot.get("fingerprint") != fingerprint:
+            return 0  # Answers from another model or system instruction
+        now = time.time()
+        loaded = 0
+        for normalized, answer, expires_at in snapshot.get("entries", [])[-self.max_entries:]:
+            if expires_at <= now or normalized in self._exact:
+                continue
+            slot = self._next_slot
+            self._drop(slot)
+            self._next_slot = (self._next_slot + 1) % self.max_entries
+            self._store(slot, normalized, answer, expires_at)
+            loaded += 1
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._exact),
+            "max_entries": self.max_entries,
+            "similarity": NUMPY_AVAILABLE,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    if not settings.ANSWER_CACHE_ENABLED or settings.ANSWER_CACHE_MAX_ENTRIES <= 0:
+        return None
+    if not NUMPY_AVAILABLE:
+        print("⚠️ numpy not installed; answer cache uses exact matches only")
+    return AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    )
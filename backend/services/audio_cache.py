@@ -0,0 +1,206 @@
+"""
+Content-addressed cache for synthesized speech.
+
+Keys are a SHA-256 of (normalized text, language code, voice, audio config), so the
+same reply spoken with the same settings is synthesized once. A byte-bounded
+in-memory LRU sits in front of an optional on-disk tier with size-based eviction.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from core.config import resolve_backend_path, settings
+
+AUDIO_FILE_SUFFIX = ".mp3"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a reply share one entry."""
+    return " ".join(text.split())
+
+
+def make_audio_key(text: str, language_code: str, voice: Dict[str, Any], audio_config: Dict[str, Any]) -> str:
+    material = json.dumps(
+        [normalize_text(text), language_code, voice, audio_config],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier (memory, disk) LRU cache of MP3 bytes keyed by content hash."""
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ) -> None:
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        if disk_dir:
+            self._load_disk_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + AUDIO_FILE_SUFFIX)
+
+    def _load_disk_index(self) -> None:
+        """Rebuild the disk LRU from existing files, oldest modification first."""
+        os.makedirs(self.disk_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(AUDIO_FILE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[: -len(AUDIO_FILE_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            self.bytes_saved += len(audio)
+            return audio
+
+        if self.disk_dir and key in self._disk:
+            try:
+                audio = await asyncio.to_thread(self._read_file, key)
+            except OSError:
+                self._forget_disk(key)
+            else:
+                self._disk.move_to_end(key)
+                self._remember(key, audio)
+                self.disk_hits += 1
+                self.bytes_saved += len(audio)
+                return audio
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, audio: bytes) -> None:
+        self._remember(key, audio)
+        if not self.disk_dir or key in self._disk or len(audio) > self.max_disk_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._write_file, key, audio)
+        except OSError as error:
+            print(f"⚠️ Could not write TTS cache file: {error}")
+            return
+        if key in self._disk:
+            # A concurrent put of the same key finished first; its size is already counted.
+            self._disk.move_to_end(key)
+            return
+        self._disk[key] = len(audio)
+        self._disk_bytes += len(audio)
+        while self._disk_bytes > self.max_disk_bytes:
+            oldest, _ = next(iter(self._disk.items()))
+            self._forget_disk(oldest)
+            try:
+                os.remove(self._path(oldest))
+            except OSError:
+                pass
+
+    async def preload(self, max_bytes: int) -> int:
+        """Copy the most recently used disk entries into memory (up to max_bytes); returns the count."""
+        if not self.disk_dir or max_bytes <= 0:
+            return 0
+        budget = min(max_bytes, self.max_memory_bytes)
+        keys = []
+        for key in reversed(self._disk):
+            size = self._disk[key]
+            if size > budget:
+                break
+            budget -= size
+            keys.append(key)
+        loaded = await asyncio.to_thread(self._read_files, keys)
+        # Oldest first, so the most recent entries end up most recently used in memory.
+        for key, audio in reversed(loaded):
+            self._remember(key, audio)
+        return len(loaded)
+
+    def _read_files(self, keys) -> list:
+        loaded = []
+        for key in keys:
+            try:
+                # Not _read_file: preloading must not reorder the disk tier.
+                with open(self._path(key), "rb") as handle:
+                    loaded.append((key, handle.read()))
+            except OSError:
+                continue
+        return loaded
+
+    def _forget_disk(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _read_file(self, key: str) -> bytes:
+        path = self._path(key)
+        with open(path, "rb") as handle:
+            audio = handle.read()
+        # Keep the on-disk order meaningful across restarts.
+        os.utime(path)
+        return audio
+
+    def _write_file(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        # Per-thread name: concurrent puts of one key must not write into the same temp file.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(audio)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+def create_audio_cache() -> Optional[AudioCache]:
+    """Build the cache configured in settings, or None if disabled."""
+    if settings.TTS_CACHE_MEMORY_BYTES <= 0 and not settings.TTS_CACHE_DIR:
+        return None
+    disk_dir = resolve_backend_path(settings.TTS_CACHE_DIR) if settings.TTS_CACHE_DIR else None
+    return AudioCache(
+        max_memory_bytes=max(0, settings.TTS_CACHE_MEMORY_BYTES),
+        disk_dir=disk_dir,
+        max_disk_bytes=settings.TTS_CACHE_DISK_BYTES,
+    )
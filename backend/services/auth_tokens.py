@@ -0,0 +1,103 @@
+"""
+Process-wide OAuth2 access token provider shared by Vertex AI and TTS.
+
+Credentials are loaded once and the access token is cached until shortly before it
+expires. Near expiry the token is refreshed in the background while callers keep
+using the still-valid one; concurrent callers never trigger parallel refreshes.
+"""
+import asyncio
+import contextvars
+import time
+from datetime import timezone
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from core.tracing import span
+
+# Both Vertex AI and Text-to-Speech/Translation accept the cloud-platform scope
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+# Refresh in the background once the token has less than this left
+REFRESH_AHEAD_SECONDS = 300
+# Never hand out a token with less than this left; refresh inline instead
+MIN_VALIDITY_SECONDS = 30
+# Used when the credentials do not report an expiry
+DEFAULT_TOKEN_TTL_SECONDS = 3000
+
+
+class TokenProvider:
+    """Caches credentials and access token; single-flight, refresh-ahead."""
+
+    def __init__(self, scopes=None) -> None:
+        self.scopes = list(scopes or [CLOUD_PLATFORM_SCOPE])
+        self._credentials = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.refreshes = 0
+        self.background_refreshes = 0
+        self.failures = 0
+
+    def _refresh_blocking(self):
+        """Load credentials (first time only) and refresh them. Runs in a worker thread."""
+        # google.auth and requests are only needed here; keep them off the import path.
+        from google.auth import default
+        from google.auth.transport.requests import Request
+
+        if self._credentials is None:
+            self._credentials, _ = default(scopes=self.scopes)
+        credentials = self._credentials
+        credentials.refresh(Request())
+        if credentials.expiry is not None:
+            expires_at = credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+        else:
+            expires_at = time.time() + DEFAULT_TOKEN_TTL_SECONDS
+        return credentials.token, expires_at
+
+    async def _refresh(self) -> str:
+        try:
+            with span("auth.token_refresh"):
+                token, expires_at = await asyncio.to_thread(self._refresh_blocking)
+        except Exception:
+            self.failures += 1
+            raise
+        self._token = token
+        self._expires_at = expires_at
+        self.refreshes += 1
+        return token
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            # Shared by every waiting request: don't attribute it to whichever one started it.
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh(), context=contextvars.Context())
+            # Background failures are retried by the next caller; don't warn about them.
+            self._refresh_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._refresh_task
+
+    async def get_token(self) -> str:
+        if settings.GOOGLE_STATIC_ACCESS_TOKEN:
+            return settings.GOOGLE_STATIC_ACCESS_TOKEN
+        remaining = self._expires_at - time.time()
+        if self._token and remaining > MIN_VALIDITY_SECONDS:
+            self.hits += 1
+            if remaining < REFRESH_AHEAD_SECONDS:
+                if self._refresh_task is None or self._refresh_task.done():
+                    self.background_refreshes += 1
+                self._start_refresh()
+            return self._token
+        # No usable token: wait for the (shared) refresh.
+        with span("auth.token_fetch"):
+            return await asyncio.shield(self._start_refresh())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "background_refreshes": self.background_refreshes,
+            "failures": self.failures,
+            "expires_in": max(0, int(self._expires_at - time.time())) if self._token else 0,
+        }
+
+
+token_provider = TokenProvider()
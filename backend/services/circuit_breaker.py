@@ -0,0 +1,207 @@
+"""
+Circuit breakers for upstream Google APIs (chat/Vertex AI, translate, TTS).
+
+Each breaker watches failures and slow calls over a sliding time window. When either
+rate crosses its threshold (after a minimum number of calls) the breaker opens and
+calls fail immediately with CircuitOpen instead of waiting out a 60 s timeout. After
+the open period one probe call is let through (half-open): success closes the
+breaker, failure opens it again.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+from core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_upstream_failure(status_code: int) -> bool:
+    """Statuses that say the upstream is in trouble (not that our request was bad)."""
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitOpen(Exception):
+    """The upstream's breaker is open; the call was not attempted."""
+
+    def __init__(self, upstream: str, retry_after: int) -> None:
+        super().__init__(f"{upstream} upstream is unavailable (circuit open); retry after {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class _Guard:
+    """Async context manager for one call; records its outcome and latency."""
+
+    __slots__ = ("breaker", "started", "probe")
+
+    def __init__(self, breaker: "CircuitBreaker") -> None:
+        self.breaker = breaker
+
+    async def __aenter__(self) -> None:
+        self.probe = self.breaker._admit()
+        self.started = time.monotonic()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.monotonic() - self.started
+        if exc_type is None:
+            self.breaker._record(True, elapsed, self.probe)
+        elif issubclass(exc_type, Exception):
+            self.breaker._record(False, elapsed, self.probe)
+        elif self.probe:
+            # Cancelled or client went away: no verdict, let another probe through.
+            self.breaker._probe_in_flight = False
+        return False
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_seconds: int = 30,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+    ) -> None:
+        self.name = name
+        self.window_seconds = max(1, window_seconds)
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # One [second, calls, failures, slow] bucket per second of the window
+        self._buckets: Deque[List[int]] = deque()
+        self._calls = 0
+        self._failures = 0
+        self._slow = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def guard(self) -> _Guard:
+        """`async with breaker.guard():` around one upstream call."""
+        return _Guard(self)
+
+    def check(self) -> None:
+        """
+        Raise CircuitOpen if a call now would be rejected, without claiming the probe:
+        lets a caller fail fast before doing preparatory work or queueing for a slot.
+        """
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            return
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            return
+        self.rejected += 1
+        raise CircuitOpen(self.name, self._retry_after(now))
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, int(self._opened_at + self.open_seconds - now + 0.999))
+
+    def _admit(self) -> bool:
+        """Raise CircuitOpen if the call may not proceed; True if it is the half-open probe."""
+        if self.state == CLOSED:
+            return False
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            print(f"🔶 {self.name} circuit half-open: sending a probe request")
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        raise CircuitOpen(self.name, self._retry_after(now))
+
+    def _expire(self, second: int) -> None:
+        while self._buckets and self._buckets[0][0] <= second - self.window_seconds:
+            _, calls, failures, slow = self._buckets.popleft()
+            self._calls -= calls
+            self._failures -= failures
+            self._slow -= slow
+
+    def _record(self, success: bool, elapsed: float, probe: bool) -> None:
+        now = time.monotonic()
+        slow = elapsed >= self.slow_call_seconds
+        if probe:
+            self._probe_in_flight = False
+            if success and not slow:
+                self._close()
+            else:
+                self._open(now, "probe failed")
+            return
+
+        second = int(now)
+        self._expire(second)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        self._calls += 1
+        if not success:
+            bucket[2] += 1
+            self._failures += 1
+        if slow:
+            bucket[3] += 1
+            self._slow += 1
+
+        if self.state == CLOSED and self._calls >= self.min_calls:
+            if self._failures / self._calls >= self.error_rate:
+                self._open(now, f"{self._failures}/{self._calls} calls failed")
+            elif self._slow / self._calls >= self.slow_call_rate:
+                self._open(now, f"{self._slow}/{self._calls} calls took over {self.slow_call_seconds:g}s")
+
+    def _open(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        print(f"🔴 {self.name} circuit open for {self.open_seconds:g}s: {reason}")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._buckets.clear()
+        self._calls = self._failures = self._slow = 0
+        print(f"🟢 {self.name} circuit closed")
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire(int(time.monotonic()))
+        state = self.state
+        if state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            state = HALF_OPEN  # The next call will be the probe
+        return {
+            "state": state,
+            "window_calls": self._calls,
+            "window_failures": self._failures,
+            "window_slow_calls": self._slow,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        window_seconds=settings.BREAKER_WINDOW_SECONDS,
+        min_calls=settings.BREAKER_MIN_CALLS,
+        error_rate=settings.BREAKER_ERROR_RATE,
+        slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate=settings.BREAKER_SLOW_CALL_RATE,
+        open_seconds=settings.BREAKER_OPEN_SECONDS,
+    )
+
+
+chat_breaker = _breaker("chat")
+translate_breaker = _breaker("translate")
+tts_breaker = _breaker("tts")
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {breaker.name: breaker.stats() for breaker in (chat_breaker, translate_breaker, tts_breaker)}
@@ -0,0 +1,287 @@
+"""
+Background email delivery for magic login links.
+
+Handlers enqueue a message and return right away. Worker tasks take messages off a
+bounded queue in batches and send each batch over one long-lived, already
+authenticated SMTP connection per worker (STARTTLS and AUTH happen once, not per
+email). smtplib is blocking, so each batch runs in a thread. Transient failures are
+retried with exponential backoff and jitter; permanent (5xx) rejections are not.
+
+SMTP is configured from the environment as before: SMTP_HOST, SMTP_PORT, SMTP_USER,
+SMTP_PASS, SMTP_FROM and SMTP_USE_TLS.
+"""
+import asyncio
+import os
+import random
+import smtplib
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+
+# Send NOOP before reusing a connection that has been idle this long
+SMTP_NOOP_AFTER_SECONDS = 30.0
+
+
+class SMTPConfig:
+    def __init__(self, host: str, port: int, user: Optional[str], password: Optional[str],
+                 from_email: str, use_tls: bool, timeout: float = 20.0) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.from_email = from_email
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> Optional["SMTPConfig"]:
+        """None when SMTP_HOST is not set (login links are then shown in dev mode)."""
+        host = os.getenv("SMTP_HOST")
+        if not host:
+            return None
+        user = os.getenv("SMTP_USER")
+        return cls(
+            host=host,
+            port=int(os.getenv("SMTP_PORT", "587")),
+            user=user,
+            password=os.getenv("SMTP_PASS"),
+            from_email=os.getenv("SMTP_FROM", user or "no-reply@example.com"),
+            use_tls=os.getenv("SMTP_USE_TLS", "true").lower() == "true",
+        )
+
+
+class OutgoingEmail:
+    __slots__ = ("to_email", "message", "attempts")
+
+    def __init__(self, to_email: str, message: str) -> None:
+        self.to_email = to_email
+        self.message = message
+        self.attempts = 0
+
+
+class PooledSMTPConnection:
+    """One reusable SMTP session; reconnects when the server has dropped it."""
+
+    def __init__(self, config: SMTPConfig) -> None:
+        self.config = config
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.config.host, self.config.port, timeout=self.config.timeout)
+        try:
+            if self.config.use_tls:
+                smtp.starttls()
+            if self.config.user and self.config.password:
+                smtp.login(self.config.user, self.config.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connects += 1
+        return smtp
+
+    def _ensure(self) -> smtplib.SMTP:
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_NOOP_AFTER_SECONDS:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send_batch(self, batch: List[OutgoingEmail]) -> List[Tuple[OutgoingEmail, Exception, bool]]:
+        """Send every email; returns (email, error, retryable) for the ones that failed."""
+        failures = []
+        for email in batch:
+            try:
+                self._ensure().sendmail(self.config.from_email, [email.to_email], email.message)
+            except smtplib.SMTPRecipientsRefused as error:
+                # Refused at RCPT: greylisting (450/451) is temporary, 550 is not.
+                code = error.recipients.get(email.to_email, (550, b""))[0]
+                failures.append((email, error, 400 <= code < 500))
+            except smtplib.SMTPResponseException as error:
+                # 4xx is temporary (greylisting, rate limits); 5xx is final.
+                failures.append((email, error, 400 <= error.smtp_code < 500))
+            except (smtplib.SMTPException, OSError) as error:
+                # Connection-level problem: reconnect for the rest of the batch.
+                self.close()
+                failures.append((email, error, True))
+            self._last_used = time.monotonic()
+        return failures
+
+    def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+class EmailQueue:
+    """Bounded queue drained by worker tasks, each with its own pooled SMTP connection."""
+
+    def __init__(
+        self,
+        config: Optional[SMTPConfig],
+        max_size: int = 1000,
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2.0,
+        idle_close_seconds: float = 60.0,
+    ) -> None:
+        self.config = config
+        self.max_size = max_size
+        self.worker_count = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.idle_close_seconds = idle_close_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._connections: List[PooledSMTPConnection] = []
+        self._retries: Set[asyncio.Task] = set()
+        self.enqueued = 0
+        self.sent = 0
+        self.batches = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def configured(self) -> bool:
+        return self.config is not None
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        # Like the HTTP client: queue and workers belong to the loop that started them.
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._loop = loop
+            self._connections = [PooledSMTPConnection(self.config) for _ in range(self.worker_count)]
+            self._workers = [loop.create_task(self._worker(connection)) for connection in self._connections]
+        return self._queue
+
+    def enqueue(self, to_email: str, message: str) -> bool:
+        """Queue an email for delivery; False if SMTP is not configured or the queue is full."""
+        if self.config is None:
+            return False
+        try:
+            self._ensure_workers().put_nowait(OutgoingEmail(to_email, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _next_batch(self, queue: asyncio.Queue, first: OutgoingEmail) -> List[OutgoingEmail]:
+        batch = [first]
+        while len(batch) < self.batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+        return batch
+
+    async def _worker(self, connection: PooledSMTPConnection) -> None:
+        queue = self._queue
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(queue.get(), self.idle_close_seconds)
+                except asyncio.TimeoutError:
+                    # Nothing to send: don't hold the server's connection slot.
+                    await asyncio.to_thread(connection.close)
+                    continue
+                batch = self._next_batch(queue, first)
+                try:
+                    failures = await asyncio.to_thread(connection.send_batch, batch)
+                except Exception as error:
+                    failures = [(email, error, True) for email in batch]
+                self.batches += 1
+                self.sent += len(batch) - len(failures)
+                for email, error, retryable in failures:
+                    self._retry_or_fail(email, error, retryable)
+                for _ in batch:
+                    queue.task_done()
+        finally:
+            # QUIT waits on the server: keep it off the loop during shutdown too.
+            await asyncio.to_thread(connection.close)
+
+    def _retry_or_fail(self, email: OutgoingEmail, error: Exception, retryable: bool) -> None:
+        email.attempts += 1
+        if not retryable or email.attempts >= self.max_attempts:
+            self.failed += 1
+            print(f"❌ Email to {email.to_email} failed after {email.attempts} attempt(s): {error}")
+            return
+        delay = self.retry_base_seconds * (2 ** (email.attempts - 1)) * random.uniform(0.5, 1.5)
+        self.retried += 1
+        print(f"⚠️ Email to {email.to_email} failed ({error}); retrying in {delay:.1f}s")
+        task = self._loop.create_task(self._requeue_after(email, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue_after(self, email: OutgoingEmail, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            self._queue.put_nowait(email)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"❌ Email to {email.to_email} dropped: queue full")
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait (up to timeout) until everything queued so far has been attempted."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, drain_timeout: float = 5.0) -> None:
+        """Flush what is queued (bounded by drain_timeout), then stop the workers."""
+        await self.drain(drain_timeout)
+        tasks = self._workers + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        if tasks and self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._retries = set()
+        self._queue = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "configured": self.configured,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "retry_pending": len(self._retries),
+            "max_size": self.max_size,
+            "workers": len(self._workers),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "smtp_connects": sum(connection.connects for connection in self._connections),
+        }
+
+
+def create_email_queue() -> EmailQueue:
+    return EmailQueue(
+        SMTPConfig.from_env(),
+        max_size=settings.EMAIL_QUEUE_MAX_SIZE,
+        workers=settings.EMAIL_WORKERS,
+        batch_size=settings.EMAIL_BATCH_SIZE,
+        max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+        retry_base_seconds=settings.EMAIL_RETRY_BASE_SECONDS,
+    )
+
+
+email_queue = create_email_queue()
@@ -0,0 +1,145 @@
+"""
+Token-budgeted conversation windowing with a rolling background summary.
+
+Only the most recent turns that fit HISTORY_TOKEN_BUDGET are sent verbatim. Older
+turns are folded into a per-session summary by a background task, so the request
+payload stays bounded however long a session runs.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.session_store import Turn
+from services.sqlite_db import run_store
+
+# Roughly 4 characters per token for English prose (Gemini tokenizer averages ~4)
+CHARS_PER_TOKEN = 4
+# Per-turn framing overhead (role, part wrappers)
+TURN_OVERHEAD_TOKENS = 4
+# Start summarizing once history passes this share of the budget, so the summary is
+# ready before turns actually fall out of the window.
+SUMMARY_TRIGGER_RATIO = 0.75
+
+SUMMARY_PREFIX = "Summary of our earlier conversation (for context):\n"
+SUMMARY_ACK = "Thank you, I will keep that in mind."
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate; no tokenizer round trip."""
+    return len(text) // CHARS_PER_TOKEN + TURN_OVERHEAD_TOKENS
+
+
+def window_start(conversation: List[Turn], budget: int, min_recent_turns: int) -> int:
+    """
+    Index of the first turn to send verbatim so that turns[start:] fit in budget.
+
+    Always keeps at least min_recent_turns, and starts on a user turn (even index)
+    so the window never opens with a dangling model reply.
+    """
+    used = 0
+    start = len(conversation)
+    while start > 0:
+        cost = estimate_tokens(conversation[start - 1].text)
+        if used + cost > budget and len(conversation) - start >= min_recent_turns:
+            break
+        used += cost
+        start -= 1
+    if start % 2:
+        start += 1
+    return start
+
+
+_SUMMARY_ACK_TURN = Turn("model", SUMMARY_ACK)
+
+
+def summary_contents(summary_text: str) -> List[Turn]:
+    """The rolling summary as a leading user/model exchange."""
+    return [Turn("user", SUMMARY_PREFIX + summary_text), _SUMMARY_ACK_TURN]
+
+
+def build_summary_prompt(previous_summary: Optional[str], turns: List[Turn]) -> str:
+    lines = []
+    for turn in turns:
+        speaker = "User" if turn.role == "user" else "Assistant"
+        lines.append(f"{speaker}: {turn.text}")
+    previous = previous_summary or "(none)"
+    return (
+        "Summarize this conversation between an elderly user and their healthcare assistant "
+        "in at most 150 words. Keep medications, doses, appointments, symptoms, names and "
+        "stated preferences. Return only the summary.\n\n"
+        f"Previous summary: {previous}\n\n"
+        "New conversation turns:\n" + "\n".join(lines)
+    )
+
+
+class HistorySummarizer:
+    """Runs at most one background summarization per session."""
+
+    def __init__(self, summarize: Callable[[str], Awaitable[str]]) -> None:
+        self._summarize = summarize
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def schedule(self, store, session_id: str, summary: Optional[Tuple[str, int]], fold_until: int,
+                 conversation: List[Turn]) -> None:
+        """Fold conversation[covered:fold_until] into the summary, off the request path."""
+        task = self._tasks.get(session_id)
+        if task is not None and not task.done():
+            return
+        previous_text, covered = summary or (None, 0)
+        turns = list(conversation[covered:fold_until])
+        if not turns:
+            return
+        self._tasks[session_id] = asyncio.get_running_loop().create_task(
+            self._run(store, session_id, previous_text, fold_until, turns)
+        )
+
+    async def _run(self, store, session_id: str, previous_text: Optional[str], fold_until: int,
+                   turns: List[Turn]) -> None:
+        try:
+            text = (await self._summarize(build_summary_prompt(previous_text, turns))).strip()
+            if text:
+                await run_store(store.set_summary, session_id, text, fold_until)
+                self.completed += 1
+        except Exception as error:
+            self.failed += 1
+            print(f"⚠️ History summarization failed for {session_id}: {error}")
+        finally:
+            self._tasks.pop(session_id, None)
+
+
+async def windowed_contents(
+    store,
+    summarizer: Optional[HistorySummarizer],
+    session_id: str,
+    conversation: List[Turn],
+    new_message: str,
+) -> List[Turn]:
+    """
+    History to send for this turn: [summary pair] + recent turns that fit the budget.
+
+    Returns the conversation unchanged when it already fits (or windowing is disabled).
+    """
+    budget = settings.HISTORY_TOKEN_BUDGET
+    if budget <= 0 or not conversation:
+        return conversation
+    budget = max(0, budget - estimate_tokens(new_message))
+    min_recent = settings.HISTORY_MIN_RECENT_TURNS
+
+    start = window_start(conversation, budget, min_recent)
+    fold_until = window_start(conversation, int(budget * SUMMARY_TRIGGER_RATIO), min_recent)
+    if fold_until == 0:
+        return conversation
+
+    summary = await run_store(store.get_summary, session_id)
+    covered = summary[1] if summary else 0
+    if summarizer is not None and settings.HISTORY_SUMMARY_ENABLED and covered < fold_until:
+        summarizer.schedule(store, session_id, summary, fold_until, conversation)
+
+    if start == 0:
+        return conversation
+    recent = conversation[start:]
+    if summary:
+        return summary_contents(summary[0]) + recent
+    return recent
@@ -0,0 +1,74 @@
+"""
+Shared async HTTP transport for Google Cloud APIs (Vertex AI, Text-to-Speech, Translation).
+
+One pooled httpx.AsyncClient per process: keep-alive connections (and HTTP/2 when
+available) are reused across requests instead of opening a new TLS connection per call.
+"""
+import asyncio
+from typing import Optional
+
+import httpx
+
+from core.config import settings
+from core.metrics import record_upstream
+from core.tracing import span
+
+try:
+    import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.HTTP2_ENABLED and H2_AVAILABLE
+    if settings.HTTP2_ENABLED and not H2_AVAILABLE:
+        print("⚠️ HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    # Per-call read timeouts are passed by the services; this is only the default.
+    timeout = httpx.Timeout(60.0, connect=settings.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    # Pooled connections belong to the loop that opened them (test clients may run
+    # each request on a fresh loop), so rebuild the client if the loop changed.
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _build_client()
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close pooled connections (called on application shutdown)."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def post_upstream(upstream: str, stage: str, url: str, **kwargs) -> httpx.Response:
+    """
+    POST on the shared client, recording the stage latency, the response status and
+    the payload sizes for /metrics. Arguments are passed through to httpx.
+    """
+    try:
+        with span(stage):
+            response = await get_http_client().post(url, **kwargs)
+    except httpx.HTTPError:
+        record_upstream(upstream, None)
+        raise
+    record_upstream(upstream, response.status_code, len(response.request.content), len(response.content))
+    return response
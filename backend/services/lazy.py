@@ -0,0 +1,83 @@
+"""
+Lazily constructed, retryable service singletons.
+
+The Vertex AI and text-to-speech services used to be built when their modules were
+imported, so a cold start paid for google.auth, numpy and an ADC lookup before the
+first request, and a failed construction (missing .env, a credential hiccup) left
+the process in fallback mode until restart.
+
+LazyService builds its service on first use, in a worker thread (constructors may
+block on credential discovery), with concurrent callers sharing one attempt. A
+failure is remembered for a retry interval, during which callers get None straight
+away and fall back; the next call after it tries again.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+from services.singleflight import SingleFlight
+
+T = TypeVar("T")
+
+
+class LazyService(Generic[T]):
+    def __init__(self, name: str, factory: Callable[[], T], retry_seconds: float = 30.0) -> None:
+        self.name = name
+        self.factory = factory
+        self.retry_seconds = retry_seconds
+        self._instance: Optional[T] = None
+        self._flight = SingleFlight(name)
+        self._failed_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def instance(self) -> Optional[T]:
+        """The service if it has been built; never triggers construction."""
+        return self._instance
+
+    def set(self, instance: Optional[T]) -> None:
+        """Install (or clear) the service directly, e.g. a stand-in for benchmarks."""
+        self._instance = instance
+        self._failed_at = None
+        self.error = None
+
+    async def get(self, force: bool = False) -> Optional[T]:
+        """
+        The service, building it if needed; None while it is unavailable. With
+        force=True a recent failure doesn't stop another attempt (warm-up retries).
+        """
+        if self._instance is not None:
+            return self._instance
+        if not force and self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+            return None
+        return await self._flight.do(None, self._load)
+
+    async def _load(self) -> Optional[T]:
+        self.attempts += 1
+        started = time.perf_counter()
+        try:
+            instance = await asyncio.to_thread(self.factory)
+        except Exception as error:
+            self._failed_at = time.monotonic()
+            self.error = str(error)
+            print(f"⚠️ {self.name} not available: {error} (retrying in {self.retry_seconds:g}s)")
+            return None
+        self.load_seconds = time.perf_counter() - started
+        self._instance = instance
+        self._failed_at = None
+        self.error = None
+        return instance
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = None
+        if self._instance is None and self._failed_at is not None:
+            retry_in = max(0.0, round(self._failed_at + self.retry_seconds - time.monotonic(), 1))
+        return {
+            "loaded": self._instance is not None,
+            "attempts": self.attempts,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+            "retry_in_seconds": retry_in,
+        }
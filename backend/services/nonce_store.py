@@ -0,0 +1,159 @@
+"""
+Single-use nonce storage for magic login links.
+
+A nonce is issued with the link's expiry and consumed at most once. Entries only
+matter until that expiry (after it the signed token is rejected anyway), so both
+stores drop expired nonces, consumed or not, incrementally.
+
+InMemoryNonceStore keeps a min-heap on expiry next to the nonce dict: each call pops
+whatever has expired from the top of the heap, O(log n) per purged entry, and the
+entry count is capped. SQLiteNonceStore keeps nonces in a shared WAL-mode SQLite file
+so a link issued by one uvicorn worker can be verified by another.
+"""
+import heapq
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import resolve_backend_path, settings
+from services.sqlite_db import open_connection, store_executor
+
+# consume() results
+NONCE_OK = "ok"
+NONCE_UNKNOWN = "unknown"
+NONCE_USED = "used"
+NONCE_EXPIRED = "expired"
+
+
+class NonceStore:
+    """Interface shared by the in-memory and SQLite stores (async callers use run_store)."""
+
+    # Set by stores whose calls block (SQLite); None means call inline on the loop.
+    executor: Optional[Executor] = None
+
+    def issue(self, nonce: str, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def consume(self, nonce: str) -> str:
+        """Mark nonce used; returns NONCE_OK, or why it cannot be used."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class InMemoryNonceStore(NonceStore):
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        # nonce -> (expires_at, used)
+        self._nonces: Dict[str, Tuple[float, bool]] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.purged = 0
+        self.evicted = 0
+
+    def _purge(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            _, nonce = heapq.heappop(heap)
+            if self._nonces.pop(nonce, None) is not None:
+                self.purged += 1
+
+    def issue(self, nonce: str, expires_at: float) -> None:
+        self._purge(time.time())
+        while len(self._nonces) >= self.max_entries:
+            # Full of live links: the one closest to expiring stops working early.
+            _, oldest = heapq.heappop(self._expiry_heap)
+            if self._nonces.pop(oldest, None) is not None:
+                self.evicted += 1
+        self._nonces[nonce] = (expires_at, False)
+        heapq.heappush(self._expiry_heap, (expires_at, nonce))
+
+    def consume(self, nonce: str) -> str:
+        now = time.time()
+        entry = self._nonces.get(nonce)
+        self._purge(now)
+        if entry is None:
+            return NONCE_UNKNOWN
+        expires_at, used = entry
+        if used:
+            return NONCE_USED
+        if now > expires_at:
+            return NONCE_EXPIRED
+        # Kept (as used) until it expires, so a replay says "already used".
+        self._nonces[nonce] = (expires_at, True)
+        return NONCE_OK
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "nonces": len(self._nonces),
+            "max_entries": self.max_entries,
+            "purged": self.purged,
+            "evicted": self.evicted,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS magic_nonces (
+    nonce TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS magic_nonces_expires ON magic_nonces (expires_at);
+"""
+
+_SQL_ISSUE = "INSERT OR REPLACE INTO magic_nonces (nonce, expires_at, used) VALUES (?, ?, 0)"
+_SQL_CONSUME = "UPDATE magic_nonces SET used = 1 WHERE nonce = ? AND used = 0 AND expires_at >= ?"
+_SQL_GET = "SELECT expires_at, used FROM magic_nonces WHERE nonce = ?"
+_SQL_PURGE = "DELETE FROM magic_nonces WHERE expires_at < ?"
+
+# Delete expired rows once per this many issued nonces
+_PURGE_EVERY_ISSUES = 100
+
+
+class SQLiteNonceStore(NonceStore):
+    """Nonces shared by every worker using the same SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = open_connection(path, _SCHEMA)
+        self._lock = threading.Lock()
+        self.executor = store_executor("nonces")
+        self._issued = 0
+        self.purged = 0
+
+    def issue(self, nonce: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(_SQL_ISSUE, (nonce, expires_at))
+            self._issued += 1
+            if self._issued % _PURGE_EVERY_ISSUES == 0:
+                # Range delete on the expiry index
+                self.purged += self._conn.execute(_SQL_PURGE, (time.time(),)).rowcount
+
+    def consume(self, nonce: str) -> str:
+        now = time.time()
+        with self._lock:
+            # One conditional UPDATE, so two workers can never both consume a nonce.
+            if self._conn.execute(_SQL_CONSUME, (nonce, now)).rowcount == 1:
+                return NONCE_OK
+            row = self._conn.execute(_SQL_GET, (nonce,)).fetchone()
+        if row is None:
+            return NONCE_UNKNOWN
+        _, used = row
+        return NONCE_USED if used else NONCE_EXPIRED
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM magic_nonces").fetchone()
+        return {"backend": "sqlite", "path": self.path, "nonces": count, "purged": self.purged}
+
+
+def create_nonce_store() -> NonceStore:
+    """Build the nonce store configured in settings (NONCE_STORE_BACKEND)."""
+    backend = settings.NONCE_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteNonceStore(resolve_backend_path(settings.NONCE_SQLITE_PATH))
+    if backend != "memory":
+        raise ValueError(f"Unknown NONCE_STORE_BACKEND: {settings.NONCE_STORE_BACKEND}")
+    return InMemoryNonceStore(max_entries=settings.NONCE_MAX_ENTRIES)
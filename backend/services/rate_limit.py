@@ -0,0 +1,269 @@
+"""
+Per-identity token-bucket rate limiting.
+
+Each (bucket, identity) pair refills at `rate` tokens per second up to `burst`; a
+request takes one token or is rejected with RateLimited (HTTP 429 + Retry-After).
+Buckets are configured per endpoint group: "chat", "tts" and "login".
+
+InMemoryRateLimiter gives each bucket name its own table, sharded over independently
+locked dicts (so it is safe from thread-pool code as well as the event loop), and drops buckets that have refilled
+completely, since a full bucket carries no state. A shard full of partly drained
+buckets rejects new identities until one refills, rather than evicting a live
+bucket (which would hand its owner a fresh burst). SQLiteRateLimiter keeps buckets in a shared
+WAL-mode SQLite file so the limits hold across uvicorn workers on one host; its checks
+run on a dedicated thread so a locked database never stalls the event loop.
+"""
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import resolve_backend_path, settings
+from services.sqlite_db import open_connection, run_store, store_executor
+
+
+_monotonic = time.monotonic
+
+
+class RateLimited(Exception):
+    """An identity has used up its request budget for a bucket."""
+
+    def __init__(self, bucket: str, retry_after: float) -> None:
+        super().__init__(f"Rate limit exceeded for {bucket}; retry after {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Interface: take one token from a bucket, or say how long until one is available."""
+
+    # Set by limiters whose checks block (SQLite); None means check inline on the loop.
+    executor: Optional[Executor] = None
+
+    def try_acquire(self, bucket: str, identity: str, rate: float, burst: float) -> float:
+        """Return 0.0 if a token was taken, else the seconds until one will be."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets", "sweep_after")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # identity -> [tokens, last refill (monotonic)]
+        self.buckets: Dict[str, List[float]] = {}
+        # When full: the earliest time a sweep can free a slot
+        self.sweep_after = 0.0
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """
+    Process-local buckets; lock-sharded so concurrent checks rarely contend.
+
+    Each bucket name ("chat", "login", ...) has its own shards and so its own capacity:
+    a flood of made-up identities on the unauthenticated login bucket can fill only
+    that table, never crowd out chat or TTS users.
+    """
+
+    def __init__(self, shards: int = 64, max_keys_per_shard: int = 4096) -> None:
+        # Power of two, so the shard index is a mask instead of a modulo
+        self._mask = (1 << max(0, shards - 1).bit_length()) - 1
+        self.max_keys_per_shard = max_keys_per_shard
+        self._tables: Dict[str, List[_Shard]] = {}
+        self._tables_lock = threading.Lock()
+        self.swept = 0
+        self.rejected_full = 0
+
+    def _table(self, bucket: str) -> List[_Shard]:
+        table = self._tables.get(bucket)
+        if table is None:
+            with self._tables_lock:
+                table = self._tables.setdefault(bucket, [_Shard() for _ in range(self._mask + 1)])
+        return table
+
+    def try_acquire(self, bucket: str, identity: str, rate: float, burst: float) -> float:
+        shard = self._table(bucket)[hash(identity) & self._mask]
+        with shard.lock:
+            now = _monotonic()
+            state = shard.buckets.get(identity)
+            if state is None:
+                if len(shard.buckets) >= self.max_keys_per_shard:
+                    wait = self._sweep(shard, now, rate, burst)
+                    if wait:
+                        self.rejected_full += 1
+                        return wait
+                shard.buckets[identity] = [burst - 1.0, now]
+                return 0.0
+            tokens = state[0] + (now - state[1]) * rate
+            if tokens > burst:
+                tokens = burst
+            state[1] = now
+            if tokens >= 1.0:
+                state[0] = tokens - 1.0
+                return 0.0
+            state[0] = tokens
+            return (1.0 - tokens) / rate
+
+    def _sweep(self, shard: _Shard, now: float, rate: float, burst: float) -> float:
+        """
+        Drop buckets that have refilled. Returns 0.0 if that freed a slot, else the
+        seconds until the first remaining bucket refills; live buckets are never
+        evicted (that would hand their owner a fresh burst).
+        """
+        if now < shard.sweep_after:
+            return shard.sweep_after - now
+        full = []
+        next_refill = float("inf")
+        for identity, (tokens, last) in shard.buckets.items():
+            refill_in = (burst - tokens) / rate - (now - last)
+            if refill_in <= 0:
+                full.append(identity)
+            elif refill_in < next_refill:
+                next_refill = refill_in
+        for identity in full:
+            del shard.buckets[identity]
+        self.swept += len(full)
+        if len(shard.buckets) < self.max_keys_per_shard:
+            return 0.0
+        # Every bucket is live: don't rescan until one of them can have refilled.
+        shard.sweep_after = now + next_refill
+        return next_refill
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "shards": self._mask + 1,
+            "buckets": {
+                bucket: sum(len(shard.buckets) for shard in table) for bucket, table in list(self._tables.items())
+            },
+            "max_buckets_per_name": (self._mask + 1) * self.max_keys_per_shard,
+            "swept": self.swept,
+            "rejected_full": self.rejected_full,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    bucket TEXT NOT NULL,
+    identity TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (bucket, identity)
+) WITHOUT ROWID;
+"""
+
+_SQL_GET_BUCKET = "SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ? AND identity = ?"
+_SQL_PUT_BUCKET = "INSERT OR REPLACE INTO rate_buckets (bucket, identity, tokens, updated_at) VALUES (?, ?, ?, ?)"
+_SQL_DELETE_IDLE = "DELETE FROM rate_buckets WHERE bucket = ? AND updated_at < ?"
+
+# Remove refilled buckets once per this many checks
+_PRUNE_EVERY_CHECKS = 1000
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Buckets shared by every worker using the same SQLite file (wall-clock time)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Each check is one BEGIN IMMEDIATE read-modify-write.
+        self._conn = open_connection(path, _SCHEMA)
+        self._lock = threading.Lock()
+        self._checks = 0
+        self.executor = store_executor("rate-limits")
+
+    def try_acquire(self, bucket: str, identity: str, rate: float, burst: float) -> float:
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(_SQL_GET_BUCKET, (bucket, identity)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0 if tokens >= 1.0 else (1.0 - tokens) / rate
+                if not wait:
+                    tokens -= 1.0
+                self._conn.execute(_SQL_PUT_BUCKET, (bucket, identity, tokens, now))
+                self._checks += 1
+                if self._checks % _PRUNE_EVERY_CHECKS == 0:
+                    # Idle long enough to have refilled: the row carries no state.
+                    self._conn.execute(_SQL_DELETE_IDLE, (bucket, now - burst / rate))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()
+        return {"backend": "sqlite", "path": self.path, "buckets": count}
+
+
+class RateLimits:
+    """Named bucket policies (requests per minute, burst) on top of one limiter."""
+
+    def __init__(self, limiter: RateLimiter, policies: Dict[str, Tuple[float, float]]) -> None:
+        self.limiter = limiter
+        for name, (per_minute, burst) in policies.items():
+            # Refill and Retry-After divide by the rate; a bucket under 1 token never admits.
+            if per_minute <= 0 or burst < 1:
+                raise ValueError(f"Rate limit policy {name!r} needs a positive rate and a burst of at least 1")
+        # Stored as (tokens per second, burst)
+        self.policies = {name: (per_minute / 60.0, burst) for name, (per_minute, burst) in policies.items()}
+        self.allowed: Dict[str, int] = {name: 0 for name in policies}
+        self.limited: Dict[str, int] = {name: 0 for name in policies}
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        return self.limiter.executor
+
+    def check(self, bucket: str, identity: str) -> None:
+        rate, burst = self.policies[bucket]
+        wait = self.limiter.try_acquire(bucket, identity, rate, burst)
+        if wait:
+            self.limited[bucket] += 1
+            raise RateLimited(bucket, wait)
+        self.allowed[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.limiter.stats(),
+            "policies": {
+                name: {"per_minute": round(rate * 60, 2), "burst": burst}
+                for name, (rate, burst) in self.policies.items()
+            },
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+        }
+
+
+def create_rate_limits() -> Optional[RateLimits]:
+    """Build the limiter configured in settings, or None if rate limiting is disabled."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    backend = settings.RATE_LIMIT_BACKEND.lower()
+    if backend == "sqlite":
+        limiter: RateLimiter = SQLiteRateLimiter(resolve_backend_path(settings.RATE_LIMIT_SQLITE_PATH))
+    elif backend == "memory":
+        limiter = InMemoryRateLimiter()
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+    return RateLimits(limiter, {
+        "chat": (settings.CHAT_RATE_PER_MINUTE, settings.CHAT_RATE_BURST),
+        "tts": (settings.TTS_RATE_PER_MINUTE, settings.TTS_RATE_BURST),
+        "login": (settings.LOGIN_RATE_PER_MINUTE, settings.LOGIN_RATE_BURST),
+    })
+
+
+rate_limits = create_rate_limits()
+
+
+async def enforce_rate_limit(bucket: str, identity: str) -> None:
+    """
+    Take a token for identity from the named bucket; raises RateLimited when empty.
+    SQLite checks run on the limiter's own thread, in-memory ones inline.
+    """
+    if rate_limits is not None:
+        await run_store(rate_limits.check, bucket, identity)
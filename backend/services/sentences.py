@@ -0,0 +1,106 @@
+"""
+Sentence splitting for speech synthesis.
+
+Long replies are synthesized as several size-bounded chunks that end on sentence
+boundaries, so each chunk sounds natural on its own and stays under the TTS input limit.
+"""
+import re
+from typing import Iterator, List
+
+# Sentence end: terminal punctuation, optionally followed by closing quotes/brackets,
+# then whitespace
+_SENTENCE_END = re.compile(r"[.!?…。！？]+[\"'”’)\]]*(?=\s)")
+# Titles and abbreviations whose trailing period does not end a sentence
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "vs", "etc", "e.g", "i.e", "approx", "no"}
+# Fallback split points inside an over-long sentence
+_CLAUSE_END = re.compile(r"(?<=[,;:，；])\s+")
+
+
+def _sentence_ends(text: str) -> Iterator[int]:
+    """Offsets just past each sentence end that is already followed by whitespace."""
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        words = text[start:match.start()].split()
+        if match.group() == "." and words and words[-1].lower() in _ABBREVIATIONS:
+            continue
+        yield match.end()
+        start = match.end()
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences: List[str] = []
+    start = 0
+    for end in _sentence_ends(text):
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break one sentence that exceeds max_chars at clauses, then at spaces."""
+    pieces: List[str] = []
+    current = ""
+    for part in _CLAUSE_END.split(sentence):
+        for word in part.split(" ") if len(part) > max_chars else [part]:
+            candidate = f"{current} {word}" if current else word
+            if len(candidate) <= max_chars or not current:
+                current = candidate
+            else:
+                pieces.append(current)
+                current = word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Greedily pack whole sentences into chunks of at most max_chars characters."""
+    chunks: List[str] = []
+    current = ""
+    for sentence in split_sentences(text):
+        for piece in _split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence]:
+            candidate = f"{current} {piece}" if current else piece
+            if len(candidate) <= max_chars:
+                current = candidate
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class SentenceBuffer:
+    """
+    Collects streamed text and releases it in whole sentences.
+
+    Text is released once at least min_chars of complete sentences have built up, so
+    very short sentences ("Yes.") are grouped with the next one instead of being
+    synthesized on their own.
+    """
+
+    def __init__(self, min_chars: int = 40) -> None:
+        self.min_chars = min_chars
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        boundary = 0
+        for boundary in _sentence_ends(self._pending):
+            pass
+        complete = self._pending[:boundary].strip()
+        if len(complete) < self.min_chars:
+            return []
+        self._pending = self._pending[boundary:].lstrip()
+        return [" ".join(complete.split())]
+
+    def flush(self) -> List[str]:
+        rest = self._pending.strip()
+        self._pending = ""
+        return [rest] if rest else []
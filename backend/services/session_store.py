@@ -0,0 +1,472 @@
+"""
+Conversation session storage for the chatbot.
+
+InMemorySessionStore bounds memory by session count, total byte budget and idle TTL.
+Sessions are kept in least-recently-used order, so every eviction pops from the
+front of an OrderedDict in O(1).
+
+SQLiteSessionStore keeps history in a WAL-mode SQLite file so several uvicorn workers
+on one host share sessions, with a small per-process read-through cache in front.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import resolve_backend_path, settings
+from services.sqlite_db import open_connection, store_executor
+
+# Rough per-turn bookkeeping cost (object, list slot) on top of text and cached JSON
+TURN_OVERHEAD_BYTES = 80
+
+
+class Turn:
+    """
+    One conversation turn.
+
+    Its generateContent encoding ({"role", "parts": [{"text"}]}) is produced once and
+    cached, so request bodies are assembled by joining pre-encoded fragments.
+    """
+
+    __slots__ = ("role", "text", "_encoded")
+
+    def __init__(self, role: str, text: str) -> None:
+        self.role = role
+        self.text = text
+        self._encoded: Optional[bytes] = None
+
+    @property
+    def encoded(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = json.dumps(
+                {"role": self.role, "parts": [{"text": self.text}]},
+                separators=(",", ":"),
+            ).encode("utf-8")
+        return self._encoded
+
+    def __repr__(self) -> str:
+        return f"Turn({self.role!r}, {self.text!r})"
+
+
+def turn_size(turn: Turn) -> int:
+    """Approximate memory footprint of one turn (text plus its cached encoding)."""
+    return 2 * len(turn.text) + TURN_OVERHEAD_BYTES
+
+
+class SessionStore:
+    """Interface for conversation history backends (async callers use run_store)."""
+
+    # Set by stores whose calls block (SQLite); None means call inline on the loop.
+    executor: Optional[Executor] = None
+
+    def get(self, session_id: str) -> List[Turn]:
+        """Return the session history (oldest first); empty if unknown or expired."""
+        raise NotImplementedError
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        """Append turns (normally one user/model pair), creating the session if needed."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns True if it existed."""
+        raise NotImplementedError
+
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int]]:
+        """Rolling summary as (text, number of leading turns it covers), if any."""
+        raise NotImplementedError
+
+    def set_summary(self, session_id: str, text: str, covered: int) -> None:
+        """Store the rolling summary; ignored if the session no longer exists."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class _Session:
+    __slots__ = ("turns", "nbytes", "last_access", "summary")
+
+    def __init__(self, now: float) -> None:
+        self.turns: List[Turn] = []
+        self.nbytes = 0
+        self.last_access = now
+        self.summary: Optional[Tuple[str, int]] = None
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store with LRU + idle-TTL eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl_seconds: float = 72 * 60 * 60,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"capacity": 0, "bytes": 0, "ttl": 0}
+        self.trimmed_turns = 0
+
+    def _pop_oldest(self, reason: str) -> None:
+        _, session = self._sessions.popitem(last=False)
+        self._bytes -= session.nbytes
+        self.evictions[reason] += 1
+
+    def _expire(self, now: float) -> None:
+        # LRU order is also idle order: expired sessions are always at the front.
+        cutoff = now - self.idle_ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_access > cutoff:
+                break
+            self._pop_oldest("ttl")
+
+    def _touch(self, session_id: str, now: float) -> Optional[_Session]:
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get(self, session_id: str) -> List[Turn]:
+        session = self._touch(session_id, time.monotonic())
+        if session is None:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return session.turns
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        now = time.monotonic()
+        session = self._touch(session_id, now)
+        if session is None:
+            session = _Session(now)
+            self._sessions[session_id] = session
+
+        added = sum(turn_size(turn) for turn in turns)
+        session.turns.extend(turns)
+        session.nbytes += added
+        self._bytes += added
+
+        while len(self._sessions) > self.max_sessions:
+            self._pop_oldest("capacity")
+        # Evict other sessions first (the current one is most recent), then trim
+        # the oldest user/model pairs of a single session that alone exceeds the budget.
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._pop_oldest("bytes")
+        while self._bytes > self.max_bytes and len(session.turns) > len(turns):
+            dropped = session.turns[:2]
+            del session.turns[:2]
+            size = sum(turn_size(turn) for turn in dropped)
+            session.nbytes -= size
+            self._bytes -= size
+            self.trimmed_turns += len(dropped)
+            if session.summary:
+                text, covered = session.summary
+                session.summary = (text, max(0, covered - len(dropped)))
+
+    def delete(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._bytes -= session.nbytes
+        return True
+
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int]]:
+        session = self._sessions.get(session_id)
+        return session.summary if session is not None else None
+
+    def set_summary(self, session_id: str, text: str, covered: int) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        delta = len(text.encode("utf-8")) - (len(session.summary[0].encode("utf-8")) if session.summary else 0)
+        session.summary = (text, covered)
+        session.nbytes += delta
+        self._bytes += delta
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire(time.monotonic())
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": dict(self.evictions),
+            "trimmed_turns": self.trimmed_turns,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    first_seq INTEGER NOT NULL,
+    last_seq INTEGER NOT NULL,
+    nbytes INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS turns (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_session_seq ON turns (session_id, seq);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    covered INTEGER NOT NULL
+);
+"""
+
+# Fixed SQL strings: sqlite3 keeps each one prepared in the connection's statement cache.
+_SQL_SESSION_HEAD = "SELECT first_seq, last_seq, updated_at FROM sessions WHERE session_id = ?"
+_SQL_TURNS_AFTER = "SELECT seq, role, text FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq"
+_SQL_INSERT_TURN = "INSERT INTO turns (session_id, role, text) VALUES (?, ?, ?)"
+_SQL_UPSERT_SESSION = """
+INSERT INTO sessions (session_id, first_seq, last_seq, nbytes, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET
+    last_seq = excluded.last_seq,
+    nbytes = sessions.nbytes + excluded.nbytes,
+    updated_at = excluded.updated_at
+"""
+_SQL_DELETE_TURNS = "DELETE FROM turns WHERE session_id = ?"
+_SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+_SQL_DELETE_SUMMARY = "DELETE FROM summaries WHERE session_id = ?"
+_SQL_GET_SUMMARY = "SELECT text, covered FROM summaries WHERE session_id = ?"
+_SQL_SET_SUMMARY = """
+INSERT OR REPLACE INTO summaries (session_id, text, covered)
+SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM sessions WHERE session_id = ?)
+"""
+_SQL_OLDEST_SESSIONS = "SELECT session_id, nbytes FROM sessions ORDER BY updated_at LIMIT ?"
+_SQL_EXPIRED_SESSIONS = "SELECT session_id FROM sessions WHERE updated_at < ?"
+_SQL_TOTALS = "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM sessions"
+
+# Run the (comparatively expensive) capacity/TTL sweep once per this many appends
+_PRUNE_EVERY_APPENDS = 100
+
+
+class _CachedSession:
+    __slots__ = ("first_seq", "last_seq", "turns")
+
+    def __init__(self, first_seq: int, last_seq: int, turns: List[Turn]) -> None:
+        self.first_seq = first_seq
+        self.last_seq = last_seq
+        self.turns = turns
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Shared store for multi-worker deployments on one host.
+
+    Turns are rows with a global AUTOINCREMENT sequence. Each read checks the session
+    head row; a cached session is then either current (no further query), extended
+    with only the turns appended since (possibly by another worker), or reloaded
+    when the session was deleted and recreated elsewhere.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_sessions: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl_seconds: float = 72 * 60 * 60,
+        cache_size: int = 1000,
+    ) -> None:
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.cache_size = cache_size
+        self._conn = open_connection(path, _SCHEMA, cached_statements=64)
+        self._lock = threading.Lock()
+        self.executor = store_executor("sessions")
+
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._appends = 0
+        self.cache_hits = 0
+        self.cache_partial_hits = 0
+        self.cache_misses = 0
+        self.evictions = {"capacity": 0, "bytes": 0, "ttl": 0}
+
+    def _cache_put(self, session_id: str, entry: _CachedSession) -> None:
+        self._cache[session_id] = entry
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _delete_locked(self, session_id: str) -> None:
+        self._conn.execute(_SQL_DELETE_TURNS, (session_id,))
+        self._conn.execute(_SQL_DELETE_SESSION, (session_id,))
+        self._conn.execute(_SQL_DELETE_SUMMARY, (session_id,))
+        self._cache.pop(session_id, None)
+
+    def get(self, session_id: str) -> List[Turn]:
+        with self._lock:
+            head = self._conn.execute(_SQL_SESSION_HEAD, (session_id,)).fetchone()
+            if head is None:
+                self._cache.pop(session_id, None)
+                return []
+            first_seq, last_seq, updated_at = head
+            if updated_at < time.time() - self.idle_ttl_seconds:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._delete_locked(session_id)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self.evictions["ttl"] += 1
+                return []
+
+            entry = self._cache.get(session_id)
+            if entry is not None and entry.first_seq == first_seq:
+                if entry.last_seq == last_seq:
+                    self.cache_hits += 1
+                else:
+                    self.cache_partial_hits += 1
+                    self._load_after(session_id, entry)
+                self._cache.move_to_end(session_id)
+                return list(entry.turns)
+
+            self.cache_misses += 1
+            entry = _CachedSession(first_seq, 0, [])
+            self._load_after(session_id, entry)
+            self._cache_put(session_id, entry)
+            # A copy: the cached list is extended in place by later appends.
+            return list(entry.turns)
+
+    def _load_after(self, session_id: str, entry: _CachedSession) -> None:
+        for seq, role, text in self._conn.execute(_SQL_TURNS_AFTER, (session_id, entry.last_seq)):
+            entry.turns.append(Turn(role, text))
+            entry.last_seq = seq
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        rows = [(session_id, turn.role, turn.text) for turn in turns]
+        added = sum(turn_size(turn) for turn in turns)
+        with self._lock:
+            # One transaction for the whole user/model pair.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                head = self._conn.execute(_SQL_SESSION_HEAD, (session_id,)).fetchone()
+                self._conn.executemany(_SQL_INSERT_TURN, rows)
+                last_seq = self._conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                first_new_seq = last_seq - len(rows) + 1
+                self._conn.execute(
+                    _SQL_UPSERT_SESSION,
+                    (session_id, first_new_seq, last_seq, added, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            entry = self._cache.get(session_id)
+            if head is None:
+                self._cache_put(session_id, _CachedSession(first_new_seq, last_seq, list(turns)))
+            elif entry is not None and entry.first_seq == head[0] and entry.last_seq == head[1]:
+                entry.turns.extend(turns)
+                entry.last_seq = last_seq
+            else:
+                self._cache.pop(session_id, None)
+
+            self._appends += 1
+            if self._appends % _PRUNE_EVERY_APPENDS == 0:
+                self._prune_locked()
+
+    def _prune_locked(self) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cutoff = time.time() - self.idle_ttl_seconds
+            for (session_id,) in self._conn.execute(_SQL_EXPIRED_SESSIONS, (cutoff,)).fetchall():
+                self._delete_locked(session_id)
+                self.evictions["ttl"] += 1
+
+            count, total_bytes = self._conn.execute(_SQL_TOTALS).fetchone()
+            if count > self.max_sessions:
+                for session_id, nbytes in self._conn.execute(
+                    _SQL_OLDEST_SESSIONS, (count - self.max_sessions,)
+                ).fetchall():
+                    self._delete_locked(session_id)
+                    total_bytes -= nbytes
+                    self.evictions["capacity"] += 1
+            if total_bytes > self.max_bytes:
+                for session_id, nbytes in self._conn.execute(_SQL_OLDEST_SESSIONS, (-1,)).fetchall():
+                    if total_bytes <= self.max_bytes:
+                        break
+                    self._delete_locked(session_id)
+                    total_bytes -= nbytes
+                    self.evictions["bytes"] += 1
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existed = self._conn.execute(_SQL_SESSION_HEAD, (session_id,)).fetchone() is not None
+                self._delete_locked(session_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return existed
+
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            row = self._conn.execute(_SQL_GET_SUMMARY, (session_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_summary(self, session_id: str, text: str, covered: int) -> None:
+        with self._lock:
+            self._conn.execute(_SQL_SET_SUMMARY, (session_id, text, covered, session_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total_bytes = self._conn.execute(_SQL_TOTALS).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": count,
+            "bytes": total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "cached_sessions": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_partial_hits": self.cache_partial_hits,
+            "cache_misses": self.cache_misses,
+            "evictions": dict(self.evictions),
+        }
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store configured in settings (SESSION_STORE_BACKEND)."""
+    backend = settings.SESSION_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            resolve_backend_path(settings.SESSION_SQLITE_PATH),
+            max_sessions=settings.SESSION_MAX_COUNT,
+            max_bytes=settings.SESSION_MAX_BYTES,
+            idle_ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+            cache_size=settings.SESSION_CACHE_SIZE,
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE_BACKEND: {settings.SESSION_STORE_BACKEND}")
+    return InMemorySessionStore(
+        max_sessions=settings.SESSION_MAX_COUNT,
+        max_bytes=settings.SESSION_MAX_BYTES,
+        idle_ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+    )
@@ -0,0 +1,49 @@
+"""
+Shared plumbing for the stores that keep state in a WAL-mode SQLite file (sessions,
+rate-limit buckets, magic-link nonces).
+
+open_connection() applies the one connection setup they all use. SQLite calls block
+(a write waits up to busy_timeout for another worker's transaction), so each SQLite
+store also owns a single-thread executor, and async code calls store methods through
+run_store(), which uses that executor when there is one and calls in-memory stores
+inline.
+"""
+import asyncio
+import functools
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Milliseconds a statement waits for another connection's write lock
+BUSY_TIMEOUT_MS = 5000
+
+
+def open_connection(path: str, schema: str, cached_statements: int = 128) -> sqlite3.Connection:
+    """
+    Connect in autocommit mode (writes use explicit BEGIN IMMEDIATE transactions),
+    switch to WAL and create the schema. The connection may be used from any thread;
+    callers serialize access to it.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=cached_statements)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.executescript(schema)
+    return conn
+
+
+def store_executor(name: str) -> ThreadPoolExecutor:
+    """One worker thread per store: calls queue there instead of blocking the loop."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{name}")
+
+
+async def run_store(method: Callable[..., T], *args: Any) -> T:
+    """Call a bound store method; on the store's executor if it has one, else inline."""
+    executor = getattr(method.__self__, "executor", None)
+    if executor is None:
+        return method(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(method, *args))
@@ -1,19 +1,46 @@
 """
 Google Cloud Text-to-Speech service.
 """
+import asyncio
 import os
 import json
 import base64
+import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from google.auth import default
-from google.auth.transport.requests import Request
-import requests
+import httpx
 
 from core.config import settings
+from core.tracing import span
+from services.admission import UpstreamBusy, translate_gate, tts_gate
+from services.audio_cache import create_audio_cache, make_audio_key
+from services.auth_tokens import token_provider
+from services.cache import TTLCache
+from services.circuit_breaker import (
+    CircuitOpen,
+    chat_breaker,
+    is_upstream_failure,
+    translate_breaker,
+    tts_breaker,
+)
+from services.http_client import post_upstream
+from services.sentences import chunk_text
+from services.singleflight import SingleFlight
 
 TTS_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+AUDIO_CONFIG = {"audioEncoding": "MP3"}
+
+
+def strip_id3_tag(audio: bytes) -> bytes:
+    """Drop a leading ID3v2 tag so chunk audio can be appended to a previous chunk."""
+    if len(audio) < 10 or audio[:3] != b"ID3":
+        return audio
+    # Tag size is a 28-bit "syncsafe" integer (7 bits per byte) after the 10-byte header.
+    size = (audio[6] << 21) | (audio[7] << 14) | (audio[8] << 7) | audio[9]
+    footer = 10 if audio[5] & 0x10 else 0
+    return audio[10 + size + footer:]
 
 
 def _resolve_credentials_path(path: str) -> str:
@@ -53,22 +80,45 @@ def _ensure_credentials_env() -> None:
 class GoogleTextToSpeechService:
     def __init__(self) -> None:
         _ensure_credentials_env()
-        # Validate ADC early so startup/first use errors are explicit.
-        default(scopes=[TTS_SCOPE])
-        self.translate_url = "https://translation.googleapis.com/language/translate/v2"
-        self.tts_url = "https://texttospeech.googleapis.com/v1/text:synthesize"
+        if not settings.GOOGLE_STATIC_ACCESS_TOKEN:
+            # Validate ADC early so startup/first use errors are explicit.
+            default(scopes=[TTS_SCOPE])
+        translate_base = (settings.TRANSLATE_API_BASE_URL or "https://translation.googleapis.com").rstrip("/")
+        tts_base = (settings.TTS_API_BASE_URL or "https://texttospeech.googleapis.com").rstrip("/")
+        self.translate_url = f"{translate_base}/language/translate/v2"
+        self.tts_url = f"{tts_base}/v1/text:synthesize"
+        self.audio_cache = create_audio_cache()
+        # (sha256 of source text, target language) -> translated text
+        self.translation_cache = TTLCache(
+            max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.TRANSLATION_CACHE_TTL_SECONDS,
+        )
+        # Identical concurrent requests (e.g. a room of tablets) share one upstream call
+        self.translate_flight = SingleFlight("translate")
+        self.synthesize_flight = SingleFlight("tts")
 
-    def _translate_text_with_vertex(self, text: str, language_code: str) -> str:
+    @staticmethod
+    def _voice(language_code: str, name: Optional[str]) -> dict:
+        voice = {
+            "languageCode": language_code,
+            "ssmlGender": "NEUTRAL",
+        }
+        if name:
+            voice["name"] = name
+        return voice
+
+    async def _translate_text_with_vertex(self, text: str, language_code: str) -> str:
         target_language = (language_code or "en-US").split("-")[0].lower()
         if target_language == "en":
             return text
 
-        token = self._get_access_token()
+        token = await self._get_access_token()
         project_id = settings.GOOGLE_CLOUD_PROJECT
         location = settings.VERTEX_AI_LOCATION
         model_name = settings.VERTEX_AI_MODEL
+        api_base = (settings.VERTEX_AI_API_BASE_URL or f"https://{location}-aiplatform.googleapis.com").rstrip("/")
         endpoint = (
-            f"https://{location}-aiplatform.googleapis.com/v1/"
+            f"{api_base}/v1/"
             f"projects/{project_id}/locations/{location}/publishers/google/models/{model_name}:generateContent"
         )
 
@@ -93,15 +143,21 @@ class GoogleTextToSpeechService:
             },
         }
 
-        response = requests.post(
-            endpoint,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps(payload),
-            timeout=30,
-        )
+        # Same Vertex AI upstream as the chatbot, so it shares the chat breaker.
+        async with chat_breaker.guard():
+            response = await post_upstream(
+                "vertex",
+                "translate.vertex",
+                endpoint,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json",
+                },
+                content=json.dumps(payload),
+                timeout=30,
+            )
+            if is_upstream_failure(response.status_code):
+                response.raise_for_status()
         response.raise_for_status()
         data = response.json()
         candidates = data.get("candidates") or []
@@ -111,17 +167,35 @@ class GoogleTextToSpeechService:
         translated = (parts[0].get("text", "") if parts else "").strip()
         return translated or text
 
-    def _get_access_token(self) -> str:
-        credentials, _ = default(scopes=[TTS_SCOPE])
-        credentials.refresh(Request())
-        return credentials.token
+    async def _get_access_token(self) -> str:
+        return await token_provider.get_token()
 
-    def _translate_text(self, text: str, language_code: str) -> str:
+    async def _translate_text(self, text: str, language_code: str) -> str:
         target_language = (language_code or "en-US").split("-")[0].lower()
         if target_language == "en":
             return text
 
-        token = self._get_access_token()
+        cache_key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), target_language)
+        cached = self.translation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        translated = await self.translate_flight.do(
+            cache_key,
+            lambda: self._translate_gated(text, language_code, target_language),
+        )
+        # Both APIs hand back the source text when they produce nothing; don't pin that.
+        if translated != text:
+            self.translation_cache.set(cache_key, translated)
+        return translated
+
+    async def _translate_gated(self, text: str, language_code: str, target_language: str) -> str:
+        async with translate_gate.slot():
+            return await self._translate_uncached(text, language_code, target_language)
+
+    async def _translate_uncached(self, text: str, language_code: str, target_language: str) -> str:
+        """Cloud Translation, falling back to Vertex generateContent."""
+        token = await self._get_access_token()
         payload = {
             "q": text,
             "target": target_language,
@@ -131,15 +205,20 @@ class GoogleTextToSpeechService:
             payload["model"] = "nmt"
 
         try:
-            response = requests.post(
-                self.translate_url,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=20,
-            )
+            async with translate_breaker.guard():
+                response = await post_upstream(
+                    "translate",
+                    "translate.cloud",
+                    self.translate_url,
+                    headers={
+                        "Authorization": f"Bearer {token}",
+                        "Content-Type": "application/json",
+                    },
+                    json=payload,
+                    timeout=20,
+                )
+                if is_upstream_failure(response.status_code):
+                    response.raise_for_status()
             response.raise_for_status()
             data = response.json()
             translated = (
@@ -148,68 +227,135 @@ class GoogleTextToSpeechService:
                 .get("translatedText", "")
             )
             return translated or text
-        except requests.exceptions.RequestException as error:
+        except (httpx.HTTPError, CircuitOpen) as error:
             print(f"⚠️ Cloud Translation API failed ({error}), trying Vertex fallback...")
-            return self._translate_text_with_vertex(text, language_code)
+            return await self._translate_text_with_vertex(text, language_code)
 
-    def synthesize_speech(
+    async def _synthesize_chunk(self, source_text: str, language_code: str, voice_name: Optional[str]) -> bytes:
+        """Translate (if needed) and synthesize one chunk; concurrent duplicates share the work."""
+        return await self.synthesize_flight.do(
+            (source_text, language_code, voice_name),
+            lambda: self._synthesize_chunk_uncoalesced(source_text, language_code, voice_name),
+        )
+
+    async def _synthesize_chunk_uncoalesced(
         self,
-        text: str,
-        language_code: str = "en-US",
-        voice_name: Optional[str] = None,
+        source_text: str,
+        language_code: str,
+        voice_name: Optional[str],
     ) -> bytes:
-        if not text or not text.strip():
-            raise ValueError("Text must not be empty.")
+        # Repeated "speak" on the same text skips translation and synthesis entirely.
+        cache_key = None
+        if self.audio_cache is not None:
+            cache_key = make_audio_key(source_text, language_code, self._voice(language_code, voice_name), AUDIO_CONFIG)
+            with span("tts.cache_lookup"):
+                cached_audio = await self.audio_cache.get(cache_key)
+            if cached_audio is not None:
+                return cached_audio
 
-        source_text = text.strip()
+        # With TTS down, don't spend a translation or a queue slot on audio that can't be made.
+        tts_breaker.check()
         try:
             # Translate to selected TTS language when needed (ex: de/es/fr).
-            spoken_text = self._translate_text(source_text, language_code)
+            spoken_text = await self._translate_text(source_text, language_code)
+        except UpstreamBusy:
+            raise
         except Exception as error:
             print(f"⚠️ Translation failed, using original text. Error: {error}")
             spoken_text = source_text
 
-        token = self._get_access_token()
+        token = await self._get_access_token()
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
 
         def _payload(name: Optional[str]) -> dict:
-            voice = {
-                "languageCode": language_code,
-                "ssmlGender": "NEUTRAL",
-            }
-            if name:
-                voice["name"] = name
             return {
                 "input": {"text": spoken_text},
-                "voice": voice,
-                "audioConfig": {"audioEncoding": "MP3"},
+                "voice": self._voice(language_code, name),
+                "audioConfig": AUDIO_CONFIG,
             }
 
-        response = requests.post(
-            self.tts_url,
-            headers=headers,
-            data=json.dumps(_payload(voice_name)),
-            timeout=30,
-        )
-
-        if response.status_code == 400 and voice_name:
-            # Retry with provider default voice if selected voice is unsupported.
-            response = requests.post(
+        # Translation can take seconds; the breaker may have opened meanwhile.
+        tts_breaker.check()
+        async with tts_gate.slot(), tts_breaker.guard():
+            response = await post_upstream(
+                "tts",
+                "tts.synthesize",
                 self.tts_url,
                 headers=headers,
-                data=json.dumps(_payload(None)),
+                content=json.dumps(_payload(voice_name)),
                 timeout=30,
             )
 
+            if response.status_code == 400 and voice_name:
+                # Retry with provider default voice if selected voice is unsupported.
+                response = await post_upstream(
+                    "tts",
+                    "tts.synthesize",
+                    self.tts_url,
+                    headers=headers,
+                    content=json.dumps(_payload(None)),
+                    timeout=30,
+                )
+            if is_upstream_failure(response.status_code):
+                response.raise_for_status()
+
         response.raise_for_status()
         data = response.json()
         audio_base64 = data.get("audioContent")
         if not audio_base64:
             raise RuntimeError("No audioContent returned from TTS API.")
-        return base64.b64decode(audio_base64)
+        audio = base64.b64decode(audio_base64)
+        if cache_key is not None:
+            await self.audio_cache.put(cache_key, audio)
+        return audio
+
+    async def synthesize_speech_stream(
+        self,
+        text: str,
+        language_code: str = "en-US",
+        voice_name: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield MP3 audio chunk by chunk, in order.
+
+        The text is split at sentence boundaries into chunks of at most
+        TTS_CHUNK_MAX_CHARS; up to TTS_MAX_PARALLEL_CHUNKS are translated and
+        synthesized concurrently, and chunk 1 is yielded as soon as it is ready.
+        """
+        if not text or not text.strip():
+            raise ValueError("Text must not be empty.")
+
+        voice_name = (voice_name or "").strip() or None
+        chunks = chunk_text(text.strip(), settings.TTS_CHUNK_MAX_CHARS)
+        semaphore = asyncio.Semaphore(settings.TTS_MAX_PARALLEL_CHUNKS)
+
+        async def _bounded(chunk: str) -> bytes:
+            async with semaphore:
+                return await self._synthesize_chunk(chunk, language_code, voice_name)
 
+        tasks = [asyncio.ensure_future(_bounded(chunk)) for chunk in chunks]
+        try:
+            for index, task in enumerate(tasks):
+                audio = await task
+                # MP3 frames concatenate cleanly; only a leading ID3 tag must not repeat.
+                yield audio if index == 0 else strip_id3_tag(audio)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled chunks unwind (release gate slots, breaker probes) and
+            # retrieve their errors, so none is logged as "never retrieved".
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-tts_service = GoogleTextToSpeechService()
+    async def synthesize_speech(
+        self,
+        text: str,
+        language_code: str = "en-US",
+        voice_name: Optional[str] = None,
+    ) -> bytes:
+        parts = [
+            part async for part in self.synthesize_speech_stream(text, language_code, voice_name)
+        ]
+        return parts[0] if len(parts) == 1 else b"".join(parts)
@@ -2,15 +2,28 @@
 Vertex AI Chatbot Service - Tuned model only (generateContent API).
 Auth: service account JSON key path (GOOGLE_APPLICATION_CREDENTIALS in .env) or gcloud ADC.
 """
+import asyncio
+import hashlib
 import os
-import requests
 import json
-from typing import Dict, Any, List
-from google.auth import default
-from google.auth.transport.requests import Request
+import time
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+import httpx
 from google.auth.exceptions import DefaultCredentialsError
 
 from core.config import settings
+from core.metrics import record_upstream
+from core.tracing import record_span, span
+from services.admission import UpstreamBusy, chat_gate
+from services.answer_cache import create_answer_cache
+from services.circuit_breaker import CircuitOpen, chat_breaker, is_upstream_failure
+from services.auth_tokens import token_provider
+from services.history import HistorySummarizer, windowed_contents
+from services.http_client import get_http_client, post_upstream
+from services.session_store import Turn, create_session_store
+from services.singleflight import SingleFlight
+from services.sqlite_db import run_store
 
 
 # Vertex AI generateContent scope
@@ -44,13 +57,10 @@ def _ensure_credentials_env() -> None:
             print(f"⚠️ GOOGLE_APPLICATION_CREDENTIALS file not found: {resolved}")
 
 
-def _get_access_token() -> str:
-    """Get OAuth2 access token (service account key or ADC)."""
-    _ensure_credentials_env()
+async def _get_access_token() -> str:
+    """Get OAuth2 access token (service account key or ADC) from the shared cache."""
     try:
-        credentials, _ = default(scopes=[VERTEX_AI_SCOPE])
-        credentials.refresh(Request())
-        return credentials.token
+        return await token_provider.get_token()
     except DefaultCredentialsError as e:
         print(f"❌ {e}")
         print("   → Set GOOGLE_APPLICATION_CREDENTIALS in .env to your service account JSON key path")
@@ -69,7 +79,10 @@ class VertexAIChatbot:
                 print("   Auth: Service account key from GOOGLE_APPLICATION_CREDENTIALS")
 
             project_id = settings.GOOGLE_CLOUD_PROJECT
+            if not project_id:
+                raise ValueError("Set GOOGLE_CLOUD_PROJECT in .env")
             location = settings.VERTEX_AI_LOCATION
+            api_base = (settings.VERTEX_AI_API_BASE_URL or f"https://{location}-aiplatform.googleapis.com").rstrip("/")
             endpoint_id = settings.VERTEX_AI_TUNED_ENDPOINT_ID
             model_id = settings.VERTEX_AI_TUNED_MODEL_ID
 
@@ -77,14 +90,14 @@ class VertexAIChatbot:
             # Supports either deployed endpoint or tuned model resource.
             if endpoint_id:
                 self.base_url = (
-                    f"https://{location}-aiplatform.googleapis.com/v1"
+                    f"{api_base}/v1"
                     f"/projects/{project_id}/locations/{location}/endpoints/{endpoint_id}"
                 )
                 self.resource_type = "endpoint"
                 self.resource_id = endpoint_id
             elif model_id:
                 self.base_url = (
-                    f"https://{location}-aiplatform.googleapis.com/v1"
+                    f"{api_base}/v1"
                     f"/projects/{project_id}/locations/{location}/models/{model_id}"
                 )
                 self.resource_type = "model"
@@ -95,6 +108,13 @@ class VertexAIChatbot:
                 )
 
             self.generate_content_url = f"{self.base_url}:generateContent"
+            # Server-sent events: one GenerateContentResponse chunk per "data:" line
+            self.stream_generate_content_url = f"{self.base_url}:streamGenerateContent?alt=sse"
+            # Base model (not the tuned one) for background history summaries
+            self.summary_url = (
+                f"{api_base}/v1/projects/{project_id}/locations/{location}"
+                f"/publishers/google/models/{settings.VERTEX_AI_MODEL}:generateContent"
+            )
 
             self.system_instruction = {
                 "role": "user",
@@ -114,7 +134,31 @@ Keep responses concise and easy to understand."""
                 }]
             }
 
-            self.conversations: Dict[str, List[Dict[str, Any]]] = {}
+            self.generation_config = {
+                "maxOutputTokens": settings.MAX_TOKENS,
+                "temperature": settings.TEMPERATURE,
+                "topP": 0.8,
+                "topK": 40,
+            }
+            # Constant tail of every request body, encoded once:
+            # ...],"systemInstruction":{...},"generationConfig":{...}}
+            self._body_suffix = (
+                b'],"systemInstruction":'
+                + json.dumps(self.system_instruction, separators=(",", ":")).encode("utf-8")
+                + b',"generationConfig":'
+                + json.dumps(self.generation_config, separators=(",", ":")).encode("utf-8")
+                + b"}"
+            )
+
+            self.sessions = create_session_store()
+            # First-turn answers; invalidated whenever the model or system instruction changes
+            self.answer_cache = create_answer_cache()
+            self.answer_fingerprint = hashlib.sha256(
+                self.generate_content_url.encode("utf-8") + self._body_suffix
+            ).hexdigest()
+            # Identical concurrent first-turn requests share one upstream call
+            self.first_turn_flight = SingleFlight("chat")
+            self.summarizer = HistorySummarizer(self._summarize)
 
             print("✅ Vertex AI Tuned Model (generateContent) initialized")
             print(f"   Project: {project_id}, Location: {location}, {self.resource_type.title()}: {self.resource_id}")
@@ -125,79 +169,153 @@ Keep responses concise and easy to understand."""
             print(f"❌ Failed to initialize Vertex AI: {e}")
             raise
 
-    def _get_or_create_conversation(self, session_id: str) -> List[Dict[str, Any]]:
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-        return self.conversations[session_id]
-
-    def _build_contents(self, conversation: List[Dict], new_message: str) -> List[Dict]:
-        """Build contents for generateContent: conversation history + new user message."""
-        contents = []
-        for msg in conversation:
-            role = "user" if msg["role"] == "user" else "model"
-            text = msg["parts"][0]["text"]
-            contents.append({"role": role, "parts": [{"text": text}]})
-        contents.append({"role": "user", "parts": [{"text": new_message}]})
-        return contents
-
-    def chat(self, message: str, session_id: str = "default") -> Dict:
+    async def _get_or_create_conversation(self, session_id: str) -> List[Turn]:
+        # Sessions are created on first append; unknown IDs just have no history.
+        return await run_store(self.sessions.get, session_id)
+
+    async def _build_body(self, session_id: str, conversation: List[Turn], message: str) -> Tuple[bytes, Turn]:
+        """
+        Encoded generateContent request: history + new user message.
+
+        Each turn carries its own cached JSON fragment, so building the body is a join
+        rather than re-encoding the whole history. Returns the new user turn as well,
+        so its encoding is reused once it is stored.
+        """
+        # Keep the request bounded: recent turns within the token budget (+ rolling summary).
+        with span("chat.history"):
+            history = await windowed_contents(self.sessions, self.summarizer, session_id, conversation, message)
+        with span("chat.encode_request"):
+            user_turn = Turn("user", message)
+            fragments = [turn.encoded for turn in history]
+            fragments.append(user_turn.encoded)
+            return b'{"contents":[' + b",".join(fragments) + self._body_suffix, user_turn
+
+    async def _headers(self) -> Dict[str, str]:
+        token = await _get_access_token()
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+
+    def _raise_api_error(self, status_code: int, body: str) -> None:
         try:
-            conversation = self._get_or_create_conversation(session_id)
-            contents = self._build_contents(conversation, message)
-
-            payload = {
-                "contents": contents,
-                "systemInstruction": self.system_instruction,
-                "generationConfig": {
-                    "maxOutputTokens": settings.MAX_TOKENS,
-                    "temperature": settings.TEMPERATURE,
-                    "topP": 0.8,
-                    "topK": 40,
-                },
-            }
-
-            token = _get_access_token()
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {token}",
-            }
-
-            print("📤 Sending request to Vertex AI tuned model (generateContent)...")
-
-            response = requests.post(
+            err = json.loads(body) if body else {}
+        except ValueError:
+            err = {}
+        if isinstance(err, list):
+            err = err[0] if err else {}
+        msg = err.get("error", {}).get("message", body or f"HTTP {status_code}")
+        print(f"❌ API Error: {msg}")
+        if "not found" in msg.lower() and self.resource_type == "endpoint":
+            print("   Tip: endpoint ID may be invalid or in a different region/project.")
+            print("   If you only have tuned model ID, set VERTEX_AI_TUNED_MODEL_ID instead.")
+        raise Exception(f"API Error: {msg}")
+
+    @staticmethod
+    def _candidate_text(data: Dict[str, Any]) -> str:
+        """Text of candidates[0].content.parts (empty if the chunk carries none)."""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    async def _summarize(self, prompt: str) -> str:
+        """One-off generateContent call on the base model (used off the request path)."""
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.2, "maxOutputTokens": 512},
+        }
+        async with chat_gate.slot(), chat_breaker.guard():
+            response = await post_upstream(
+                "vertex",
+                "vertex.summarize",
+                self.summary_url,
+                headers=await self._headers(),
+                content=json.dumps(payload),
+                timeout=60,
+            )
+            if is_upstream_failure(response.status_code):
+                self._raise_api_error(response.status_code, response.text)
+        if response.status_code != 200:
+            self._raise_api_error(response.status_code, response.text)
+        return self._candidate_text(response.json())
+
+    async def _generate(self, body: bytes) -> str:
+        """POST a generateContent request body and return the reply text."""
+        headers = await self._headers()
+
+        print("📤 Sending request to Vertex AI tuned model (generateContent)...")
+
+        async with chat_gate.slot(), chat_breaker.guard():
+            response = await post_upstream(
+                "vertex",
+                "vertex.generate",
                 self.generate_content_url,
                 headers=headers,
-                data=json.dumps(payload),
+                content=body,
                 timeout=60,
             )
-
-            if response.status_code != 200:
-                err = response.json() if response.text else {}
-                msg = err.get("error", {}).get("message", response.text or f"HTTP {response.status_code}")
-                print(f"❌ API Error: {msg}")
-                if "not found" in msg.lower() and self.resource_type == "endpoint":
-                    print("   Tip: endpoint ID may be invalid or in a different region/project.")
-                    print("   If you only have tuned model ID, set VERTEX_AI_TUNED_MODEL_ID instead.")
-                raise Exception(f"API Error: {msg}")
-
-            data = response.json()
-            print("📥 Response received")
-
-            # GenerateContentResponse: candidates[0].content.parts[0].text
-            candidates = data.get("candidates") or []
-            if not candidates:
-                raise Exception("No candidates in response")
-            content = candidates[0].get("content") or {}
-            parts = content.get("parts") or []
-            if not parts:
-                raise Exception("No parts in candidate content")
-            ai_response = parts[0].get("text", "").strip()
-            if not ai_response:
-                raise Exception("Empty model response")
+            # Only upstream trouble (5xx/429, timeouts) counts against the breaker.
+            if is_upstream_failure(response.status_code):
+                self._raise_api_error(response.status_code, response.text)
+
+        if response.status_code != 200:
+            self._raise_api_error(response.status_code, response.text)
+
+        data = response.json()
+        print("📥 Response received")
+
+        # GenerateContentResponse: candidates[0].content.parts[0].text
+        candidates = data.get("candidates") or []
+        if not candidates:
+            raise Exception("No candidates in response")
+        content = candidates[0].get("content") or {}
+        parts = content.get("parts") or []
+        if not parts:
+            raise Exception("No parts in candidate content")
+        ai_response = parts[0].get("text", "").strip()
+        if not ai_response:
+            raise Exception("Empty model response")
+        return ai_response
+
+    def _cached_answer(self, conversation: List[Turn], message: str):
+        """Cached reply for a first-turn (context-free) question, if any."""
+        if conversation or self.answer_cache is None:
+            return None
+        self.answer_cache.ensure_fingerprint(self.answer_fingerprint)
+        return self.answer_cache.get(message)
+
+    def _remember_answer(self, conversation: List[Turn], message: str, ai_response: str) -> None:
+        if not conversation and self.answer_cache is not None:
+            self.answer_cache.put(message, ai_response)
+
+    async def _append_turn(self, session_id: str, user_turn: Turn, ai_response: str) -> None:
+        await run_store(self.sessions.append, session_id, [user_turn, Turn("model", ai_response)])
+
+    async def chat(self, message: str, session_id: str = "default") -> Dict:
+        try:
+            conversation = await self._get_or_create_conversation(session_id)
+            cached = self._cached_answer(conversation, message)
+            if cached is not None:
+                await self._append_turn(session_id, Turn("user", message), cached)
+                return {
+                    "response": cached,
+                    "session_id": session_id,
+                    "model": f"{settings.VERTEX_AI_MODEL} (Vertex AI tuned, cached)",
+                }
+
+            body, user_turn = await self._build_body(session_id, conversation, message)
+            if conversation:
+                ai_response = await self._generate(body)
+            else:
+                # No history: the body depends only on the message, so it is a safe key.
+                body_key = hashlib.sha256(body).hexdigest()
+                ai_response = await self.first_turn_flight.do(body_key, lambda: self._generate(body))
 
             # Append to history
-            conversation.append({"role": "user", "parts": [{"text": message}]})
-            conversation.append({"role": "model", "parts": [{"text": ai_response}]})
+            await self._append_turn(session_id, user_turn, ai_response)
+            self._remember_answer(conversation, message, ai_response)
 
             return {
                 "response": ai_response,
@@ -205,13 +323,23 @@ Keep responses concise and easy to understand."""
                 "model": f"{settings.VERTEX_AI_MODEL} (Vertex AI tuned)",
             }
 
+        except UpstreamBusy:
+            # Surfaced as 429 + Retry-After rather than the generic apology.
+            raise
+        except CircuitOpen as e:
+            # Vertex AI is failing: answer right away instead of waiting on it.
+            return {
+                "response": "I apologize, but I'm having trouble processing your request right now. Please try again.",
+                "session_id": session_id,
+                "error": str(e),
+            }
         except DefaultCredentialsError:
             return {
                 "response": ADC_HELP_MESSAGE,
                 "session_id": session_id,
                 "error": "Default credentials not found",
             }
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Network error: {e}")
             return {
                 "response": "I'm having trouble connecting to the AI service. Please check your internet connection and try again.",
@@ -226,10 +354,143 @@ Keep responses concise and easy to understand."""
                 "error": str(e),
             }
 
-    def clear_session(self, session_id: str) -> None:
-        if session_id in self.conversations:
-            del self.conversations[session_id]
-            print(f"✅ Session {session_id} cleared")
+    async def _read_stream(self, body: bytes, headers: Dict[str, str],
+                           deltas: asyncio.Queue) -> Optional[Tuple[int, str]]:
+        """
+        POST a streamGenerateContent request and put each text delta on `deltas`,
+        then None. The admission slot and breaker guard cover exactly this upstream
+        call. Returns (status, body) for a non-retryable rejection (4xx).
+        """
+        stream_started = time.perf_counter()
+        try:
+            async with chat_gate.slot(), chat_breaker.guard(), get_http_client().stream(
+                "POST",
+                self.stream_generate_content_url,
+                headers=headers,
+                content=body,
+                timeout=60,
+            ) as response:
+                try:
+                    if response.status_code != 200:
+                        error_body = (await response.aread()).decode("utf-8", errors="replace")
+                        # Only upstream trouble (5xx/429, timeouts) counts against the breaker.
+                        if is_upstream_failure(response.status_code):
+                            self._raise_api_error(response.status_code, error_body)
+                        return response.status_code, error_body
+                    first = True
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = self._candidate_text(json.loads(line[5:]))
+                        if text:
+                            if first:
+                                record_span("vertex.stream_first_chunk", time.perf_counter() - stream_started, stream_started)
+                                first = False
+                            deltas.put_nowait(text)
+                    return None
+                finally:
+                    record_span("vertex.stream", time.perf_counter() - stream_started, stream_started)
+                    record_upstream("vertex", response.status_code, len(body), response.num_bytes_downloaded)
+        finally:
+            deltas.put_nowait(None)
+
+    async def chat_stream(self, message: str, session_id: str = "default") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a reply via streamGenerateContent.
+
+        Yields {"type": "delta", "text"} events as text arrives, then one "done" event
+        (or an "error" event carrying the same fallback message as chat()). The turn is
+        added to the session history only once the stream has completed. UpstreamBusy
+        is raised (before any event) when the chat upstream is saturated.
+        """
+        pieces: List[str] = []
+        try:
+            conversation = await self._get_or_create_conversation(session_id)
+            cached = self._cached_answer(conversation, message)
+            if cached is not None:
+                await self._append_turn(session_id, Turn("user", message), cached)
+                yield {"type": "delta", "text": cached}
+                yield {
+                    "type": "done",
+                    "response": cached,
+                    "session_id": session_id,
+                    "model": f"{settings.VERTEX_AI_MODEL} (Vertex AI tuned, cached)",
+                }
+                return
+
+            body, user_turn = await self._build_body(session_id, conversation, message)
+            headers = await self._headers()
+
+            print("📤 Streaming request to Vertex AI tuned model (streamGenerateContent)...")
+
+            # The upstream is read by its own task, so a slow client neither holds the
+            # admission slot nor makes the call look slow to the breaker.
+            deltas: asyncio.Queue = asyncio.Queue()
+            reader = asyncio.ensure_future(self._read_stream(body, headers, deltas))
+            try:
+                while True:
+                    text = await deltas.get()
+                    if text is None:
+                        break
+                    pieces.append(text)
+                    yield {"type": "delta", "text": text}
+                rejected = await reader
+            finally:
+                if not reader.done():
+                    # Client went away mid-stream: stop reading the upstream too.
+                    reader.cancel()
+                elif not reader.cancelled():
+                    reader.exception()  # Retrieved, even if we stopped before awaiting it
+            if rejected:
+                self._raise_api_error(*rejected)
+
+            ai_response = "".join(pieces).strip()
+            if not ai_response:
+                raise Exception("Empty model response")
+            print("📥 Stream completed")
+
+            await self._append_turn(session_id, user_turn, ai_response)
+            self._remember_answer(conversation, message, ai_response)
+            yield {
+                "type": "done",
+                "response": ai_response,
+                "session_id": session_id,
+                "model": f"{settings.VERTEX_AI_MODEL} (Vertex AI tuned)",
+            }
 
+        except UpstreamBusy:
+            raise
+        except CircuitOpen as e:
+            yield {
+                "type": "error",
+                "response": "I apologize, but I'm having trouble processing your request right now. Please try again.",
+                "session_id": session_id,
+                "error": str(e),
+            }
+        except DefaultCredentialsError:
+            yield {
+                "type": "error",
+                "response": ADC_HELP_MESSAGE,
+                "session_id": session_id,
+                "error": "Default credentials not found",
+            }
+        except httpx.HTTPError as e:
+            print(f"❌ Network error: {e}")
+            yield {
+                "type": "error",
+                "response": "I'm having trouble connecting to the AI service. Please check your internet connection and try again.",
+                "session_id": session_id,
+                "error": str(e),
+            }
+        except Exception as e:
+            print(f"❌ Error in chat stream: {e}")
+            yield {
+                "type": "error",
+                "response": "I apologize, but I'm having trouble processing your request right now. Please try again.",
+                "session_id": session_id,
+                "error": str(e),
+            }
 
-chatbot = VertexAIChatbot()
+    async def clear_session(self, session_id: str) -> None:
+        if await run_store(self.sessions.delete, session_id):
+            print(f"✅ Session {session_id} cleared")
@@ -0,0 +1,114 @@
+"""
+Chat-and-speak pipeline: stream a chat reply and synthesize it sentence by sentence.
+
+Completed sentences are handed to text-to-speech while the model is still writing,
+so the first audio segment is ready long before the full reply is. Events come out
+as one merged stream: text deltas as they arrive, audio segments in order, then the
+final "done" (or "error") event.
+"""
+import asyncio
+import base64
+from typing import Any, AsyncIterator, Dict, Optional
+
+from core.config import settings
+from services.sentences import SentenceBuffer
+
+# Minimum characters of complete sentences before a segment is synthesized
+MIN_SEGMENT_CHARS = 40
+
+
+async def chat_and_speak(
+    chat_events: AsyncIterator[Dict[str, Any]],
+    tts_service,
+    language_code: str = "en-US",
+    voice_name: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merge a chat_stream() event iterator with audio for its sentences.
+
+    Yields the chat "delta" events unchanged, {"type": "audio", "index", "text",
+    "audio_base64", "mime_type"} per segment (or "audio_error"), and finally the
+    chat's "done"/"error" event once every segment has been delivered.
+    """
+    out: asyncio.Queue = asyncio.Queue()
+    segments: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(settings.TTS_MAX_PARALLEL_CHUNKS)
+    audio_tasks = []
+    final_event: Dict[str, Any] = {}
+
+    async def _synthesize(text: str) -> bytes:
+        async with semaphore:
+            return await tts_service.synthesize_speech(
+                text=text,
+                language_code=language_code,
+                voice_name=voice_name,
+            )
+
+    def _schedule(text: str) -> None:
+        task = asyncio.ensure_future(_synthesize(text))
+        audio_tasks.append(task)
+        segments.put_nowait((len(audio_tasks) - 1, text, task))
+
+    async def _produce_text() -> None:
+        buffer = SentenceBuffer(MIN_SEGMENT_CHARS)
+        spoke = False
+        try:
+            async for event in chat_events:
+                if event["type"] == "delta":
+                    for sentence in buffer.feed(event["text"]):
+                        _schedule(sentence)
+                        spoke = True
+                    await out.put(event)
+                    continue
+                final_event.update(event)
+                for sentence in buffer.flush():
+                    _schedule(sentence)
+                    spoke = True
+                # Voice-first users should hear the fallback message too.
+                if event["type"] == "error" and not spoke and event.get("response"):
+                    _schedule(event["response"])
+        finally:
+            segments.put_nowait(None)
+
+    async def _produce_audio() -> None:
+        while True:
+            item = await segments.get()
+            if item is None:
+                break
+            index, text, task = item
+            try:
+                audio = await task
+            except Exception as error:
+                await out.put({"type": "audio_error", "index": index, "text": text, "error": str(error)})
+                continue
+            await out.put({
+                "type": "audio",
+                "index": index,
+                "text": text,
+                "audio_base64": base64.b64encode(audio).decode("utf-8"),
+                "mime_type": "audio/mpeg",
+            })
+
+    producers = [
+        asyncio.ensure_future(_produce_text()),
+        asyncio.ensure_future(_produce_audio()),
+    ]
+    finished = asyncio.ensure_future(asyncio.gather(*producers))
+    try:
+        while True:
+            getter = asyncio.ensure_future(out.get())
+            await asyncio.wait({getter, finished}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not out.empty():
+                yield out.get_nowait()
+            break
+        await finished
+        if final_event:
+            yield final_event
+    finally:
+        for task in producers + audio_tasks:
+            task.cancel()
+        finished.cancel()
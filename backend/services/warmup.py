@@ -0,0 +1,126 @@
+"""
+Warm-up before taking traffic: build the services, fetch the first access token,
+open pooled connections to each Google API host and preload caches, so the first
+users after a deploy don't pay for DNS, TLS handshakes, the OAuth refresh and cold
+caches.
+
+Steps run concurrently in the background once the app has started. A failed step is
+retried until the deadline. The readiness endpoint reports ready once every step has
+succeeded or the deadline has passed (then with the failed steps listed), so a
+broken upstream delays traffic by at most the deadline rather than forever.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import httpx
+
+from services.http_client import get_http_client
+
+# Pause between attempts of a failed step
+STEP_RETRY_SECONDS = 2.0
+
+
+async def open_connections(urls: Iterable[str], per_host: int) -> int:
+    """
+    Open pooled connections (DNS, TCP, TLS) to the hosts of these URLs. Any HTTP
+    response will do: the connection stays in the shared client's keep-alive pool.
+    Returns the number of hosts reached.
+    """
+    origins = {f"{url.scheme}://{url.netloc.decode('ascii')}/" for url in map(httpx.URL, urls)}
+    client = get_http_client()
+
+    async def _touch(origin: str) -> None:
+        await client.get(origin, timeout=10)
+
+    results = await asyncio.gather(
+        *(_touch(origin) for origin in origins for _ in range(max(1, per_host))),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(results)} connections failed: {errors[0]}")
+    return len(origins)
+
+
+class WarmUp:
+    def __init__(self, deadline_seconds: float = 20.0) -> None:
+        self.deadline_seconds = deadline_seconds
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.enabled = True
+        # step name -> {"ok", "attempts", "seconds", "result"/"error"}
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def skip(self) -> None:
+        """Warm-up disabled: ready as soon as the app has started."""
+        self.enabled = False
+        self.started_at = self.finished_at = time.monotonic()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.finished_at is not None and all(step["ok"] for step in self.steps.values())
+
+    @property
+    def ready(self) -> bool:
+        if self.started_at is None:
+            return False  # App not started (lifespan has not run)
+        if self.finished_at is not None and (self.succeeded or not self.enabled):
+            return True
+        return time.monotonic() - self.started_at >= self.deadline_seconds
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[Any]], deadline: float) -> None:
+        record = self.steps[name]
+        while True:
+            record["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                record["result"] = await step()
+            except Exception as error:
+                record["error"] = str(error) or type(error).__name__
+                if time.monotonic() + STEP_RETRY_SECONDS >= deadline:
+                    print(f"⚠️ Warm-up step {name} failed: {record['error']}")
+                    return
+                await asyncio.sleep(STEP_RETRY_SECONDS)
+                continue
+            record.update(ok=True, error=None, seconds=round(time.perf_counter() - started, 3))
+            return
+
+    async def run(self, steps: Dict[str, Callable[[], Awaitable[Any]]]) -> None:
+        self.started_at = time.monotonic()
+        deadline = self.started_at + self.deadline_seconds
+        self.steps = {name: {"ok": False, "attempts": 0, "seconds": None, "error": None} for name in steps}
+        tasks = [asyncio.ensure_future(self._run_step(name, step, deadline)) for name, step in steps.items()]
+        try:
+            await asyncio.wait(tasks, timeout=self.deadline_seconds)
+        finally:
+            # Past the deadline, or the app is shutting down: stop what is still running.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for record in self.steps.values():
+            if not record["ok"] and not record["error"]:
+                record["error"] = "deadline passed"
+        self.finished_at = time.monotonic()
+        elapsed = self.finished_at - self.started_at
+        if self.succeeded:
+            print(f"✅ Warm-up finished in {elapsed:.2f}s")
+        else:
+            failed = ", ".join(name for name, record in self.steps.items() if not record["ok"])
+            print(f"⚠️ Warm-up finished in {elapsed:.2f}s with failed steps: {failed}")
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {
+            "ready": self.ready,
+            "warm_up": {
+                "enabled": self.enabled,
+                "finished": self.finished_at is not None,
+                "succeeded": self.succeeded,
+                "elapsed_seconds": elapsed,
+                "deadline_seconds": self.deadline_seconds,
+                "steps": self.steps,
+            },
+        }
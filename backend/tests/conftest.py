@@ -0,0 +1,73 @@
+"""
+Shared fixtures. The backend is configured from the environment at import time, so
+these settings are applied before any test module imports it: Vertex AI, TTS and
+Translation point at benchmarks.fake_google, served in-process through an ASGI
+transport, with a static access token and in-memory stores.
+"""
+import os
+
+os.environ.update(
+    GOOGLE_CLOUD_PROJECT="test-project",
+    VERTEX_AI_TUNED_ENDPOINT_ID="test-endpoint",
+    VERTEX_AI_API_BASE_URL="http://fake-google",
+    TTS_API_BASE_URL="http://fake-google",
+    TRANSLATE_API_BASE_URL="http://fake-google",
+    GOOGLE_STATIC_ACCESS_TOKEN="fake-token",
+    SESSION_STORE_BACKEND="memory",
+    NONCE_STORE_BACKEND="memory",
+    RATE_LIMIT_ENABLED="false",
+    ANSWER_CACHE_ENABLED="false",
+    ANSWER_CACHE_SNAPSHOT_PATH="",
+    HISTORY_SUMMARY_ENABLED="false",
+    WARMUP_ENABLED="false",
+    # Injected upstream errors must not open the shared breakers for later tests.
+    BREAKER_MIN_CALLS="1000",
+)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from benchmarks import fake_google  # noqa: E402
+from services import http_client  # noqa: E402
+
+
+@pytest.fixture
+def fake_google_api(monkeypatch):
+    """benchmarks.fake_google with no injected latency, as the shared HTTP client's upstream."""
+    for name in ("FIRST_BYTE_DELAY", "TTS_DELAY", "TRANSLATE_DELAY", "CHUNK_DELAY", "ERROR_RATE"):
+        monkeypatch.setattr(fake_google, name, 0.0)
+    for counts in fake_google.stats.values():
+        counts.update(requests=0, errors=0)
+    monkeypatch.setattr(
+        http_client, "_build_client",
+        lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_google.app)),
+    )
+    monkeypatch.setattr(http_client, "_client", None)
+    return fake_google
+
+
+@pytest.fixture
+def chatbot(fake_google_api):
+    from services.vertex_ai import VertexAIChatbot
+
+    return VertexAIChatbot()
+
+
+@pytest.fixture
+def backend(chatbot):
+    """Factory for an httpx client on the backend app, signed in and using `chatbot`."""
+    import main
+    from login import _create_token
+
+    token = _create_token({"typ": "session", "email": "tester@example.com", "exp": 2**31 - 1, "sid": "test"})
+    main.chatbot_provider.set(chatbot)
+
+    def client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app),
+            base_url="http://backend",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    yield client
+    main.chatbot_provider.set(None)
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionGate, UpstreamBusy
+
+
+def test_queued_request_gets_the_released_slot():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=1, queue_timeout=1.0)
+    order = []
+
+    async def call(name: str, hold: float) -> None:
+        async with gate.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.ensure_future(call("first", 0.05))
+        await asyncio.sleep(0)
+        await call("second", 0)
+        await first
+
+    asyncio.run(scenario())
+    assert order == ["first", "second"]
+    stats = gate.stats()
+    assert (stats["active"], stats["admitted"], stats["queued"]) == (0, 2, 1)
+
+
+def test_full_queue_rejects_immediately():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=0, queue_timeout=1.0)
+
+    async def scenario():
+        await gate.acquire()
+        with pytest.raises(UpstreamBusy) as raised:
+            await gate.acquire()
+        gate.release()
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert error.reason == "queue_full" and error.retry_after >= 1
+    assert gate.stats()["rejected_queue_full"] == 1
+
+
+def test_queue_deadline_rejects_waiter():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=4, queue_timeout=0.01)
+
+    async def scenario():
+        await gate.acquire()
+        with pytest.raises(UpstreamBusy) as raised:
+            await gate.acquire()
+        gate.release()
+        return raised.value
+
+    assert asyncio.run(scenario()).reason == "queue_timeout"
+    assert gate.stats()["queue_depth"] == 0 and gate.stats()["active"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    gate = AdmissionGate("test", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+
+    async def scenario():
+        await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        gate.release()
+        await asyncio.wait_for(gate.acquire(), 0.1)  # The slot is free again
+        gate.release()
+
+    asyncio.run(scenario())
+    assert gate.stats()["active"] == 0
@@ -0,0 +1,85 @@
+import pytest
+
+from services.answer_cache import NUMPY_AVAILABLE, AnswerCache
+
+similarity = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="similarity lookup needs numpy")
+
+
+def _cache(similarity_threshold: float = 0.9) -> AnswerCache:
+    cache = AnswerCache(max_entries=16, ttl_seconds=60, similarity_threshold=similarity_threshold)
+    cache.ensure_fingerprint("test")
+    return cache
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    cache = _cache()
+    cache.put("What is ibuprofen?", "An NSAID.")
+    assert cache.get("what is   IBUPROFEN") == "An NSAID."
+    assert cache.stats()["exact_hits"] == 1
+
+
+@similarity
+def test_similar_question_reuses_answer():
+    cache = _cache()
+    cache.put("Can I take ibuprofen with food?", "Yes.")
+    assert cache.get("can i take ibuprofen with food please") == "Yes."
+    assert cache.stats()["similar_hits"] == 1
+
+
+@similarity
+def test_filler_words_do_not_prevent_a_hit():
+    cache = _cache()
+    cache.put("Is it okay to take ibuprofen with food?", "Yes.")
+    assert cache.get("So is it okay to take ibuprofen with food?") == "Yes."
+
+
+@similarity
+@pytest.mark.parametrize("cached, asked", [
+    ("Can I take 2 ibuprofen tablets at once?", "Can I take 8 ibuprofen tablets at once?"),
+    ("Is 500mg of paracetamol safe?", "Is 5000mg of paracetamol safe?"),
+    ("Is 500 mg of paracetamol safe?", "Is 5000 mg of paracetamol safe?"),
+    ("Can I take ibuprofen with food?", "Can I take naproxen with food?"),
+    ("Can I take my blood pressure medication with grapefruit?",
+     "Can I take my blood thinner medication with grapefruit?"),
+    ("Why do I feel dizzy getting out of a chair?", "Why do I feel dizzy getting out of a bed?"),
+    ("Why are my ankles swollen in the evening?", "Why are my ankles swollen in the morning?"),
+])
+def test_different_questions_never_match(cached, asked):
+    # Far below the default threshold: the key words alone must keep these apart.
+    cache = _cache(similarity_threshold=0.5)
+    cache.put(cached, "cached answer")
+    assert cache.get(asked) is None
+
+
+@similarity
+def test_same_dose_with_unit_spacing_matches():
+    cache = _cache()
+    cache.put("Is 500mg of paracetamol safe for adults?", "Usually.")
+    assert cache.get("is 500 mg of paracetamol safe for adults") == "Usually."
+
+
+@similarity
+def test_guard_word_mismatch_is_a_miss():
+    cache = _cache()
+    cache.put("Can I drink alcohol while taking ibuprofen?", "cached answer")
+    assert cache.get("Can I not drink alcohol while taking ibuprofen?") is None
+
+
+def test_fingerprint_change_drops_entries():
+    cache = _cache()
+    cache.put("What is ibuprofen?", "An NSAID.")
+    cache.ensure_fingerprint("other-model")
+    assert cache.get("What is ibuprofen?") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_snapshot_round_trip(tmp_path):
+    cache = _cache()
+    cache.put("What is ibuprofen?", "An NSAID.")
+    path = str(tmp_path / "answers.json")
+    assert cache.save_snapshot(path) == 1
+
+    restored = _cache()
+    assert restored.load_snapshot(path, "test") == 1
+    assert restored.get("What is ibuprofen?") == "An NSAID."
+    assert _cache().load_snapshot(path, "other-model") == 0
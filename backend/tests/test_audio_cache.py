@@ -0,0 +1,66 @@
+import asyncio
+
+from services.audio_cache import AudioCache, make_audio_key
+
+
+def test_audio_key_ignores_whitespace_but_not_voice():
+    voice = {"languageCode": "en-US", "name": "en-US-Neural2-F"}
+    key = make_audio_key("Hello  there.", "en-US", voice, {"audioEncoding": "MP3"})
+    assert key == make_audio_key("Hello there.", "en-US", voice, {"audioEncoding": "MP3"})
+    assert key != make_audio_key("Hello there.", "en-US", {**voice, "name": "other"}, {"audioEncoding": "MP3"})
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    cache = AudioCache(max_memory_bytes=10)
+
+    async def scenario():
+        await cache.put("a", b"aaaa")
+        await cache.put("b", b"bbbb")
+        await cache.get("a")
+        await cache.put("c", b"cccc")
+        return await cache.get("a"), await cache.get("b")
+
+    assert asyncio.run(scenario()) == (b"aaaa", None)
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 8
+
+
+def test_disk_hit_is_promoted_to_memory(tmp_path):
+    writer = AudioCache(disk_dir=str(tmp_path))
+    asyncio.run(writer.put("k", b"mp3-bytes"))
+
+    # A fresh process: only the disk tier has the entry.
+    cache = AudioCache(disk_dir=str(tmp_path))
+    assert cache.stats()["disk_bytes"] == len(b"mp3-bytes")
+
+    async def scenario():
+        return await cache.get("k"), await cache.get("k")
+
+    assert asyncio.run(scenario()) == (b"mp3-bytes", b"mp3-bytes")
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    assert stats["memory_bytes"] == len(b"mp3-bytes")
+
+
+def test_disk_tier_evicts_oldest_files(tmp_path):
+    cache = AudioCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=10)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await cache.put(key, key.encode() * 4)
+
+    asyncio.run(scenario())
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b.mp3", "c.mp3"]
+    assert cache.stats()["disk_bytes"] == 8
+
+
+def test_concurrent_puts_of_one_key_count_its_bytes_once(tmp_path):
+    cache = AudioCache(disk_dir=str(tmp_path))
+
+    async def scenario():
+        await asyncio.gather(*(cache.put("k", b"x" * 100) for _ in range(8)))
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert stats["disk_entries"] == 1 and stats["disk_bytes"] == 100
+    assert [path.name for path in tmp_path.iterdir()] == ["k.mp3"]
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.config import settings
+from services import auth_tokens
+from services.auth_tokens import MIN_VALIDITY_SECONDS, REFRESH_AHEAD_SECONDS, TokenProvider
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class _FakeCredentials:
+    """Stands in for TokenProvider._refresh_blocking: numbered tokens valid for an hour."""
+
+    def __init__(self, clock: _Clock) -> None:
+        self.clock = clock
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("metadata server unavailable")
+        return f"token-{self.calls}", self.clock.now + 3600
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(auth_tokens, "time", clock)
+    monkeypatch.setattr(settings, "GOOGLE_STATIC_ACCESS_TOKEN", "")
+    provider = TokenProvider()
+    provider.clock = clock
+    provider.credentials = _FakeCredentials(clock)
+    provider._refresh_blocking = provider.credentials
+    return provider
+
+
+def test_concurrent_first_callers_share_one_refresh(provider):
+    async def scenario():
+        return await asyncio.gather(*(provider.get_token() for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["token-1"] * 10
+    assert provider.credentials.calls == 1
+
+
+def test_token_is_refreshed_ahead_of_expiry_in_the_background(provider):
+    async def scenario():
+        await provider.get_token()
+        provider.clock.now += 3600 - REFRESH_AHEAD_SECONDS + 1
+        provider.credentials.release.clear()
+        # Still valid: handed out at once while the refresh runs.
+        stale = await asyncio.wait_for(provider.get_token(), 1)
+        again = await provider.get_token()
+        provider.credentials.release.set()
+        await provider._refresh_task
+        return stale, again, await provider.get_token()
+
+    assert asyncio.run(scenario()) == ("token-1", "token-1", "token-2")
+    assert provider.credentials.calls == 2
+    assert provider.stats()["background_refreshes"] == 1
+
+
+def test_nearly_expired_token_is_not_handed_out(provider):
+    async def scenario():
+        await provider.get_token()
+        provider.clock.now += 3600 - MIN_VALIDITY_SECONDS
+        return await provider.get_token()
+
+    assert asyncio.run(scenario()) == "token-2"
+    assert provider.stats()["background_refreshes"] == 0
+
+
+def test_failed_background_refresh_keeps_the_current_token(provider):
+    async def scenario():
+        await provider.get_token()
+        provider.clock.now += 3600 - REFRESH_AHEAD_SECONDS + 1
+        provider.credentials.fail = True
+        token = await provider.get_token()
+        await asyncio.gather(provider._refresh_task, return_exceptions=True)
+        provider.credentials.fail = False
+        # The next caller retries it.
+        retried = await provider.get_token()
+        await provider._refresh_task
+        return token, retried, await provider.get_token()
+
+    assert asyncio.run(scenario()) == ("token-1", "token-1", "token-3")
+    assert provider.stats()["failures"] == 1
+    assert provider.credentials.calls == 3
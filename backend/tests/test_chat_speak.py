@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from benchmarks import fake_google
+
+
+@pytest.fixture
+def tts(fake_google_api):
+    import main
+    from services.text_to_speech import GoogleTextToSpeechService
+
+    service = GoogleTextToSpeechService()
+    main.tts_provider.set(service)
+    yield service
+    main.tts_provider.set(None)
+
+
+def _speak_events(backend, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def scenario():
+        async with backend() as client:
+            response = await client.post("/api/chat/speak", json=body)
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    return asyncio.run(scenario())
+
+
+def test_reply_is_spoken_sentence_group_by_group(backend, tts):
+    events = _speak_events(backend, {"message": "Is walking good for me?", "session_id": "speak"})
+    audio = [event for event in events if event["type"] == "audio"]
+    done = events[-1]
+
+    assert done["type"] == "done"
+    assert [event["index"] for event in audio] == list(range(len(audio))) and len(audio) > 1
+    assert " ".join(event["text"] for event in audio) == done["response"]
+    for event in audio:
+        assert event["mime_type"] == "audio/mpeg"
+        assert len(base64.b64decode(event["audio_base64"])) == len(event["text"]) * fake_google.AUDIO_BYTES_PER_CHAR
+    # Text is not held back behind the audio.
+    assert events.index(audio[0]) > 0 and events[0]["type"] == "delta"
+    assert fake_google.stats["tts"]["requests"] == len(audio)
+
+
+def test_segments_are_translated_for_the_voice_language(backend, tts):
+    events = _speak_events(backend, {"message": "Hello", "session_id": "speak-de", "language_code": "de-DE"})
+    audio = [event for event in events if event["type"] == "audio"]
+
+    assert audio and fake_google.stats["translate"]["requests"] == len(audio)
+    # "[de] " is prepended to every translated segment before synthesis.
+    for event in audio:
+        spoken_chars = len(base64.b64decode(event["audio_base64"])) // fake_google.AUDIO_BYTES_PER_CHAR
+        assert spoken_chars == len(event["text"]) + len("[de] ")
+
+
+def test_failed_segment_is_reported_and_the_reply_still_completes(backend, tts, monkeypatch):
+    async def failing_synthesis(text, language_code, voice_name):
+        raise RuntimeError("TTS quota exceeded")
+
+    monkeypatch.setattr(tts, "synthesize_speech", failing_synthesis)
+
+    events = _speak_events(backend, {"message": "Hello", "session_id": "speak-fail"})
+    errors = [event for event in events if event["type"] == "audio_error"]
+
+    assert errors and all("quota" in event["error"] for event in errors)
+    assert not any(event["type"] == "audio" for event in events)
+    assert events[-1]["type"] == "done"
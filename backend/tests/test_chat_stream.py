@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks import fake_google
+from services import http_client
+from services.admission import chat_gate
+from services.circuit_breaker import chat_breaker
+
+
+def test_slow_client_does_not_hold_chat_slot(chatbot):
+    async def scenario():
+        calls_before = chat_breaker.stats()["window_calls"]
+        events = chatbot.chat_stream("How are you?", session_id="slow-client")
+        first = await events.__anext__()
+        # The client stalls after the first delta; the upstream body is read meanwhile.
+        for _ in range(100):
+            if chat_gate.stats()["active"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        released = chat_gate.stats()["active"] == 0
+        recorded = chat_breaker.stats()["window_calls"] - calls_before
+        rest = [event async for event in events]
+        return first, released, recorded, rest
+
+    first, released, recorded, rest = asyncio.run(scenario())
+    assert first["type"] == "delta"
+    assert released and recorded == 1
+    assert rest[-1]["type"] == "done"
+
+
+def test_client_disconnect_releases_slot_without_saving_turn(chatbot):
+    async def scenario():
+        events = chatbot.chat_stream("How are you?", session_id="gone")
+        await events.__anext__()
+        await events.aclose()
+        await asyncio.sleep(0)
+        return chat_gate.stats()["active"], chatbot.sessions.get("gone")
+
+    active, history = asyncio.run(scenario())
+    assert active == 0
+    assert history == []
+
+
+class _BrokenStream(httpx.AsyncByteStream):
+    """An SSE body that drops the connection after its first event."""
+
+    async def __aiter__(self):
+        yield b'data: {"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}\r\n\r\n'
+        raise httpx.RemoteProtocolError("peer closed connection")
+
+
+def _stream_events(backend, message: str, session_id: str) -> List[Dict[str, Any]]:
+    async def scenario():
+        async with backend() as client:
+            response = await client.post("/api/chat/stream", json={"message": message, "session_id": session_id})
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    return asyncio.run(scenario())
+
+
+def _use_upstream(monkeypatch, handler) -> None:
+    monkeypatch.setattr(http_client, "_build_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def test_stream_yields_deltas_then_done(backend, chatbot):
+    events = _stream_events(backend, "Is walking good for me?", "s1")
+    deltas = [event for event in events if event["type"] == "delta"]
+    done = events[-1]
+
+    assert len(deltas) > 1 and all(event["type"] == "delta" for event in events[:-1])
+    assert done["type"] == "done" and done["session_id"] == "s1"
+    assert done["response"] == "".join(event["text"] for event in deltas).strip()
+    assert done["response"].startswith("You asked: Is walking good for me?")
+
+
+def test_sse_parser_skips_non_data_lines(backend, monkeypatch):
+    body = (
+        b": keep-alive comment\r\n\r\n"
+        b'data: {"candidates": [{"content": {"parts": [{"text": "Drink "}]}}]}\r\n\r\n'
+        b'data: {"candidates": []}\r\n\r\n'
+        b'data: {"candidates": [{"content": {"parts": [{"text": "water"}, {"text": "."}]}}]}\r\n\r\n'
+    )
+    _use_upstream(monkeypatch, lambda request: httpx.Response(200, content=body))
+
+    events = _stream_events(backend, "What should I drink?", "sse")
+    assert [event["text"] for event in events if event["type"] == "delta"] == ["Drink ", "water."]
+    assert events[-1]["response"] == "Drink water."
+
+
+def test_history_is_persisted_and_sent_on_next_turn(backend, chatbot, monkeypatch):
+    _stream_events(backend, "First question", "history")
+    assert [turn.role for turn in chatbot.sessions.get("history")] == ["user", "model"]
+
+    sent = []
+
+    async def recording_handler(request: httpx.Request) -> httpx.Response:
+        sent.append(json.loads(request.content))
+        return await httpx.ASGITransport(app=fake_google.app).handle_async_request(request)
+
+    _use_upstream(monkeypatch, recording_handler)
+    events = _stream_events(backend, "Second question", "history")
+
+    assert events[-1]["type"] == "done"
+    texts = [content["parts"][0]["text"] for content in sent[0]["contents"]]
+    assert texts[0] == "First question" and texts[-1] == "Second question" and len(texts) == 3
+    assert len(chatbot.sessions.get("history")) == 4
+
+
+def test_mid_stream_failure_ends_with_error_and_saves_nothing(backend, chatbot, monkeypatch):
+    _use_upstream(monkeypatch, lambda request: httpx.Response(200, stream=_BrokenStream()))
+
+    events = _stream_events(backend, "Hello?", "broken")
+    assert events[0] == {"type": "delta", "text": "Hello"}
+    assert events[-1]["type"] == "error" and "peer closed" in events[-1]["error"]
+    assert chatbot.sessions.get("broken") == []
+
+
+def test_upstream_error_status_becomes_error_event(backend, chatbot, fake_google_api, monkeypatch):
+    monkeypatch.setattr(fake_google_api, "ERROR_RATE", 1.0)
+
+    events = _stream_events(backend, "Hello?", "failing")
+    assert len(events) == 1 and events[0]["type"] == "error"
+    assert "Injected failure" in events[0]["error"]
+    assert chatbot.sessions.get("failing") == []
+
+
+def test_saturated_upstream_is_a_429_before_streaming(backend, monkeypatch):
+    monkeypatch.setattr(chat_gate, "max_concurrent", 1)
+    monkeypatch.setattr(chat_gate, "max_queue", 0)
+
+    async def scenario():
+        await chat_gate.acquire()  # Someone else holds the only slot
+        try:
+            async with backend() as client:
+                return await client.post("/api/chat/stream", json={"message": "Hi", "session_id": "busy"})
+        finally:
+            chat_gate.release()
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from services import circuit_breaker
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, is_upstream_failure
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def _call(breaker: CircuitBreaker, clock: _Clock, fail: bool = False, seconds: float = 0.0) -> None:
+    async def call():
+        async with breaker.guard():
+            clock.now += seconds
+            if fail:
+                raise RuntimeError("upstream error")
+
+    try:
+        asyncio.run(call())
+    except RuntimeError:
+        pass
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker("test", window_seconds=30, min_calls=4, error_rate=0.5,
+                          slow_call_seconds=5, slow_call_rate=0.8, open_seconds=10)
+
+
+def test_opens_on_error_rate_after_min_calls(clock):
+    breaker = _breaker()
+    for fail in (True, False, True):
+        _call(breaker, clock, fail=fail)
+    assert breaker.state == CLOSED  # Below min_calls
+    _call(breaker, clock, fail=True)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpen) as raised:
+        _call(breaker, clock)
+    assert raised.value.retry_after == 10
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, clock, seconds=6)
+    assert breaker.state == OPEN
+
+
+def test_failures_outside_window_are_forgotten(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        _call(breaker, clock, fail=True)
+    clock.now += 31
+    _call(breaker, clock, fail=True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_failures"] == 1
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, clock, fail=True)
+    clock.now += 10
+    assert breaker.stats()["state"] == HALF_OPEN
+
+    _call(breaker, clock, fail=True)  # Probe fails
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+    clock.now += 10
+    _call(breaker, clock)  # Probe succeeds
+    assert breaker.state == CLOSED and breaker.stats()["window_calls"] == 0
+
+
+def test_only_one_probe_at_a_time(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, clock, fail=True)
+    clock.now += 10
+
+    async def scenario():
+        async with breaker.guard():
+            with pytest.raises(CircuitOpen):
+                async with breaker.guard():
+                    pass
+
+    asyncio.run(scenario())
+    assert breaker.state == CLOSED
+
+
+def test_upstream_failure_statuses():
+    assert is_upstream_failure(503) and is_upstream_failure(429)
+    assert not is_upstream_failure(400) and not is_upstream_failure(404)
+
+
+def test_check_fails_fast_without_claiming_the_probe(clock):
+    breaker = _breaker()
+    breaker.check()
+    for _ in range(4):
+        _call(breaker, clock, fail=True)
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+    clock.now += 10
+    breaker.check()
+    breaker.check()
+    _call(breaker, clock)  # The probe is still available
+    assert breaker.state == CLOSED
+
+
+def test_open_tts_breaker_skips_translation_and_queueing(fake_google_api, monkeypatch):
+    from services.admission import tts_gate
+    from services.text_to_speech import GoogleTextToSpeechService
+
+    service = GoogleTextToSpeechService()
+    monkeypatch.setattr(circuit_breaker.tts_breaker, "state", OPEN)
+    monkeypatch.setattr(circuit_breaker.tts_breaker, "_opened_at", circuit_breaker.time.monotonic())
+    admitted = tts_gate.stats()
+
+    with pytest.raises(CircuitOpen):
+        asyncio.run(service._synthesize_chunk_uncoalesced("Rest well.", "de-DE", None))
+    assert fake_google_api.stats["translate"]["requests"] == 0
+    assert fake_google_api.stats["tts"]["requests"] == 0
+    assert tts_gate.stats() == admitted
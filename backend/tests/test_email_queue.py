@@ -0,0 +1,150 @@
+import asyncio
+import smtplib
+from typing import Dict, List
+
+import pytest
+
+from services import email_queue as email_queue_module
+from services.email_queue import EmailQueue, SMTPConfig
+
+
+class _FakeSMTP:
+    """smtplib.SMTP stand-in; `errors` maps a recipient to exceptions raised on successive sends."""
+
+    connections: List["_FakeSMTP"] = []
+    errors: Dict[str, List[Exception]] = {}
+
+    def __init__(self, host: str, port: int, timeout: float) -> None:
+        self.sent: List[str] = []
+        self.closed = False
+        _FakeSMTP.connections.append(self)
+
+    def starttls(self) -> None:
+        pass
+
+    def login(self, user: str, password: str) -> None:
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def sendmail(self, from_email: str, to: List[str], message: str) -> None:
+        pending = _FakeSMTP.errors.get(to[0])
+        if pending:
+            raise pending.pop(0)
+        self.sent.append(to[0])
+
+    def quit(self) -> None:
+        self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    _FakeSMTP.connections = []
+    _FakeSMTP.errors = {}
+    monkeypatch.setattr(email_queue_module.smtplib, "SMTP", _FakeSMTP)
+    return _FakeSMTP
+
+
+def _queue(**options) -> EmailQueue:
+    config = SMTPConfig("smtp.test", 587, "user", "secret", "no-reply@test", use_tls=True)
+    options.setdefault("retry_base_seconds", 0.01)
+    return EmailQueue(config, **options)
+
+
+async def _settle(queue: EmailQueue, emails: int, timeout: float = 5.0) -> None:
+    """Wait until every email has been sent or has finally failed, then stop the queue."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while queue.sent + queue.failed < emails:
+        assert asyncio.get_running_loop().time() < deadline, queue.stats()
+        await asyncio.sleep(0.005)
+    await queue.close()
+
+
+def _refused(recipient: str, code: int) -> smtplib.SMTPRecipientsRefused:
+    return smtplib.SMTPRecipientsRefused({recipient: (code, b"refused")})
+
+
+def test_queued_emails_share_one_batch_and_connection(fake_smtp):
+    queue = _queue(workers=1, batch_size=20)
+
+    async def scenario():
+        for index in range(5):
+            assert queue.enqueue(f"user{index}@test", "hello")
+        await _settle(queue, 5)
+
+    asyncio.run(scenario())
+    assert queue.stats()["sent"] == 5
+    assert queue.batches == 1
+    assert len(fake_smtp.connections) == 1
+    assert fake_smtp.connections[0].closed  # Closed on shutdown
+
+
+def test_batch_size_splits_batches(fake_smtp):
+    queue = _queue(workers=1, batch_size=2)
+
+    async def scenario():
+        for index in range(5):
+            queue.enqueue(f"user{index}@test", "hello")
+        await _settle(queue, 5)
+
+    asyncio.run(scenario())
+    assert queue.sent == 5 and queue.batches == 3
+
+
+def test_greylisted_recipient_is_retried(fake_smtp):
+    fake_smtp.errors["grey@test"] = [_refused("grey@test", 450)]
+    queue = _queue(workers=1)
+
+    async def scenario():
+        queue.enqueue("grey@test", "hello")
+        await _settle(queue, 1)
+
+    asyncio.run(scenario())
+    assert (queue.sent, queue.retried, queue.failed) == (1, 1, 0)
+
+
+def test_permanent_refusal_is_not_retried(fake_smtp):
+    fake_smtp.errors["gone@test"] = [_refused("gone@test", 550)]
+    queue = _queue(workers=1)
+
+    async def scenario():
+        queue.enqueue("gone@test", "hello")
+        queue.enqueue("ok@test", "hello")
+        await _settle(queue, 2)
+
+    asyncio.run(scenario())
+    assert (queue.sent, queue.retried, queue.failed) == (1, 0, 1)
+
+
+def test_dropped_connection_reconnects_and_retries(fake_smtp):
+    fake_smtp.errors["a@test"] = [smtplib.SMTPServerDisconnected("gone")]
+    queue = _queue(workers=1)
+
+    async def scenario():
+        queue.enqueue("a@test", "hello")
+        queue.enqueue("b@test", "hello")
+        await _settle(queue, 2)
+
+    asyncio.run(scenario())
+    assert (queue.sent, queue.retried, queue.failed) == (2, 1, 0)
+    assert len(fake_smtp.connections) == 2
+
+
+def test_gives_up_after_max_attempts(fake_smtp):
+    fake_smtp.errors["grey@test"] = [_refused("grey@test", 451) for _ in range(10)]
+    queue = _queue(workers=1, max_attempts=3)
+
+    async def scenario():
+        queue.enqueue("grey@test", "hello")
+        await _settle(queue, 1)
+
+    asyncio.run(scenario())
+    assert (queue.sent, queue.retried, queue.failed) == (0, 2, 1)
+
+
+def test_unconfigured_queue_refuses_emails():
+    assert not EmailQueue(None).enqueue("a@test", "hello")
@@ -0,0 +1,60 @@
+import asyncio
+
+from services.lazy import LazyService
+from services.warmup import WarmUp
+
+
+class _FlakyFactory:
+    """Fails the first `failures` calls, then returns a service."""
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("credentials not ready")
+        return "service"
+
+
+def test_failure_is_remembered_for_retry_interval():
+    factory = _FlakyFactory(failures=1)
+    provider = LazyService("test", factory, retry_seconds=30)
+
+    async def scenario():
+        assert await provider.get() is None
+        assert await provider.get() is None  # Inside the retry window: no new attempt
+        return await provider.get(force=True)
+
+    assert asyncio.run(scenario()) == "service"
+    assert factory.calls == 2
+    assert provider.stats()["loaded"] and provider.error is None
+
+
+def test_concurrent_callers_share_one_attempt():
+    factory = _FlakyFactory(failures=0)
+    provider = LazyService("test", factory)
+
+    async def scenario():
+        return await asyncio.gather(*(provider.get() for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["service"] * 10
+    assert factory.calls == 1
+
+
+def test_warm_up_retries_rebuild_the_service(monkeypatch):
+    monkeypatch.setattr("services.warmup.STEP_RETRY_SECONDS", 0.01)
+    factory = _FlakyFactory(failures=1)
+    provider = LazyService("test", factory, retry_seconds=30)
+
+    async def warm_service():
+        if not await provider.get(force=True):
+            raise RuntimeError(provider.error)
+        return True
+
+    warm_up = WarmUp(deadline_seconds=5)
+    asyncio.run(warm_up.run({"service": warm_service}))
+    assert warm_up.succeeded and warm_up.ready
+    assert warm_up.steps["service"]["attempts"] == 2
+    assert factory.calls == 2
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from services.nonce_store import (
+    NONCE_EXPIRED, NONCE_OK, NONCE_UNKNOWN, NONCE_USED, InMemoryNonceStore, SQLiteNonceStore,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteNonceStore(str(tmp_path / "nonces.db"))
+    return InMemoryNonceStore()
+
+
+def test_nonce_is_consumed_once(store):
+    store.issue("abc", time.time() + 60)
+    assert store.consume("abc") == NONCE_OK
+    assert store.consume("abc") == NONCE_USED
+
+
+def test_unknown_and_expired_nonces(store):
+    assert store.consume("missing") == NONCE_UNKNOWN
+    store.issue("old", time.time() - 1)
+    assert store.consume("old") == NONCE_EXPIRED
+
+
+def test_memory_store_purges_expired_nonces():
+    store = InMemoryNonceStore()
+    for index in range(10):
+        store.issue(f"old{index}", time.time() - 1)
+    store.issue("live", time.time() + 60)
+    assert store.stats()["nonces"] == 1 and store.stats()["purged"] == 10
+
+
+def test_memory_store_cap_evicts_soonest_expiring():
+    store = InMemoryNonceStore(max_entries=2)
+    now = time.time()
+    store.issue("soon", now + 10)
+    store.issue("later", now + 60)
+    store.issue("new", now + 60)
+    assert store.consume("soon") == NONCE_UNKNOWN
+    assert store.consume("later") == NONCE_OK and store.stats()["evicted"] == 1
+
+
+def test_sqlite_nonce_is_shared_and_single_use(tmp_path):
+    path = str(tmp_path / "nonces.db")
+    issuer, verifier = SQLiteNonceStore(path), SQLiteNonceStore(path)
+    issuer.issue("abc", time.time() + 60)
+    assert verifier.consume("abc") == NONCE_OK
+    assert issuer.consume("abc") == NONCE_USED
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from services import rate_limit
+from services.rate_limit import InMemoryRateLimiter, RateLimited, RateLimits, SQLiteRateLimiter
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit, "_monotonic", clock)
+    return clock
+
+
+def test_bucket_refills_at_rate(clock):
+    limiter = InMemoryRateLimiter()
+    assert limiter.try_acquire("chat", "a", rate=1.0, burst=2) == 0.0
+    assert limiter.try_acquire("chat", "a", rate=1.0, burst=2) == 0.0
+    assert limiter.try_acquire("chat", "a", rate=1.0, burst=2) == pytest.approx(1.0)
+    clock.now += 1.0
+    assert limiter.try_acquire("chat", "a", rate=1.0, burst=2) == 0.0
+
+
+def test_sweep_drops_refilled_buckets(clock):
+    limiter = InMemoryRateLimiter(shards=1, max_keys_per_shard=2)
+    limiter.try_acquire("chat", "a", rate=10.0, burst=5)
+    limiter.try_acquire("chat", "b", rate=10.0, burst=5)
+    clock.now += 1.0
+
+    assert limiter.try_acquire("chat", "c", rate=10.0, burst=5) == 0.0
+    assert limiter.stats()["swept"] == 2
+
+
+def test_login_flood_does_not_crowd_out_chat_users(clock):
+    limiter = InMemoryRateLimiter(shards=1, max_keys_per_shard=2)
+    for email in ("x@example.com", "y@example.com", "z@example.com"):
+        limiter.try_acquire("login", email, rate=0.05, burst=1)
+    assert limiter.stats()["rejected_full"] == 1
+
+    assert limiter.try_acquire("chat", "new-user", rate=1.0, burst=5) == 0.0
+    assert limiter.try_acquire("tts", "new-user", rate=1.0, burst=5) == 0.0
+    assert limiter.stats()["buckets"] == {"login": 2, "chat": 1, "tts": 1}
+
+
+@pytest.mark.parametrize("policy", [(0, 5), (-1, 5), (10, 0)])
+def test_policy_needs_positive_rate_and_burst(policy):
+    with pytest.raises(ValueError):
+        RateLimits(InMemoryRateLimiter(), {"chat": policy})
+
+
+def test_full_shard_rejects_instead_of_evicting_live_buckets(clock):
+    limiter = InMemoryRateLimiter(shards=1, max_keys_per_shard=2)
+    limiter.try_acquire("login", "a", rate=0.1, burst=1)
+    limiter.try_acquire("login", "b", rate=0.1, burst=1)
+
+    wait = limiter.try_acquire("login", "attacker", rate=0.1, burst=1)
+    assert wait == pytest.approx(10.0)
+    assert limiter.stats()["rejected_full"] == 1
+    # The drained buckets are still there.
+    assert limiter.try_acquire("login", "a", rate=0.1, burst=1) > 0
+
+    clock.now += 10.0
+    assert limiter.try_acquire("login", "attacker", rate=0.1, burst=1) == 0.0
+
+
+def test_sqlite_limiter_shares_buckets_across_instances(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first, second = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+    assert first.try_acquire("login", "a", rate=0.01, burst=1) == 0.0
+    assert second.try_acquire("login", "a", rate=0.01, burst=1) > 0
+
+
+def test_enforce_rate_limit_raises_with_retry_after(tmp_path, monkeypatch):
+    limits = RateLimits(SQLiteRateLimiter(str(tmp_path / "limits.db")), {"login": (6, 1)})
+    monkeypatch.setattr(rate_limit, "rate_limits", limits)
+
+    async def scenario():
+        await rate_limit.enforce_rate_limit("login", "a")
+        with pytest.raises(RateLimited) as raised:
+            await rate_limit.enforce_rate_limit("login", "a")
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert error.bucket == "login" and error.retry_after == pytest.approx(10.0, abs=0.5)
+    assert limits.stats()["limited"] == {"login": 1}
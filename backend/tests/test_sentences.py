@@ -0,0 +1,39 @@
+from services.sentences import SentenceBuffer, chunk_text, split_sentences
+
+
+def test_split_sentences_keeps_abbreviations_and_quotes():
+    text = 'Ask Dr. Smith about it. She said "rest well." Then call me! Okay?'
+    assert split_sentences(text) == ["Ask Dr. Smith about it.", 'She said "rest well."', "Then call me!", "Okay?"]
+
+
+def test_split_sentences_ignores_decimal_points():
+    assert split_sentences("Take 2.5 ml twice a day. Not more.") == ["Take 2.5 ml twice a day.", "Not more."]
+
+
+def test_chunk_text_packs_whole_sentences():
+    text = "One two three. Four five six. Seven eight nine."
+    assert chunk_text(text, 30) == ["One two three. Four five six.", "Seven eight nine."]
+    assert all(len(chunk) <= 30 for chunk in chunk_text(text * 10, 30))
+
+
+def test_chunk_text_splits_overlong_sentence_at_clauses_then_words():
+    sentence = "First clause here, second clause here, and a third one that is rather long indeed."
+    chunks = chunk_text(sentence, 25)
+    assert all(len(chunk) <= 25 for chunk in chunks)
+    assert " ".join(chunks).split() == sentence.split()
+    assert chunks[0] == "First clause here,"
+
+
+def test_sentence_buffer_releases_whole_sentences():
+    buffer = SentenceBuffer(min_chars=10)
+    assert buffer.feed("Hello there, ") == []
+    assert buffer.feed("my friend. How") == ["Hello there, my friend."]
+    assert buffer.feed(" are you") == []
+    assert buffer.flush() == ["How are you"]
+    assert buffer.flush() == []
+
+
+def test_sentence_buffer_groups_short_sentences():
+    buffer = SentenceBuffer(min_chars=20)
+    assert buffer.feed("Yes. ") == []
+    assert buffer.feed("That is fine to take. ") == ["Yes. That is fine to take."]
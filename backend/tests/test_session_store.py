@@ -0,0 +1,129 @@
+import pytest
+
+from services import session_store
+from services.session_store import InMemorySessionStore, SQLiteSessionStore, Turn
+
+
+class _Clock:
+    """Stands in for the time module: both wall and monotonic time are under test control."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+def _pair(question: str) -> list:
+    return [Turn("user", question), Turn("model", f"answer to {question}")]
+
+
+def _texts(turns) -> list:
+    return [turn.text for turn in turns]
+
+
+def test_sqlite_get_returns_a_copy_of_the_cached_history(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.append("s", _pair("q1"))
+
+    history = store.get("s")
+    history.append(Turn("user", "not saved"))
+
+    assert _texts(store.get("s")) == ["q1", "answer to q1"]
+
+
+def test_sqlite_delete_rolls_back_on_error(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.append("s", _pair("q1"))
+
+    def fail(session_id):
+        raise RuntimeError("disk error")
+
+    monkeypatch.setattr(store, "_delete_locked", fail)
+    with pytest.raises(RuntimeError):
+        store.delete("s")
+    monkeypatch.undo()
+
+    # No transaction was left open: the next write starts its own.
+    store.append("s", _pair("q2"))
+    assert _texts(store.get("s"))[-1] == "answer to q2"
+    assert store.delete("s") is True
+
+
+def test_sqlite_expired_session_is_dropped_on_read(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), idle_ttl_seconds=60)
+    store.append("s", _pair("q1"))
+    clock.now += 61
+
+    assert store.get("s") == []
+    assert store.stats()["evictions"]["ttl"] == 1
+    assert store.stats()["sessions"] == 0
+
+
+def test_sqlite_prune_evicts_oldest_sessions_by_count_and_bytes(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(session_store, "_PRUNE_EVERY_APPENDS", 1)
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2)
+    for name in ("a", "b", "c"):
+        store.append(name, _pair(name))
+        clock.now += 1
+
+    assert store.get("a") == []
+    assert store.stats()["evictions"]["capacity"] == 1
+
+    # A short follow-up overflows the budget by less than one older session.
+    store.max_bytes = store.stats()["bytes"]
+    store.append("c", [Turn("user", "?"), Turn("model", "!")])
+    assert store.get("b") == []
+    assert _texts(store.get("c")) == ["c", "answer to c", "?", "!"]
+    assert store.stats()["evictions"]["bytes"] == 1
+
+
+def test_memory_store_evicts_least_recently_used_at_capacity(clock):
+    store = InMemorySessionStore(max_sessions=2)
+    store.append("a", _pair("a"))
+    store.append("b", _pair("b"))
+    store.get("a")
+    store.append("c", _pair("c"))
+
+    assert store.get("b") == []
+    assert _texts(store.get("a")) == ["a", "answer to a"]
+    assert store.stats()["evictions"]["capacity"] == 1
+
+
+def test_memory_store_expires_idle_sessions(clock):
+    store = InMemorySessionStore(idle_ttl_seconds=60)
+    store.append("old", _pair("old"))
+    clock.now += 30
+    store.append("recent", _pair("recent"))
+    clock.now += 31
+
+    stats = store.stats()
+    assert stats["sessions"] == 1 and stats["evictions"]["ttl"] == 1
+    assert store.get("old") == []
+
+
+def test_memory_store_byte_budget_evicts_others_then_trims_oldest_pairs(clock):
+    pair_bytes = sum(session_store.turn_size(turn) for turn in _pair("q0"))
+    store = InMemorySessionStore(max_bytes=2 * pair_bytes)
+    store.append("other", _pair("q0"))
+    store.append("s", _pair("q1"))
+    store.append("s", _pair("q2"))
+
+    assert store.get("other") == []
+    assert store.stats()["evictions"]["bytes"] == 1
+
+    store.append("s", _pair("q3"))
+    store.append("s", _pair("q4"))
+    assert _texts(store.get("s"))[::2] == ["q3", "q4"]
+    assert store.stats()["bytes"] == 2 * pair_bytes
+    assert store.stats()["trimmed_turns"] == 4
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"inflight": 0, "calls": 1, "coalesced": 4}
+
+
+def test_different_keys_and_later_calls_are_not_coalesced():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        first = await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")),
+                                     flight.do("b", lambda: asyncio.sleep(0, "b")))
+        again = await flight.do("a", lambda: asyncio.sleep(0, "a2"))
+        return first, again
+
+    assert asyncio.run(scenario()) == (["a", "b"], "a2")
+    assert flight.calls == 3 and flight.coalesced == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["inflight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def scenario():
+        impatient = asyncio.ensure_future(flight.do("key", fetch))
+        patient = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.005)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(scenario()) == "answer"
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from services import cache
+from services.cache import TTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(max_entries=10, ttl_seconds=60)
+    entries.set("k", "v")
+    clock.now += 59
+    assert entries.get("k") == "v"
+    clock.now += 1
+    assert entries.get("k") is None
+    assert entries.stats()["expirations"] == 1 and len(entries) == 0
+
+
+def test_explicit_expiry_overrides_default_ttl(clock):
+    entries = TTLCache(max_entries=10, ttl_seconds=60)
+    entries.set("short", "v", ttl=5)
+    entries.set("pinned", "v", expires_at=clock.now + 600)
+    clock.now += 120
+    assert entries.get("short") is None
+    assert entries.get("pinned") == "v"
+
+
+def test_full_cache_evicts_least_recently_used(clock):
+    entries = TTLCache(max_entries=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert (entries.get("a"), entries.get("b"), entries.get("c")) == (1, None, 3)
+    assert entries.stats()["evictions"] == 1
+
+
+def test_tts_translates_each_text_once_per_language(fake_google_api):
+    from services.text_to_speech import GoogleTextToSpeechService
+
+    service = GoogleTextToSpeechService()
+
+    async def scenario():
+        first = await service._translate_text("Drink plenty of water.", "de-DE")
+        again = await service._translate_text("Drink plenty of water.", "de-AT")
+        spanish = await service._translate_text("Drink plenty of water.", "es-ES")
+        english = await service._translate_text("Drink plenty of water.", "en-GB")
+        return first, again, spanish, english
+
+    first, again, spanish, english = asyncio.run(scenario())
+    assert first == again == "[de] Drink plenty of water."
+    assert spanish == "[es] Drink plenty of water."
+    assert english == "Drink plenty of water."
+    assert fake_google_api.stats["translate"]["requests"] == 2
+    assert service.translation_cache.stats()["hits"] == 1
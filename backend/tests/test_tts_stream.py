@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+
+
+def test_stream_waits_for_cancelled_chunks_before_raising(fake_google_api, monkeypatch):
+    from services.text_to_speech import GoogleTextToSpeechService
+
+    service = GoogleTextToSpeechService()
+    monkeypatch.setattr(settings, "TTS_CHUNK_MAX_CHARS", 20)
+    unwound = []
+
+    async def synthesize_chunk(text, language_code, voice_name):
+        if text.startswith("First"):
+            raise RuntimeError("TTS quota exceeded")
+        try:
+            await asyncio.sleep(10)
+        finally:
+            unwound.append(text)
+        return b""
+
+    monkeypatch.setattr(service, "_synthesize_chunk", synthesize_chunk)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async for _ in service.synthesize_speech_stream("First sentence. Second one here. Third one here."):
+                pass
+        # Checked before the loop runs again: the stream itself waited for them.
+        return list(unwound)
+
+    assert asyncio.run(scenario()) == ["Second one here.", "Third one here."]